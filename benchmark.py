@@ -0,0 +1,880 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+benchmark: Timing comparisons for calc's evaluation backends
+
+Run directly to print the cost of evaluating a set of representative formulas
+with each backend, relative to the RPN interpreter, among other comparisons.
+
+Run with --json [<file>] to time every phase of compilation and evaluation, and
+the principal Session operations, over synthetic workloads, writing the results
+as JSON; run with --compare <baseline file> [--tolerance <fraction>] to time
+them likewise and report those that have slowed since the baseline was written,
+exiting with status 1 if any have.
+
+Legal
+=====
+ All code, unless otherwise indicated, is original, and subject to the terms of
+ the attached licensing agreement.
+ 
+ Copyright (c) Neil Tallim, 2002-2019
+"""
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+import timeit
+
+import calc
+
+_SESSION = ';'.join((
+ "a = 1", "b = 2", "c = a + b",
+ "g(x) = x * 2", "g(x, y) = x + y", "h() = ceil(4.009)",
+)) #: The definitions against which formulas are evaluated.
+_FORMULAS = (
+ "1 + 2 * 3 - 4 / 5",
+ "2 * pi / 360 * c",
+ "sqrt(16) * ceil(4.009) + sin(1) ^ 2",
+ "(((1 + 2) * (3 + 4)) \\ 5) % 7 < 9 > 2",
+ "-1-(-(-1 + 1 + 1 * 5))",
+ "g(c, h()) + g(a)",
+) #: The formulas to be timed.
+_REPETITIONS = 10000 #: The number of evaluations per measurement.
+_SUITE_FORMAT = 'calc.benchmark' #: Identifies the JSON written by runSuite().
+_SUITE_VERSION = 1 #: The revision of the JSON written by runSuite(); baselines of other revisions are not compared.
+_TOLERANCE = 0.1 #: The fraction by which a timing may exceed its baseline before it is reported as a regression.
+
+def _name(prefix, index):
+    """
+    Returns a distinct identifier for the given index, since names may not
+    contain digits.
+    """
+    letters = []
+    while True:
+        (index, remainder) = divmod(index, 26)
+        letters.append(chr(ord('a') + remainder))
+        if not index:
+            return prefix + ''.join(reversed(letters))
+            
+def _time(function, repetitions=_REPETITIONS):
+    """
+    Returns the best of three measurements of the given function, in seconds.
+    """
+    return min(timeit.repeat(function, number=repetitions, repeat=3))
+    
+def _timeEach(function, budget=0.05):
+    """
+    Returns the best of three measurements of the given function, in seconds
+    per call, repeating it enough times to fill roughly the given budget.
+    """
+    (repetitions, elapsed) = (1, timeit.timeit(function, number=1))
+    if elapsed < budget:
+        repetitions = int(budget / max(elapsed, 1e-7)) + 1
+    return _time(function, repetitions) / repetitions
+    
+def _timeFresh(prepare, function, budget=0.05):
+    """
+    Returns the best of three measurements of the given function, in seconds
+    per call, passing it a fresh value from prepare() on each call, for
+    operations that change what they act upon; prepare() is not timed.
+    """
+    timings = []
+    for measurement in range(3):
+        (repetitions, elapsed) = (0, 0.0)
+        while not repetitions or elapsed < budget:
+            value = prepare()
+            start = timeit.default_timer()
+            function(value)
+            elapsed += timeit.default_timer() - start
+            repetitions += 1
+        timings.append(elapsed / repetitions)
+    return min(timings)
+    
+def generateExpression(length, depth=0, function_density=0.0, seed=0):
+    """
+    Returns a synthetic formula over the names defined by _SESSION.
+    
+    @type length: int
+    @param length: The number of operands, divided evenly among the levels of
+        nesting.
+    @type depth: int
+    @param depth: The number of parenthesized groups nested within one
+        another.
+    @type function_density: float
+    @param function_density: The fraction of operands that are function calls.
+    @type seed: int
+    @param seed: The seed of the generator, so that workloads are repeatable.
+    
+    @rtype: str
+    @return: The formula.
+    """
+    generator = random.Random(seed)
+    def operands(count):
+        expression = []
+        for i in range(count):
+            if i:
+                expression.append(generator.choice(('+', '-', '+', '-', '*')))
+            if generator.random() < function_density:
+                expression.append(generator.choice(("g(a, %i)", "g(%i)", "sqrt(%i)")) % (generator.randint(1, 9)))
+            else:
+                expression.append(generator.choice(('a', 'b', 'c', str(generator.randint(1, 9)))))
+        return ' '.join(expression)
+        
+    count = max(1, length // (depth + 1))
+    expression = operands(count)
+    for level in range(depth):
+        expression = "(%s) %s %s" % (expression, generator.choice(('+', '-')), operands(count))
+    return expression
+    
+def generateSession(size, function_density=0.0, seed=0):
+    """
+    Returns synthetic definitions, extending _SESSION, in which each variable
+    averages a few of the variables and functions defined before it, and each
+    function one of the variables, so that values remain bounded.
+    
+    @type size: int
+    @param size: The number of variables and functions to define.
+    @type function_density: float
+    @param function_density: The fraction of definitions that are functions.
+    @type seed: int
+    @param seed: The seed of the generator, so that workloads are repeatable.
+    
+    @rtype: str
+    @return: The definitions, separated by semicolons.
+    """
+    generator = random.Random(seed)
+    (variables, functions, definitions) = (['a', 'b', 'c'], ['g'], [_SESSION])
+    for i in range(size):
+        terms = [generator.choice(variables[-10:]) for j in range(3)]
+        if generator.random() < function_density:
+            name = _name('f', i)
+            definitions.append("%s(x) = (x + g(%s)) / 3" % (name, terms[0]))
+            functions.append(name)
+        else:
+            name = _name('v', i)
+            definitions.append("%s = (%s + %s + %s(%s)) / 3" % (name, terms[0], terms[1], generator.choice(functions[-10:]), terms[2]))
+            variables.append(name)
+    return ';'.join(definitions)
+    
+def benchmarkPhases(lengths=(10, 100, 1000), depths=(0, 10), function_densities=(0.0, 0.5)):
+    """
+    Times each phase of compilation and evaluation for synthetic formulas:
+    tokenizing ('lex', by _parseLine() and _splitLine()), validating
+    ('validate', by _validateExpression()), ordering ('rpn', by _convertRPN()),
+    folding constants ('fold', by _foldConstants()), compiling in a single pass
+    ('parse', by _parseExpression()), and interpreting ('evaluate', by
+    _evaluateRPN()).
+    
+    @type lengths: sequence
+    @param lengths: The numbers of operands in each formula.
+    @type depths: sequence
+    @param depths: The depths of nesting of each formula.
+    @type function_densities: sequence
+    @param function_densities: The fractions of operands that are function
+        calls.
+        
+    @rtype: list
+    @return: A list of (<workload:str>, <phase:str>, <time:float>) timings,
+        in seconds per call.
+    """
+    session = calc.Session(_SESSION)
+    (functions, variables) = (session.getFunctions(), session.getVariables())
+    results = []
+    for length in lengths:
+        for depth in depths:
+            for function_density in function_densities:
+                workload = "length=%i,depth=%i,functions=%.2f" % (length, depth, function_density)
+                expression = generateExpression(length, depth, function_density)
+                tokens = calc._parseLine(expression)[0]
+                validated = calc._validateExpression(tokens, functions, variables)
+                ordered = calc._convertRPN(validated)
+                program = calc._Program(calc._parseExpression(tokens, functions, variables))
+                results.extend((workload, phase, _timeEach(function)) for (phase, function) in (
+                 ('lex', lambda: calc._parseLine(expression)),
+                 ('validate', lambda: calc._validateExpression(tokens, functions, variables)),
+                 ('rpn', lambda: calc._convertRPN(validated)),
+                 ('fold', lambda: calc._foldConstants(list(ordered))),
+                 ('parse', lambda: calc._parseExpression(tokens, functions, variables)),
+                 ('evaluate', lambda: calc._evaluateRPN(program, calc._CallStack(calc._MAX_DEPTH))),
+                ))
+    return results
+    
+def benchmarkSessions(sizes=(100, 1000, 10000), function_densities=(0.0, 0.2)):
+    """
+    Times the principal Session operations over synthetic sessions: 'construct'
+    (Session(input)), 'evaluate' (evaluate(), with every variable outdated),
+    'evaluate_equation' (of a formula not yet seen), 'evaluate_cached' (of
+    one compiled before), and 'share' (shareSubexpressions(), on a session
+    not yet shared).
+    
+    @type sizes: sequence
+    @param sizes: The numbers of definitions in each session.
+    @type function_densities: sequence
+    @param function_densities: The fractions of definitions that are
+        functions.
+        
+    @rtype: list
+    @return: A list of (<workload:str>, <operation:str>, <time:float>)
+        timings, in seconds per call.
+    """
+    results = []
+    for size in sizes:
+        for function_density in function_densities:
+            workload = "size=%i,functions=%.2f" % (size, function_density)
+            definitions = generateSession(size, function_density)
+            session = calc.Session(definitions)
+            variables = list(session.getVariables().values())
+            formula = generateExpression(50, 2, 0.2)
+            counter = itertools.count()
+            def evaluate():
+                for variable in variables:
+                    variable.reset()
+                session.evaluate()
+            results.extend((workload, operation, _timeEach(function)) for (operation, function) in (
+             ('construct', lambda: calc.Session(definitions)),
+             ('evaluate', evaluate),
+             ('evaluate_equation', lambda: session.evaluate_equation("%s + %i" % (formula, next(counter)))),
+             ('evaluate_cached', lambda: session.evaluate_equation(formula)),
+            ))
+            results.append((workload, 'share', _timeFresh(lambda: calc.Session(definitions), calc.Session.shareSubexpressions)))
+    return results
+    
+def runSuite():
+    """
+    Runs benchmarkPhases() and benchmarkSessions().
+    
+    @rtype: dict
+    @return: A dictionary, suitable for JSON, that identifies its format,
+        version, and Python interpreter and holds every timing, in seconds per
+        call, under 'results', keyed by '<group>/<phase>/<workload>'.
+    """
+    results = {}
+    for (group, timings) in (('phase', benchmarkPhases()), ('session', benchmarkSessions())):
+        for (workload, phase, seconds) in timings:
+            results['%s/%s/%s' % (group, phase, workload)] = seconds
+    return {
+     'format': _SUITE_FORMAT,
+     'version': _SUITE_VERSION,
+     'python': sys.version.split()[0],
+     'results': results,
+    }
+    
+def compareSuites(baseline, current, tolerance=_TOLERANCE):
+    """
+    Identifies the timings in a suite that exceed those of a baseline.
+    
+    @type baseline: dict
+    @param baseline: A dictionary produced by runSuite().
+    @type current: dict
+    @param current: A dictionary produced by runSuite().
+    @type tolerance: float
+    @param tolerance: The fraction by which a timing may exceed its baseline
+        before it is reported.
+        
+    @rtype: list
+    @return: A list of (<key:str>, <baseline:float>, <current:float>,
+        <ratio:float>) regressions, slowest first; timings missing from either
+        suite are ignored.
+        
+    @raise ValueError: If the baseline is not of the same format and version.
+    """
+    if baseline.get('format') != _SUITE_FORMAT or baseline.get('version') != _SUITE_VERSION:
+        raise ValueError("Baseline is not a version %i %s suite" % (_SUITE_VERSION, _SUITE_FORMAT))
+    regressions = []
+    for (key, seconds) in current['results'].items():
+        previous = baseline['results'].get(key)
+        if previous and seconds > previous * (1 + tolerance):
+            regressions.append((key, previous, seconds, seconds / previous))
+    return sorted(regressions, key=lambda regression: -regression[3])
+    
+def _main(arguments):
+    """
+    Writes or compares a suite, as described by this module's documentation.
+    
+    @type arguments: list
+    @param arguments: The command-line arguments, excluding the program name.
+    
+    @rtype: int
+    @return: The exit status.
+    """
+    if arguments[0] == '--json':
+        data = json.dumps(runSuite(), indent=1, sort_keys=True)
+        if len(arguments) > 1:
+            with open(arguments[1], 'w') as output:
+                output.write(data + '\n')
+        else:
+            print(data)
+        return 0
+        
+    if arguments[0] == '--compare' and len(arguments) in (2, 4):
+        tolerance = _TOLERANCE
+        if len(arguments) == 4 and arguments[2] == '--tolerance':
+            tolerance = float(arguments[3])
+        with open(arguments[1]) as input:
+            baseline = json.load(input)
+        current = runSuite()
+        regressions = compareSuites(baseline, current, tolerance)
+        print("%i of %i timings slower than the baseline by more than %.0f%%:" % (len(regressions), len(current['results']), tolerance * 100))
+        for (key, previous, seconds, ratio) in regressions:
+            print("\t%-55s %12.3fus %12.3fus (%5.2fx)" % (key, previous * 1e6, seconds * 1e6, ratio))
+        return regressions and 1 or 0
+        
+    sys.stderr.write("Usage: %s [--json [<file>] | --compare <baseline> [--tolerance <fraction>]]\n" % (sys.argv[0]))
+    return 2
+    
+def benchmarkBackends(repetitions=_REPETITIONS):
+    """
+    Compares the interpreter against closure-compiled and source-compiled
+    equations.
+    
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    
+    @rtype: list
+    @return: A list of (<formula:str>, <interpreted:float>, <closure:float>,
+        <source:float>) timings, in seconds.
+    """
+    session = calc.Session(_SESSION)
+    results = []
+    for formula in _FORMULAS:
+        interpreted = session.createEquation(formula)
+        closure = session.createEquation(formula)
+        closure.compileClosure()
+        source = session.createEquation(formula)
+        source.compileSource()
+        results.append((
+         formula,
+         _time(interpreted.evaluate, repetitions),
+         _time(closure.evaluate, repetitions),
+         _time(source.evaluate, repetitions),
+        ))
+    return results
+    
+def benchmarkPrograms(repetitions=_REPETITIONS):
+    """
+    Measures the size of each formula's compiled program against that of the
+    list of RPN tokens it encodes, and the cost of interpreting it.
+    
+    Sizes count the containers only, since the values and references they hold
+    are shared by both forms.
+    
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    
+    @rtype: list
+    @return: A list of (<formula:str>, <tokens:int>, <list bytes:int>,
+        <program bytes:int>, <time:float>) measurements, in seconds.
+    """
+    session = calc.Session(_SESSION)
+    results = []
+    for formula in _FORMULAS:
+        equation = session.createEquation(formula)
+        program = equation.getRPNTokens()
+        results.append((
+         formula,
+         len(program),
+         sys.getsizeof(list(program)),
+         sum(sys.getsizeof(pool) for pool in (program._opcodes, program._operands, program._constants, program._references)),
+         _time(equation.evaluate, repetitions),
+        ))
+    return results
+    
+def benchmarkIncremental(size=10000, repetitions=100):
+    """
+    Compares redefining one input of a large session, recomputing only its
+    dependents, against recomputing every variable, as evaluate() once did.
+    
+    @type size: int
+    @param size: The number of input variables, each with one dependent.
+    @type repetitions: int
+    @param repetitions: The number of redefinitions per measurement.
+    
+    @rtype: tuple
+    @return: The (<incremental:float>, <full:float>) timings, in seconds.
+    """
+    session = calc.Session(';'.join(
+     ["%s = %i" % (_name('x', i), i) for i in range(size)] +
+     ["%s = %s * 2 + %s" % (_name('y', i), _name('x', i), _name('x', (i + 1) % size)) for i in range(size)]
+    ))
+    variables = session.getVariables()
+    session.evaluate()
+    inputs = [session.createVariable("%s = %i" % (_name('x', 0), i)) for i in range(2)]
+    
+    def incremental():
+        session.setVariable(inputs[0])
+        inputs.reverse()
+        for name in (_name('y', 0), _name('y', size - 1)):
+            variables[name].compute()
+            
+    def full():
+        for variable in variables.values():
+            variable.reset()
+        for variable in variables.values():
+            variable.compute()
+            
+    return (_time(incremental, repetitions), _time(full, repetitions))
+    
+def benchmarkSharing(size=50, repetitions=100):
+    """
+    Compares evaluating a batch of equations that repeat the same
+    subexpressions, before and after Session.shareSubexpressions().
+    
+    @type size: int
+    @param size: The number of equations in the batch.
+    @type repetitions: int
+    @param repetitions: The number of batch evaluations per measurement.
+    
+    @rtype: tuple
+    @return: The (<independent:float>, <shared:float>) timings, in seconds,
+        and the statistics reported by shareSubexpressions().
+    """
+    definitions = _SESSION + ";mean = 4; sd = 2; x = 7"
+    equations = ';'.join("(x - mean) / sd * %i + g(c + x, h())" % (i + 1) for i in range(size))
+    independent = calc.Session(definitions + ';' + equations)
+    shared = calc.Session(definitions + ';' + equations)
+    statistics = shared.shareSubexpressions()
+    return (_time(independent.evaluate, repetitions), _time(shared.evaluate, repetitions), statistics)
+    
+def benchmarkMemoization(repetitions=_REPETITIONS):
+    """
+    Compares repeated calls to pure functions with and without memoization.
+    
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    
+    @rtype: tuple
+    @return: The (<unmemoized:float>, <memoized:float>) timings, in seconds.
+    """
+    definitions = "p(x) = sqrt(x ^ 2 + 1) * sin(x) / cos(x); q(x) = p(p(x) + 1) * 2"
+    formula = "q(q(q(2)))"
+    unmemoized = calc.Session(definitions)
+    for function in unmemoized.getFunctions().values():
+        function.setMemoSize(0)
+    memoized = calc.Session(definitions)
+    return (
+     _time(unmemoized.createEquation(formula).evaluate, repetitions),
+     _time(memoized.createEquation(formula).evaluate, repetitions),
+    )
+    
+def benchmarkDepth(depths=(10, 100, 1000), repetitions=100):
+    """
+    Measures the cost of evaluating chains of variables and of functions
+    nested to each of the given depths.
+    
+    Function memoization is disabled, so that every level is evaluated.
+    
+    @type depths: sequence
+    @param depths: The nesting depths to measure.
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    
+    @rtype: list
+    @return: A list of (<depth:int>, <variables:float>, <functions:float>)
+        timings, in seconds.
+    """
+    results = []
+    for depth in depths:
+        session = calc.Session(';'.join(
+         ["%s = %s + 1" % (_name('x', i + 1), _name('x', i)) for i in range(depth)] + [_name('x', 0) + " = 0"] +
+         ["%s(y) = %s(y) + 1" % (_name('f', i + 1), _name('f', i)) for i in range(depth)] + [_name('f', 0) + "(y) = y"]
+        ))
+        for function in session.getFunctions().values():
+            function.setMemoSize(0)
+        results.append((
+         depth,
+         _time(session.createEquation(_name('x', depth)).evaluate, repetitions),
+         _time(session.createEquation(_name('f', depth) + "(1)").evaluate, repetitions),
+        ))
+    return results
+    
+def benchmarkChains(lengths=(8000, 16000), repetitions=3):
+    """
+    Measures the cost of constructing sessions whose variables form a single
+    chain of references of each of the given lengths, each variable referring
+    to the next one defined, so that the search for cycles must follow the
+    entire chain.
+    
+    @type lengths: sequence
+    @param lengths: The numbers of links in each chain.
+    @type repetitions: int
+    @param repetitions: The number of constructions per measurement.
+    
+    @rtype: list
+    @return: A list of (<length:int>, <time:float>) timings, in seconds.
+    """
+    results = []
+    for length in lengths:
+        definitions = ';'.join(
+         ["%s = %s + 1" % (_name('x', i), _name('x', i + 1)) for i in range(length)] + [_name('x', length) + " = 0"]
+        )
+        results.append((length, _time(lambda: calc.Session(definitions), repetitions)))
+    return results
+    
+def benchmarkLexer(lengths=(10, 100, 1000, 10000, 100000), repetitions=10):
+    """
+    Measures the cost of tokenizing expressions of each of the given lengths.
+    
+    @type lengths: sequence
+    @param lengths: The minimum lengths, in characters, of the expressions.
+    @type repetitions: int
+    @param repetitions: The number of tokenizations per measurement.
+    
+    @rtype: list
+    @return: A list of (<characters:int>, <tokens:int>, <time:float>)
+        timings, in seconds.
+    """
+    terms = ("sqrt(x) * 2.5", "`rate`", "(b - .75) / c", "g(a, h())")
+    results = []
+    for length in lengths:
+        pieces = []
+        size = 0
+        while size < length:
+            pieces.append(terms[len(pieces) % len(terms)])
+            size += len(pieces[-1]) + 3
+        expression = ' + '.join(pieces)
+        results.append((
+         len(expression),
+         len(calc._splitLine(expression, expression)),
+         _time(lambda: calc._splitLine(expression, expression), repetitions),
+        ))
+    return results
+    
+def benchmarkCompilation(size=2000, repetitions=3):
+    """
+    Compares compiling large sessions with the single-pass parser against the
+    staged pipeline of validation, syntax checking, and RPN conversion, which
+    now only diagnoses malformed expressions, for both shallow and deeply
+    nested formulas.
+    
+    @type size: int
+    @param size: The number of variables in each session.
+    @type repetitions: int
+    @param repetitions: The number of compilations per measurement.
+    
+    @rtype: list
+    @return: A list of (<formulas:str>, <staged:float>, <single-pass:float>)
+        timings, in seconds.
+    """
+    nested = "a"
+    for i in range(8):
+        nested = "g(%s, -(b + %i)) * (2 + %s)" % (nested, i, nested if i < 3 else 'c')
+    formulas = (
+     ("shallow", "sqrt(%s + g(%i, c)) * -(a - 2b) / (1 + h()) ^ 2"),
+     ("nested", nested + " + %s * %i"),
+    )
+    results = []
+    for (label, formula) in formulas:
+        session = calc.Session(';'.join([_SESSION] + [
+         "%s = %s" % (_name('y', i), formula % (_name('x', i % 50), i))
+         for i in range(size)
+        ] + ["%s = %i" % (_name('x', i), i) for i in range(50)]))
+        variables = list(session.getVariables().values())
+        
+        def compile():
+            for variable in variables:
+                variable.recompile(session._functions, session._variables)
+                
+        parse = calc._parseExpression
+        calc._parseExpression = lambda raw_tokens, functions, variables: None
+        try:
+            staged = _time(compile, repetitions)
+        finally:
+            calc._parseExpression = parse
+        results.append((label, staged, _time(compile, repetitions)))
+    return results
+    
+def benchmarkFork(sizes=(1000, 10000, 50000), repetitions=100):
+    """
+    Compares building a Session from a library of definitions plus a few
+    request-specific variables against forking a Session built from the
+    library and defining the variables in the fork, then evaluating an
+    equation that depends on them.
+    
+    @type sizes: sequence
+    @param sizes: The numbers of variables in the library.
+    @type repetitions: int
+    @param repetitions: The number of forks per measurement.
+    
+    @rtype: list
+    @return: A list of (<size:int>, <rebuilt:float>, <forked:float>)
+        timings, in seconds, per request.
+    """
+    overrides = "rate = 3; bonus = 2"
+    formula = "g(%s, bonus) * rate"
+    results = []
+    for size in sizes:
+        library = ';'.join([_SESSION, "rate = 1", "bonus = 0"] + [
+         "%s = %s * 2 + %s" % (_name('x', i), _name('x', i // 2) if i else 'c', 'rate' if i == size - 1 else 'a')
+         for i in range(size)
+        ])
+        base = calc.Session(library)
+        equation = formula % (_name('x', size - 1))
+        results.append((
+         size,
+         _time(lambda: calc.Session(library + ';' + overrides).evaluate_equation(equation), 1),
+         _time(lambda: base.fork(overrides).evaluate_equation(equation), repetitions) / repetitions,
+        ))
+    return results
+    
+def benchmarkSerialization(size=20000, repetitions=3):
+    """
+    Compares building a large Session from its definitions against restoring
+    it from the output of Session.dumps().
+    
+    @type size: int
+    @param size: The number of variables in the session.
+    @type repetitions: int
+    @param repetitions: The number of constructions per measurement.
+    
+    @rtype: tuple
+    @return: The (<compiled:float>, <loaded:float>) timings, in seconds, and
+        the size of the serialized session, in bytes.
+    """
+    definitions = ';'.join([_SESSION] + [
+     "%s = sqrt(%s + g(%i, c)) * -(a - 2b) / (1 + h()) ^ 2" % (_name('y', i), _name('y', i - 1) if i else 'a', i)
+     for i in range(size)
+    ])
+    data = calc.Session(definitions).dumps()
+    return (
+     _time(lambda: calc.Session(definitions), repetitions),
+     _time(lambda: calc.Session().loads(data), repetitions),
+     len(data),
+    )
+    
+def benchmarkLookups(size=200, repetitions=100, delay=0.0001):
+    """
+    Compares evaluating expressions whose names are resolved by a slow lookup
+    handler with and without a lookup cache, and by a bulk lookup handler
+    that resolves them all at once, uncached.
+    
+    @type size: int
+    @param size: The number of externally resolved names in each expression.
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    @type delay: float
+    @param delay: The simulated cost, in seconds, of each handler call.
+    
+    @rtype: tuple
+    @return: The (<uncached:float>, <cached:float>, <bulk:float>) timings,
+        in seconds, and the number of handler calls the cache saved.
+    """
+    def handler(name):
+        time.sleep(delay)
+        if name.startswith('x'):
+            return 1
+        return None
+        
+    def bulkHandler(names, specs):
+        time.sleep(delay)
+        return dict((name, 1) for name in names if name.startswith('x'))
+        
+    expression = ' + '.join([_name('x', i) for i in range(size)] + ['pi', 'e'])
+    uncached = calc.Session(None, handler)
+    cached = calc.Session(None, handler, lookup_cache_size=size * 2)
+    return (
+     _time(lambda: uncached.evaluate_equation(expression), repetitions),
+     _time(lambda: cached.evaluate_equation(expression), repetitions),
+     _time(lambda: calc.Session(None, bulk_lookup_handler=bulkHandler).evaluate_equation(expression), repetitions),
+     cached.getLookupStatistics()['saved'],
+    )
+    
+def benchmarkAsync(size=50, repetitions=10, delay=0.001):
+    """
+    Compares compiling expressions whose names are resolved by a slow lookup
+    handler in a Session, one lookup after another, against an AsyncSession,
+    which makes them concurrently.
+    
+    @type size: int
+    @param size: The number of externally resolved names in each expression.
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    @type delay: float
+    @param delay: The simulated latency, in seconds, of each handler call.
+    
+    @rtype: tuple
+    @return: The (<sequential:float>, <concurrent:float>) timings, in seconds.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    def handler(name):
+        time.sleep(delay)
+        return 1
+    def asyncHandler(name):
+        future = loop.create_future()
+        loop.call_later(delay, future.set_result, 1)
+        return future
+        
+    expression = ' + '.join(_name('x', i) for i in range(size))
+    session = calc.Session(None, handler)
+    async_session = calc.AsyncSession(asyncHandler)
+    try:
+        return (
+         _time(lambda: session.evaluate_equation(expression), repetitions),
+         _time(lambda: loop.run_until_complete(async_session.evaluate_equation(expression)), repetitions),
+        )
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+        
+def benchmarkBindings(repetitions=_REPETITIONS):
+    """
+    Compares evaluating a stored formula for different inputs by redefining
+    its variables in the Session against binding them as placeholders.
+    
+    @type repetitions: int
+    @param repetitions: The number of evaluations per measurement.
+    
+    @rtype: tuple
+    @return: The (<redefined:float>, <bound:float>) timings, in seconds.
+    """
+    formula = "g(x, c) * y + h() - x / (y + 1)"
+    session = calc.Session(_SESSION + "; x = 0; y = 0")
+    def redefine():
+        session.setVariable(session.createVariable("x = 3"))
+        session.setVariable(session.createVariable("y = 4"))
+        return session.evaluate_equation(formula)
+        
+    equation = calc.Session(_SESSION).createEquation(formula, ('x', 'y'))
+    bindings = {'x': 3, 'y': 4}
+    return (
+     _time(redefine, repetitions),
+     _time(lambda: equation.evaluate(bindings=bindings), repetitions),
+    )
+    
+def benchmarkMemory(size=20000):
+    """
+    Measures the memory retained by large sessions of synthetic definitions,
+    per definition, with tracemalloc.
+    
+    @type size: int
+    @param size: The number of definitions in each session.
+    
+    @rtype: list
+    @return: A list of (<definitions:str>, <bytes per definition:float>)
+        measurements.
+    """
+    import tracemalloc
+    
+    kinds = (
+     ("variables", lambda i: "%s = %s * 2 + %s" % (_name('x', i), _name('x', i - 1) if i else '1', _name('x', i // 2) if i else '3')),
+     ("calls", lambda i: "%s = g(%s, h()) + g(%i + %s)" % (_name('y', i), 'c' if i % 2 else 'a', i, 'b')),
+     ("functions", lambda i: "%s(x, y) = x * y + g(x, %i)" % (_name('f', i), i)),
+    )
+    results = []
+    for (label, definition) in kinds:
+        definitions = ';'.join([_SESSION] + [definition(i) for i in range(size)])
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            session = calc.Session(definitions)
+            retained = tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+        results.append((label, retained / float(size)))
+        del session
+    return results
+    
+def benchmarkParallel(size=20000, workers=None):
+    """
+    Compares evaluating a large batch of independent equations serially
+    against evaluating it with a pool of worker processes, both started for
+    the evaluation and started in advance.
+    
+    @type size: int
+    @param size: The number of equations in the batch.
+    @type workers: int|None
+    @param workers: The number of worker processes; by default, one per CPU.
+    
+    @rtype: tuple
+    @return: The (<serial:float>, <cold:float>, <warm:float>) timings, in
+        seconds.
+    """
+    session = calc.Session(_SESSION + ';' + ';'.join(
+     "sqrt(%i) * g(c, h()) + sin(%i) ^ 2" % (i, i) for i in range(size)
+    ))
+    def cold():
+        session.evaluate_parallel(workers)
+        session.closeWorkers()
+    try:
+        serial = _time(session.evaluate, 1)
+        started = _time(cold, 1)
+        session.startWorkers(workers)
+        return (serial, started, _time(lambda: session.evaluate_parallel(workers), 1))
+    finally:
+        session.closeWorkers()
+    
+    
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        sys.exit(_main(sys.argv[1:]))
+        
+    print("Backends vs. _evaluateRPN (%i evaluations; interpreted, closure, source):" % (_REPETITIONS))
+    for (formula, interpreted, closure, source) in benchmarkBackends():
+        print("\t%-45s %8.4fs %8.4fs (%5.2fx) %8.4fs (%5.2fx)" % (
+         formula,
+         interpreted,
+         closure, interpreted / closure,
+         source, interpreted / source,
+        ))
+        
+    print("Compiled programs (%i evaluations; tokens, list bytes, program bytes, time):" % (_REPETITIONS))
+    for (formula, tokens, listed, encoded, seconds) in benchmarkPrograms():
+        print("\t%-45s %4i %6i %6i %8.4fs" % (formula, tokens, listed, encoded, seconds))
+        
+    (incremental, full) = benchmarkIncremental()
+    print("Redefining one of 10000 inputs (100 redefinitions; incremental, full):")
+    print("\t%8.4fs %8.4fs (%5.2fx)" % (incremental, full, full / incremental))
+        
+    (independent, shared, statistics) = benchmarkSharing()
+    print("Batch of 50 equations with repeated subexpressions (100 evaluations; independent, shared):")
+    print("\t%8.4fs %8.4fs (%5.2fx) %r" % (independent, shared, independent / shared, statistics))
+        
+    (unmemoized, memoized) = benchmarkMemoization()
+    print("Nested calls to pure functions (%i evaluations; unmemoized, memoized):" % (_REPETITIONS))
+    print("\t%8.4fs %8.4fs (%5.2fx)" % (unmemoized, memoized, unmemoized / memoized))
+        
+    print("Nested definitions (100 evaluations; variables, functions):")
+    for (depth, variables, functions) in benchmarkDepth():
+        print("\t%-5i %8.4fs %8.4fs" % (depth, variables, functions))
+        
+    print("Constructing chains of variables (3 constructions; links, time):")
+    for (length, seconds) in benchmarkChains():
+        print("\t%-5i %8.4fs" % (length, seconds))
+        
+    print("Tokenizing expressions (10 tokenizations; characters, tokens, time):")
+    for (characters, tokens, seconds) in benchmarkLexer():
+        print("\t%-7i %-7i %8.4fs" % (characters, tokens, seconds))
+        
+    print("Compiling sessions of 2000 variables (3 compilations; staged, single-pass):")
+    for (label, staged, single) in benchmarkCompilation():
+        print("\t%-8s %8.4fs %8.4fs (%5.2fx)" % (label, staged, single, staged / single))
+        
+    print("Per-request definitions over a library (rebuilt, forked):")
+    for (size, rebuilt, forked) in benchmarkFork():
+        print("\t%-6i %8.4fs %8.6fs (%5.0fx)" % (size, rebuilt, forked, rebuilt / forked))
+        
+    (compiled, loaded, size) = benchmarkSerialization()
+    print("Starting a session of 20000 variables (3 starts; compiled, loaded, serialized bytes):")
+    print("\t%8.4fs %8.4fs (%5.2fx) %i" % (compiled, loaded, compiled / loaded, size))
+        
+    (uncached, cached, bulk, saved) = benchmarkLookups()
+    print("Expressions of 200 handler-resolved names (100 evaluations; uncached, cached, bulk, calls saved):")
+    print("\t%8.4fs %8.4fs (%5.2fx) %8.4fs (%5.2fx) %i" % (uncached, cached, uncached / cached, bulk, uncached / bulk, saved))
+        
+    (sequential, concurrent) = benchmarkAsync()
+    print("Expressions of 50 names with slow lookups (10 evaluations; sequential, concurrent):")
+    print("\t%8.4fs %8.4fs (%5.2fx)" % (sequential, concurrent, sequential / concurrent))
+        
+    (redefined, bound) = benchmarkBindings()
+    print("Evaluating a formula for new inputs (%i evaluations; redefined, bound):" % (_REPETITIONS))
+    print("\t%8.4fs %8.4fs (%5.2fx)" % (redefined, bound, redefined / bound))
+    
+    print("Sessions of 20000 definitions (bytes per definition):")
+    for (label, size) in benchmarkMemory():
+        print("\t%-10s %8.1f" % (label, size))
+        
+    (serial, cold, warm) = benchmarkParallel()
+    print("Batch of 20000 equations (serial, parallel with new workers, parallel with started workers):")
+    print("\t%8.4fs %8.4fs (%5.2fx) %8.4fs (%5.2fx)" % (serial, cold, serial / cold, warm, serial / warm))
@@ -25,39 +25,99 @@ Legal
  You should have received a copy of the GNU Lesser General Public License
  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+import array
 import collections
 import functools
+import io
 import math
+import multiprocessing
 import numbers
+import operator
+import pickle
 import re
 import random
+import threading
+import time
+import types
+import weakref
 
+try:
+    import numpy
+except ImportError: #Vectorized evaluation will be unavailable.
+    numpy = None
+    
+try:
+    import concurrent.futures
+except ImportError: #Parallel evaluation will be unavailable.
+    concurrent = None
+    
+try:
+    import asyncio
+except ImportError: #Asynchronous sessions will be unavailable.
+    asyncio = None
+    
 #Python3 compatibility
 try:
     basestring
 except NameError:
     basestring = str
     
+try:
+    _monotonic = time.monotonic
+except AttributeError: #Python 2 has no monotonic clock.
+    _monotonic = time.time
+    
 #Constants
 ########################################
 _IDENTITIFER_PATTERN = r"(?:[A-Za-z_]+|`.+?`)" #: Patterns that can be used for a variable/function name.
-_NUMERIC_REGEXP = re.compile(r"^(\d+(?:\.\d+)?|\.\d+)") #: Matches numeric entities.
-_FUNCTION_REGEXP = re.compile(r"^(%s)\(" % (_IDENTITIFER_PATTERN)) #: Matches function entities.
-_VARIABLE_REGEXP = re.compile(r"^(%s)" % (_IDENTITIFER_PATTERN)) #: Matches variable entities.
+_TOKEN_REGEXP = re.compile(r"\s*(?:(\d+(?:\.\d+)?|\.\d+)|([A-Za-z_]+)(\()?|(\S))") #: Matches the next number, unquoted identifier, or other character, after any whitespace.
 
 _LINE_FUNCTION_REGEXP = re.compile(r"^(%s)\(\s*(?:((?:%s,\s*)*%s)\s*)?\)\s*=\s*(.+)$" % (_IDENTITIFER_PATTERN, _IDENTITIFER_PATTERN, _IDENTITIFER_PATTERN)) #: Determines whether a line is a function.
 _LINE_VARIABLE_REGEXP = re.compile(r"^(%s)\s*=\s*(.+)$" % (_IDENTITIFER_PATTERN)) #: Determines whether a line is a variable.
 
+_PARSE_FACTOR = 0 #: Indicates that the parser expects a factor, following an operator or nothing.
+_PARSE_NUMBER = 1 #: Indicates that the parser has just read a number.
+_PARSE_REFERENCE = 2 #: Indicates that the parser has just read a variable or function call.
+_PARSE_BRACKETS = 3 #: Indicates that the parser has just read a bracketed expression, after which multiplication is not implied.
+
 _LINE_EQUATION = 0 #: Indicates that a line seems to be an equation.
 _LINE_FUNCTION = 1 #: Indicates that a line seems to be a function.
 _LINE_VARIABLE = 2 #: Indicates that a line seems to be a variable.
 
+_EQUATION_CACHE_SIZE = 256 #: The default number of compiled equations retained by each Session.
+_FUNCTION_MEMO_SIZE = 128 #: The default number of results memoized by each pure Function.
+_LOOKUP_CACHE_SIZE = 0 #: The default number of external lookup results retained by each Session; none, since handlers may answer differently over time.
+_MAX_DEPTH = 10000 #: The default number of variables and functions that may be nested within a single evaluation.
+_VECTORIZED_INTEGER_LIMIT = 2.0 ** 62 #: The magnitude beyond which integer results of vectorized evaluation are computed exactly, rather than with 64-bit arithmetic that might overflow.
+_SERIALIZATION_FORMAT = 'calc.Session' #: Identifies data produced by Session.dumps().
+_SERIALIZATION_VERSION = 3 #: The revision of the compiled form stored by Session.dumps(); data of any other revision is recompiled from source.
+
 _FUNCTION_CUSTOM = 0 #: Indicates that a token is a custom function.
 _FUNCTION_BUILTIN = 1 #: Indicates that a token is a built-in function.
 _FUNCTION_EXTERNAL = 2 #: Indicates that the token is an external function.
 _VARIABLE_CUSTOM = 10 #: Indicates that a token is a custom variable.
 _VARIABLE_BUILTIN = 11 #: Indicates that a token is a built-in variable.
 _VARIABLE_EXTERNAL = 12 #: Indicates that a token is an external variable.
+_VARIABLE_PARAMETER = 13 #: Indicates that a token is a function parameter, resolved against the frame of the current call.
+
+_OPCODE_OPERATORS = ('^', '*', '/', '\\', '%', '+', '-', '<', '>') #: The binary operators, each encoded as the opcode of its position.
+_OPCODE_CONSTANT = 9 #: Pushes a value from a program's constant pool.
+_OPCODE_PARAMETER = 10 #: Pushes an argument from the frame of the current call.
+_OPCODE_VARIABLE = 11 #: Pushes the value of a custom variable.
+_OPCODE_VALUE = 12 #: Pushes the value of a built-in or external variable.
+_OPCODE_BUILTIN = 13 #: Calls a built-in function.
+_OPCODE_CALL = 14 #: Calls a custom or external function.
+_OPCODE_UNKNOWN = 15 #: Marks a reference of an unrecognized type.
+_OPCODE_SYMBOLS = dict((symbol, opcode) for (opcode, symbol) in enumerate(_OPCODE_OPERATORS)) #: The opcode of each binary operator.
+_OPCODE_REFERENCES = {
+ _VARIABLE_PARAMETER: _OPCODE_PARAMETER,
+ _VARIABLE_CUSTOM: _OPCODE_VARIABLE,
+ _VARIABLE_BUILTIN: _OPCODE_VALUE,
+ _VARIABLE_EXTERNAL: _OPCODE_VALUE,
+ _FUNCTION_BUILTIN: _OPCODE_BUILTIN,
+ _FUNCTION_CUSTOM: _OPCODE_CALL,
+ _FUNCTION_EXTERNAL: _OPCODE_CALL,
+} #: The opcode of each type of reference.
 
 _FUNCTION_PREFIX = 'f' #: Indicates that a token starts a function block.
 _PARAMETER_PREFIX = 'p' #: Indicates that a token is a function parameter.
@@ -83,6 +143,15 @@ _OPERATOR_PRECEDENCE = {
  '(': -1,
  ')': 0
 } #: The order in which operators should resolve.
+_CLOSURE_OPERATORS = {
+ _NEGATION_MULTIPLIER: operator.mul,
+ '*': operator.mul,
+ '%': operator.mod,
+ '+': operator.add,
+ '-': operator.sub,
+ '<': min,
+ '>': max,
+} #: Operators that need no guards when compiled into closures.
 
 
 #Built-in properties
@@ -224,6 +293,94 @@ def _generateBuiltinFunctions():
     return functions
 _FUNCTIONS = _generateBuiltinFunctions() #: Pre-defined functions.
 del _generateBuiltinFunctions #Remove the no-longer-necessary generator.
+_BUILTIN_FUNCTION_SPECS = dict((function, spec) for (spec, function) in _FUNCTIONS.items()) #: The (<arity>, <name>) of each pre-defined function, by which it is serialized.
+_VOLATILE_FUNCTIONS = frozenset(_FUNCTIONS[spec] for spec in (
+ (0, 'random'), (2, 'random'), (2, 'randomint'),
+)) #: Pre-defined functions whose results differ between calls.
+_INLINE_FUNCTIONS = dict((_FUNCTIONS[spec], template) for (spec, template) in (
+ ((1, 'abs'), "abs(%s)"),
+ ((1, 'acos'), "math.acos(%s)"),
+ ((1, 'asin'), "math.asin(%s)"),
+ ((1, 'atan'), "math.atan(%s)"),
+ ((2, 'atan'), "math.atan2(%s, %s)"),
+ ((1, 'ceil'), "int(math.ceil(%s))"),
+ ((1, 'cos'), "math.cos(%s)"),
+ ((1, 'degrees'), "math.degrees(%s)"),
+ ((1, 'floor'), "int(math.floor(%s))"),
+ ((1, 'ln'), "math.log(%s, math.e)"),
+ ((1, 'log'), "math.log(%s)"),
+ ((2, 'log'), "math.log(%s, %s)"),
+ ((1, 'radians'), "math.radians(%s)"),
+ ((1, 'sin'), "math.sin(%s)"),
+ ((1, 'tan'), "math.tan(%s)"),
+)) #: Built-in functions that need no guards, with the code that replaces them in generated source.
+
+def _generateVectorizedFunctions():
+    """
+    This function populates the catalogue of array implementations of the
+    built-in calculation functions, used by vectorized evaluation.
+    It is deleted immediately after execution is complete.
+    
+    All functions it defines take a sequence of NumPy arrays (or scalars) on
+    which they will operate and the number of rows being evaluated, returning
+    an array of computed values when done. Guards are applied to every row at
+    once, with errors identifying the rows that failed.
+    
+    Built-in functions that are not catalogued, or that receive integers too
+    large for NumPy's own types, are applied row-by-row.
+    
+    @return: A dictionary of array implementations, keyed by the built-in
+        functions they replace.
+    """
+    functions = {
+    }
+    
+    functions[_FUNCTIONS[(1, 'abs')]] = lambda args, rows: numpy.absolute(args[0])
+    functions[_FUNCTIONS[(1, 'acos')]] = lambda args, rows: numpy.arccos(args[0])
+    functions[_FUNCTIONS[(1, 'asin')]] = lambda args, rows: numpy.arcsin(args[0])
+    functions[_FUNCTIONS[(1, 'atan')]] = lambda args, rows: numpy.arctan(args[0])
+    functions[_FUNCTIONS[(2, 'atan')]] = lambda args, rows: numpy.arctan2(args[0], args[1])
+    functions[_FUNCTIONS[(1, 'ceil')]] = lambda args, rows: _integerVectorized(numpy.ceil(args[0]))
+    functions[_FUNCTIONS[(1, 'cos')]] = lambda args, rows: numpy.cos(args[0])
+    functions[_FUNCTIONS[(1, 'degrees')]] = lambda args, rows: numpy.degrees(args[0])
+    functions[_FUNCTIONS[(1, 'floor')]] = lambda args, rows: _integerVectorized(numpy.floor(args[0]))
+    functions[_FUNCTIONS[(1, 'ln')]] = lambda args, rows: numpy.log(args[0])
+    functions[_FUNCTIONS[(1, 'log')]] = lambda args, rows: numpy.log(args[0])
+    functions[_FUNCTIONS[(2, 'log')]] = lambda args, rows: numpy.log(args[0]) / numpy.log(args[1])
+    functions[_FUNCTIONS[(1, 'radians')]] = lambda args, rows: numpy.radians(args[0])
+    functions[_FUNCTIONS[(0, 'random')]] = lambda args, rows: numpy.random.random(rows)
+    functions[_FUNCTIONS[(2, 'random')]] = lambda args, rows: numpy.random.uniform(args[0], args[1], rows)
+    functions[_FUNCTIONS[(2, 'randomint')]] = lambda args, rows: numpy.random.randint(args[0], numpy.add(args[1], 1), rows)
+    functions[_FUNCTIONS[(1, 'sin')]] = lambda args, rows: numpy.sin(args[0])
+    functions[_FUNCTIONS[(1, 'tan')]] = lambda args, rows: numpy.tan(args[0])
+    
+    def _e(args, rows):
+        _checkVectorizedRows(numpy.greater(args[1], 9999), rows, "Exponents have been limited to prevent abuse. e() caps at 9999.")
+        if numpy.asarray(args[1]).dtype.kind in 'iu': #Integral powers of 10 are exact integers.
+            return _applyVectorized(_FUNCTIONS[(2, 'e')], args, rows)
+        return numpy.multiply(args[0], numpy.power(10.0, args[1]))
+    functions[_FUNCTIONS[(2, 'e')]] = _e
+    
+    def _fact(args, rows):
+        _checkVectorizedRows(numpy.greater(args[0], 100), rows, "Value passed to fact() (%i) is too large. Use 100 or less.", args[0])
+        return _applyVectorized(_FUNCTIONS[(1, 'fact')], args, rows)
+    functions[_FUNCTIONS[(1, 'fact')]] = _fact
+    
+    def _sqrt(args, rows):
+        _checkVectorizedRows(numpy.less(args[0], 0), rows, "Imaginary numbers suck. For seriously.")
+        return numpy.sqrt(args[0])
+    functions[_FUNCTIONS[(1, 'sqrt')]] = _sqrt
+    
+    def _sum(args, rows):
+        _checkVectorizedRows(numpy.greater(numpy.absolute(numpy.subtract(args[1], args[0])), 999999), rows, "Sums with over one million possible steps aren't supported.")
+        if len(args) == 3:
+            _checkVectorizedRows(numpy.equal(args[2], 0), rows, "A sum with a step of 0 will not resolve.")
+        return _applyVectorized(_FUNCTIONS[(2, 'sum')], args, rows)
+    functions[_FUNCTIONS[(2, 'sum')]] = _sum
+    
+    return functions
+_VECTORIZED_FUNCTIONS = _generateVectorizedFunctions() #: Array implementations of pre-defined functions.
+del _generateVectorizedFunctions #Remove the no-longer-necessary generator.
 
 
 #Calculator logic
@@ -287,40 +444,407 @@ def _parseLine(raw_line):
     return (tokens, line_type)
     
 def _splitLine(line, raw_line):
+    """
+    This function breaks an expression into tokens.
+    
+    The expression is scanned once, from left to right, with _TOKEN_REGEXP.
+    Quoted identifiers, which may span anything but a newline, are delimited
+    by searches that resume from their previous results, so that the scan
+    remains linear. As with _IDENTITIFER_PATTERN, a quoted identifier extends
+    to the nearest backtick that opens a function call, if any, and otherwise
+    to the next backtick.
+    
+    @type line: basestring
+    @param line: The expression to tokenize.
+    @type raw_line: basestring
+    @param raw_line: The line in which the expression appears, for errors.
+    
+    @rtype: list
+    @return: The tokens that make up the expression.
+    
+    @raise IllegalCharacterError: If the expression contains a character that
+        cannot begin a token.
+    """
+    found = {}
+    def find(substring, start):
+        index = found.get(substring)
+        if index is None or -1 < index < start:
+            index = found[substring] = line.find(substring, start)
+        return index
+        
     tokens = []
+    match = _TOKEN_REGEXP.match
+    position = 0
     while True:
-        line = line.lstrip()
-        if not line:
+        token = match(line, position)
+        if token is None: #Only whitespace remains.
             break
-            
-        match = _NUMERIC_REGEXP.match(line)
-        if match:
-            number = match.group(1)
+        position = token.end()
+        
+        (number, name, call, character) = token.groups()
+        if character == '`':
+            start = position - 1
+            newline = find('\n', start + 1)
+            end = find('`(', start + 2)
+            if end != -1 and (newline == -1 or newline > end):
+                (name, call, position) = (line[start:end + 1], '(', end + 2)
+            else:
+                end = find('`', start + 2)
+                if end != -1 and (newline == -1 or newline > end):
+                    (name, position) = (line[start:end + 1], end + 1)
+                    
+        if number is not None:
             if number.find('.') == -1:
                 tokens.append(int(number))
             else:
                 tokens.append(float(number))
-        else:
-            match = _FUNCTION_REGEXP.match(line)
-            if match:
-                tokens.append("%s:%s" % (_FUNCTION_PREFIX, _preprocessIdentifier(match.group(1))))
+        elif name is not None:
+            if call:
+                tokens.append("%s:%s" % (_FUNCTION_PREFIX, _preprocessIdentifier(name)))
                 tokens.append('(')
             else:
-                match = _VARIABLE_REGEXP.match(line)
-                if match:
-                    tokens.append("%s:%s" % (_VARIABLE_PREFIX, _preprocessIdentifier(match.group(1))))
-                else:
-                    if line[0] in _ALLOWED_TOKENS:
-                        tokens.append(line[0])
-                    else:
-                        raise IllegalCharacterError(raw_line, line[0])
-                        
-        if match:
-            line = line[match.end():]
+                tokens.append("%s:%s" % (_VARIABLE_PREFIX, _preprocessIdentifier(name)))
+        elif character in _ALLOWED_TOKENS:
+            tokens.append(character)
         else:
-            line = line[1:]
+            raise IllegalCharacterError(raw_line, character)
     return tokens
     
+def _collectReferences(tokens):
+    """
+    This function identifies every variable and function named in a tokenized
+    expression, including those inside function parameters.
+    
+    Built-in names are included, since they may be shadowed.
+    
+    @type tokens: list
+    @param tokens: The tokenized expression to be scanned.
+    
+    @rtype: set
+    @return: A set of (<prefix:str>, <name:str>) tuples, where prefix is
+        _VARIABLE_PREFIX or _FUNCTION_PREFIX; function arities are not
+        distinguished.
+    """
+    return set([
+     (token[0], token[2:]) for token in tokens
+     if isinstance(token, basestring) and token[1:2] == ':' and token[0] in (_FUNCTION_PREFIX, _VARIABLE_PREFIX)
+    ])
+    
+def _cacheKey(expression, placeholders):
+    """
+    This function provides the key under which a Session retains the compiled
+    form of an expression, which depends upon its placeholders, if any.
+    
+    @type expression: basestring
+    @param expression: The expression.
+    @type placeholders: sequence
+    @param placeholders: The names of the variables bound by each evaluation.
+    
+    @rtype: basestring|tuple
+    @return: The expression itself, if there are no placeholders, or a tuple
+        of the expression and its placeholders.
+    """
+    if placeholders:
+        return (expression, tuple(placeholders))
+    return expression
+    
+def _collectLookups(tokens):
+    """
+    This function identifies every variable and function named in a tokenized
+    expression, including those inside function parameters, with the arity of
+    each function call.
+    
+    Unlike _collectReferences(), function arities are distinguished, so that
+    the result may be given to a bulk lookup handler.
+    
+    @type tokens: list
+    @param tokens: The tokenized expression to be scanned.
+    
+    @rtype: list
+    @return: A list of unique (<prefix:str>, <key>) tuples, in order of
+        appearance, where key is a variable's name or a function's
+        (<arity:int>, <name:str>) spec.
+    """
+    keys = []
+    seen = set()
+    groups = [] #[<function name or None>, <commas:int>, <empty:bool>] per open parenthesis.
+    pending = None
+    for token in tokens:
+        if groups:
+            groups[-1][2] = groups[-1][2] and token == ')'
+        if token == '(':
+            groups.append([pending, 0, True])
+            pending = None
+        elif token == ')':
+            if groups:
+                (name, commas, empty) = groups.pop()
+                if name is not None:
+                    key = (_FUNCTION_PREFIX, (not empty and commas + 1 or 0, name))
+                    if not key in seen:
+                        seen.add(key)
+                        keys.append(key)
+        elif token == ',':
+            if groups:
+                groups[-1][1] += 1
+        elif isinstance(token, basestring) and token[1:2] == ':':
+            if token[0] == _FUNCTION_PREFIX:
+                pending = token[2:]
+            elif token[0] == _VARIABLE_PREFIX:
+                key = (_VARIABLE_PREFIX, token[2:])
+                if not key in seen:
+                    seen.add(key)
+                    keys.append(key)
+    return keys
+    
+def _collectEntityLookups(entities):
+    """
+    This function identifies, as _collectLookups() does, every variable and
+    function named by the given entities, omitting the parameters of
+    functions.
+    
+    @type entities: iterable
+    @param entities: The Equations to be scanned.
+    
+    @rtype: generator
+    @return: A generator of (<prefix:str>, <key>) tuples.
+    """
+    for entity in entities:
+        references = entity.getReferences()
+        for key in _collectLookups(entity.getTokens()):
+            if (key[0], key[0] == _FUNCTION_PREFIX and key[1][1] or key[1]) in references:
+                yield key
+                
+def _parseExpression(raw_tokens, functions, variables):
+    """
+    This function compiles a tokenized expression into an RPN stack in a
+    single pass, without recursion.
+    
+    Implicit multiplication and negation are applied exactly as by
+    _validateExpression(); names are resolved as they are reached; and the
+    arguments of each function call are compiled, as they are delimited, into
+    equations of their own. Operators are ordered with an operator stack,
+    following _OPERATOR_PRECEDENCE, as by _convertRPN(), and constants are
+    folded as they are emitted, as by _foldConstants().
+    
+    Malformed expressions are not diagnosed; the staged pipeline is deferred to
+    instead, so that errors are reported exactly as they otherwise would be.
+    
+    @type raw_tokens: list
+    @param raw_tokens: The tokenized expression to be compiled.
+    @type functions: defaultdict
+    @param functions: A dictionary of functions, keyed by arity and name.
+    @type variables: defaultdict
+    @param variables: A dictionary of variables, keyed by name.
+    
+    @rtype: list|None
+    @return: An RPN token stack representing the given expression, or None
+        if the expression cannot be compiled.
+    """
+    calls = [] #(<identifier>, <parameters>, <caller's state>), for each enclosing function call.
+    rpn = []
+    operators = []
+    depth = 0 #The number of open parentheses in the current expression.
+    start = 0 #The position at which the current expression begins.
+    state = _PARSE_FACTOR #What precedes the current token.
+    
+    position = 0
+    count = len(raw_tokens)
+    while position < count:
+        token = raw_tokens[position]
+        position += 1
+        if not isinstance(token, basestring):
+            if state != _PARSE_FACTOR:
+                if state != _PARSE_REFERENCE:
+                    return None
+                _pushOperator(rpn, operators, '*')
+            rpn.append(token)
+            state = _PARSE_NUMBER
+            
+        elif token in _OPERATOR_PRECEDENCE:
+            if token == '(':
+                if state != _PARSE_FACTOR:
+                    if state == _PARSE_BRACKETS:
+                        return None
+                    _pushOperator(rpn, operators, '*')
+                operators.append(token)
+                depth += 1
+                state = _PARSE_FACTOR
+            elif token == ')':
+                if not depth:
+                    if not calls:
+                        return None
+                    (rpn, operators, depth, start, state) = _parseExpression_argument(raw_tokens, position, rpn, operators, start, state, calls, functions, True)
+                    if rpn is None:
+                        return None
+                else:
+                    if state == _PARSE_FACTOR:
+                        return None
+                    while operators[-1] != '(':
+                        _emitOperator(rpn, operators.pop())
+                    operators.pop()
+                    depth -= 1
+                    state = _PARSE_BRACKETS
+            elif state == _PARSE_FACTOR:
+                if token != '-':
+                    return None
+                rpn.append(-1)
+                _pushOperator(rpn, operators, _NEGATION_MULTIPLIER)
+            else:
+                _pushOperator(rpn, operators, token)
+                state = _PARSE_FACTOR
+                
+        elif token[1:2] == ':' and token[0] in (_VARIABLE_PREFIX, _FUNCTION_PREFIX):
+            if state != _PARSE_FACTOR:
+                if state == _PARSE_BRACKETS:
+                    return None
+                _pushOperator(rpn, operators, '*')
+                
+            if token[0] == _VARIABLE_PREFIX:
+                variable = _resolveVariable(token[2:], variables)
+                if variable is None:
+                    return None
+                if variable[0] == _VARIABLE_BUILTIN:
+                    rpn.append(variable[1])
+                else:
+                    rpn.append(variable)
+                state = _PARSE_REFERENCE
+            else:
+                if position == count or raw_tokens[position] != '(':
+                    return None
+                position += 1
+                if position < count and raw_tokens[position] == ')': #A call without arguments.
+                    position += 1
+                    function = _resolveFunction(token[2:], (), functions)
+                    if function is None:
+                        return None
+                    _emitCall(rpn, function)
+                    state = _PARSE_REFERENCE
+                else:
+                    calls.append((token[2:], [], (rpn, operators, depth, start)))
+                    (rpn, operators, depth, start, state) = ([], [], 0, position, _PARSE_FACTOR)
+                    
+        elif token == _FUNCTION_DELIMITER and calls and not depth:
+            (rpn, operators, depth, start, state) = _parseExpression_argument(raw_tokens, position, rpn, operators, start, state, calls, functions, False)
+            if rpn is None:
+                return None
+                
+        else:
+            return None
+            
+    if calls or depth or state == _PARSE_FACTOR:
+        return None
+    while operators:
+        _emitOperator(rpn, operators.pop())
+    return rpn
+    
+def _parseExpression_argument(raw_tokens, position, rpn, operators, start, state, calls, functions, last):
+    """
+    This function completes an argument of the innermost function call being
+    compiled by _parseExpression(), and, if it is the call's last, the call
+    itself.
+    
+    @type raw_tokens: list
+    @param raw_tokens: The tokenized expression being compiled.
+    @type position: int
+    @param position: The position after the delimiter that ends the argument.
+    @type rpn: list
+    @param rpn: The RPN stack of the argument.
+    @type operators: list
+    @param operators: The operators of the argument not yet emitted.
+    @type start: int
+    @param start: The position at which the argument begins.
+    @type state: int
+    @param state: What precedes the delimiter, as one of the _PARSE_* values.
+    @type calls: list
+    @param calls: The function calls being compiled, innermost last.
+    @type functions: defaultdict
+    @param functions: A dictionary of functions, keyed by arity and name.
+    @type last: bool
+    @param last: True if the argument is delimited by the call's closing
+        parenthesis.
+        
+    @rtype: tuple
+    @return: The (<rpn>, <operators>, <depth>, <start>, <state>) with which
+        compilation continues, with rpn being None if the argument or call
+        cannot be compiled.
+    """
+    if state == _PARSE_FACTOR: #An empty or incomplete argument.
+        return (None, None, None, None, None)
+    while operators:
+        _emitOperator(rpn, operators.pop())
+    (identifier, parameters, caller) = calls[-1]
+    parameter = Equation(raw_tokens[start:position - 1])
+    parameter._equation = _Program(rpn)
+    parameters.append(parameter)
+    if not last:
+        return ([], [], 0, position, _PARSE_FACTOR)
+        
+    calls.pop()
+    function = _resolveFunction(identifier, tuple(parameters), functions)
+    if function is None:
+        return (None, None, None, None, None)
+    (rpn, operators, depth, start) = caller
+    _emitCall(rpn, function)
+    return (rpn, operators, depth, start, _PARSE_REFERENCE)
+    
+def _pushOperator(rpn, operators, symbol):
+    """
+    This function adds an operator to the operator stack of an expression being
+    compiled by _parseExpression(), first emitting those that take precedence
+    over it.
+    
+    @type rpn: list
+    @param rpn: The RPN stack being built.
+    @type operators: list
+    @param operators: The operators not yet emitted.
+    @type symbol: basestring
+    @param symbol: The operator to add.
+    """
+    precedence = _OPERATOR_PRECEDENCE[symbol]
+    while operators and _OPERATOR_PRECEDENCE[operators[-1]] >= precedence:
+        _emitOperator(rpn, operators.pop())
+    operators.append(symbol)
+    
+def _emitOperator(rpn, symbol):
+    """
+    This function appends an operator to an RPN stack being built by
+    _parseExpression(), replacing it and its operands with their value if both
+    are constants, as _foldConstants() would.
+    
+    @type rpn: list
+    @param rpn: The RPN stack being built.
+    @type symbol: basestring
+    @param symbol: The operator to append.
+    """
+    if len(rpn) > 1 and not isinstance(rpn[-1], (basestring, tuple)) and not isinstance(rpn[-2], (basestring, tuple)):
+        try:
+            rpn[-2:] = [_operate(symbol, rpn[-2], rpn[-1], rpn[-2:] + [symbol])]
+            return
+        except Exception:
+            pass
+    rpn.append(symbol)
+    
+def _emitCall(rpn, function):
+    """
+    This function appends a compiled function call to an RPN stack being built
+    by _parseExpression(), replacing it with its value if it is a non-random
+    built-in function with constant arguments, as _foldConstants() would.
+    
+    @type rpn: list
+    @param rpn: The RPN stack being built.
+    @type function: tuple
+    @param function: The compiled function call to append.
+    """
+    if function[0] == _FUNCTION_BUILTIN and not function[1] in _VOLATILE_FUNCTIONS:
+        arguments = [parameter.getRPNTokens() for parameter in function[2]]
+        if all(len(argument) == 1 and isinstance(argument[0], numbers.Number) for argument in arguments):
+            try:
+                rpn.append(function[1]([argument[0] for argument in arguments]))
+                return
+            except Exception:
+                pass
+    rpn.append(function)
+    
 def _validateExpression(raw_tokens, functions, variables):
     """
     This function performs a semantic check on an expression to make sure that
@@ -336,6 +860,9 @@ def _validateExpression(raw_tokens, functions, variables):
     This function returns a list containing a compiled version of the initial
     input.
     
+    Well-formed expressions are compiled by _parseExpression() instead; this
+    function identifies the problems with those that it cannot compile.
+    
     @type raw_tokens: list
     @param raw_tokens: The tokenized expression to be validated.
     @type functions: defaultdict
@@ -503,16 +1030,36 @@ def _validateExpression_variable(raw_tokens, token, variables):
     @raise VariableError: If the named variable does not exist.
     """
     identifier = token[2:]
-    variable = variables[identifier]
-    if variable is not None:
-        return (identifier in variables and _VARIABLE_CUSTOM or _VARIABLE_EXTERNAL, variable)
-        
-    variable = _VARIABLES.get(identifier) #Look for a builtin variable.
+    variable = _resolveVariable(identifier, variables)
     if variable is not None:
         return variable
         
     raise VariableError(identifier, raw_tokens)
     
+def _resolveVariable(identifier, variables):
+    """
+    This function finds the variable with the given name, preferring the given
+    variables to built-in ones.
+    
+    @type identifier: basestring
+    @param identifier: The name of the variable.
+    @type variables: defaultdict
+    @param variables: A dictionary of variables, keyed by name.
+    
+    @rtype: tuple|None
+    @return: A compiled reference to the variable, or None if it does not
+        exist.
+    """
+    variable = variables[identifier]
+    if isinstance(variable, Parameter):
+        return (_VARIABLE_PARAMETER, variable, variable.getIndex())
+    if variable is not None:
+        if identifier in variables or isinstance(variable, Variable): #Inherited by forks, or defined elsewhere.
+            return (_VARIABLE_CUSTOM, variable)
+        return (_VARIABLE_EXTERNAL, variable)
+        
+    return _VARIABLES.get(identifier) #Look for a builtin variable.
+    
 def _validateExpression_function(raw_tokens, token, tokens, functions, variables):
     """
     This function processes an instance of a function within an expression's
@@ -552,9 +1099,28 @@ def _validateExpression_function(raw_tokens, token, tokens, functions, variables
     """
     identifier = token[2:]
     parameters = _validateExpression_parameters(raw_tokens, tokens, identifier, functions, variables)
-    arity = len(parameters)
-    spec = (arity, identifier)
+    function = _resolveFunction(identifier, parameters, functions)
+    if function is not None:
+        return function
+        
+    raise FunctionError(identifier, len(parameters), tokens)
+    
+def _resolveFunction(identifier, parameters, functions):
+    """
+    This function finds the function with the given name and arity, preferring
+    the given functions to built-in ones.
+    
+    @type identifier: basestring
+    @param identifier: The name of the function.
+    @type parameters: tuple
+    @param parameters: The compiled equations passed as arguments.
+    @type functions: defaultdict
+    @param functions: A dictionary of functions, keyed by arity and name.
     
+    @rtype: tuple|None
+    @return: A compiled call to the function, or None if it does not exist.
+    """
+    spec = (len(parameters), identifier)
     function = functions[spec]
     if function is not None:
         return (spec in functions and _FUNCTION_CUSTOM or _FUNCTION_EXTERNAL, function, parameters)
@@ -562,8 +1128,7 @@ def _validateExpression_function(raw_tokens, token, tokens, functions, variables
     function = _FUNCTIONS.get(spec)
     if function is not None:
         return (_FUNCTION_BUILTIN, function, parameters)
-        
-    raise FunctionError(identifier, arity, tokens)
+    return None
     
 def _validateExpression_parameters(raw_tokens, tokens, function_name, functions, variables):
     """
@@ -681,24 +1246,219 @@ def _convertRPN(tokens):
         
     return rpn_tokens
     
-def _evaluateRPN(tokens, call_stack):
+def _foldConstants(tokens):
+    """
+    This function simplifies an RPN stack by replacing every sub-sequence
+    whose value cannot change, being made only of literals, built-in variables,
+    and non-random built-in functions with constant arguments, with its
+    value. This includes the negation sequences inserted for unary minus.
+    
+    Sub-sequences that fail to evaluate are left intact, so that the error is
+    raised when the expression is evaluated, as it otherwise would be.
+    
+    @type tokens: list
+    @param tokens: The RPN stack to simplify.
+    
+    @rtype: list
+    @return: An equivalent RPN stack; the original, if it is malformed.
+    """
+    stack = [] #(<constant:bool>, <tokens:list>) segments.
+    for token in tokens:
+        if token in _PURE_OPERATORS:
+            if len(stack) < 2:
+                return tokens
+            (constant_right, tokens_right) = stack.pop()
+            (constant_left, tokens_left) = stack.pop()
+            segment = tokens_left + tokens_right + [token]
+            if constant_left and constant_right:
+                try:
+                    stack.append((True, [_evaluateRPN(segment, _CallStack())]))
+                    continue
+                except Exception:
+                    pass
+            stack.append((False, segment))
+        elif type(token) == tuple:
+            if token[0] == _VARIABLE_BUILTIN:
+                stack.append((True, [token[1]]))
+            elif token[0] == _FUNCTION_BUILTIN and not token[1] in _VOLATILE_FUNCTIONS and all(
+             len(parameter.getRPNTokens()) == 1 and isinstance(parameter.getRPNTokens()[0], numbers.Number)
+             for parameter in token[2]
+            ):
+                try:
+                    stack.append((True, [_evaluate(token, _CallStack())]))
+                except Exception:
+                    stack.append((False, [token]))
+            else:
+                stack.append((False, [token]))
+        else:
+            stack.append((isinstance(token, numbers.Number), [token]))
+            
+    folded = []
+    for (constant, segment) in stack:
+        folded += segment
+    return folded
+    
+def _shareSubexpressions(equations, create):
+    """
+    This function finds subexpressions that appear more than once among the
+    compiled RPN stacks of the given equations, including the equations passed
+    as function parameters, and replaces every occurrence of each with a
+    reference to a single variable that computes it.
+    
+    Subexpressions that involve function parameters or volatile entities are
+    never shared, and neither are those that only ever appear inside one
+    enclosing shared subexpression.
+    
+    @type equations: sequence
+    @param equations: The compiled Equations to be rewritten in place.
+    @type create: callable
+    @param create: A callable that returns a new Variable, which caches its
+        value, to which a shared subexpression's RPN stack will be assigned.
+        
+    @rtype: tuple
+    @return: A list of the Variables created and a dictionary of statistics:
+        'subexpressions', the number of distinct subexpressions shared;
+        'occurrences', the number of places in which they were substituted;
+        and 'nodes', the number of RPN tokens no longer evaluated repeatedly.
+    """
+    nodes = [] #[<key>, <parent key>, <tokens>, <start>, <end>, <pure>] for every compound subexpression.
+    def index(tokens):
+        stack = [] #(<key>, <start>, <pure>, <node>)
+        for (position, token) in enumerate(tokens):
+            node = None
+            if token in _PURE_OPERATORS:
+                if len(stack) < 2:
+                    return None
+                (key_right, start_right, pure_right, node_right) = stack.pop()
+                (key_left, start, pure_left, node_left) = stack.pop()
+                key = (token, key_left, key_right)
+                pure = pure_left and pure_right
+                children = (node_left, node_right)
+                node = len(nodes)
+            elif type(token) == tuple:
+                start = position
+                if token[0] in (_VARIABLE_BUILTIN, _VARIABLE_EXTERNAL):
+                    (key, pure, children) = ((token[0], repr(token[1])), True, ())
+                elif token[0] == _VARIABLE_CUSTOM:
+                    (key, pure, children) = ((token[0], id(token[1])), not _isVolatileReference(token), ())
+                elif token[0] == _VARIABLE_PARAMETER:
+                    (key, pure, children) = ((token[0], id(token[1])), False, ())
+                else:
+                    arguments = [index(parameter.getRPNTokens()) for parameter in token[2]]
+                    if None in arguments:
+                        return None
+                    key = (token[0], id(token[1]), tuple(key for (key, pure, node) in arguments))
+                    pure = not _isVolatileReference(token) and all(pure for (key, pure, node) in arguments)
+                    children = [node for (key, pure, node) in arguments]
+                    node = len(nodes)
+            else:
+                (start, key, pure, children) = (position, ('n', repr(token)), True, ())
+                
+            if node is not None:
+                nodes.append([key, None, tokens, start, position + 1, pure])
+                for child in children:
+                    if child is not None:
+                        nodes[child][1] = key
+            stack.append((key, start, pure, node))
+            
+        if len(stack) != 1:
+            return None
+        return (stack[0][0], stack[0][2], stack[0][3])
+        
+    for equation in equations:
+        index(equation.getRPNTokens())
+        
+    counts = {}
+    parents = {}
+    for (key, parent, tokens, start, end, pure) in nodes:
+        if pure:
+            counts[key] = counts.get(key, 0) + 1
+            parents.setdefault(key, set()).add(parent)
+            
+    shared = {}
+    def isShared(key):
+        if not key in shared:
+            shared[key] = counts.get(key, 0) > 1
+            if shared[key] and len(parents[key]) == 1:
+                parent = tuple(parents[key])[0]
+                if parent is not None and isShared(parent) and counts[key] == counts[parent]:
+                    shared[key] = False
+        return shared[key]
+        
+    spans = {} #Shared occurrences, as (<start>, <end>, <key>), keyed by the id of the stack in which they appear.
+    definitions = {} #The first occurrence of each shared subexpression.
+    stacks = {}
+    for (key, parent, tokens, start, end, pure) in nodes:
+        if pure and isShared(key):
+            spans.setdefault(id(tokens), []).append((start, end, key))
+            stacks[id(tokens)] = tokens
+            definitions.setdefault(key, (tokens, start, end))
+            
+    def substitute(tokens, offset, limit, exclude):
+        result = []
+        position = offset
+        for (start, end, key) in sorted(spans.get(id(tokens), ()), key=lambda span: (span[0], -span[1])):
+            if start < position or end > limit or (start, end) == exclude:
+                continue
+            result.extend(tokens[position:start])
+            result.append((_VARIABLE_CUSTOM, variables[key]))
+            position = end
+        result.extend(tokens[position:limit])
+        return result
+        
+    variables = dict((key, create()) for key in definitions)
+    for (key, (tokens, start, end)) in definitions.items():
+        variables[key]._equation = _Program(substitute(tokens, start, end, (start, end)))
+    for tokens in stacks.values():
+        tokens.encode(substitute(tokens, 0, len(tokens), None))
+        
+    #Count only the substitutions that remain reachable, since those made
+    #within the arguments of a replaced function call are discarded with it.
+    sizes = dict((variables[key], end - start) for (key, (tokens, start, end)) in definitions.items())
+    occurrences = dict((variable, 0) for variable in sizes)
+    for tokens in [equation.getRPNTokens() for equation in equations] + [variable.getRPNTokens() for variable in sizes]:
+        for reference in _walkReferences(tokens):
+            if reference[0] == _VARIABLE_CUSTOM and reference[1] in occurrences:
+                occurrences[reference[1]] += 1
+                
+    return (list(variables.values()), {
+     'subexpressions': len(variables),
+     'occurrences': sum(occurrences.values()),
+     'nodes': sum((occurrences[variable] - 1) * size for (variable, size) in sizes.items()),
+    })
+    
+def _evaluateRPN(tokens, call_stack, frame=()):
     """
     This function evaluates an RPN-i-fied expression.
     
     Each factor in the token stack is individually evaluated to ensure that
     function and variable values are computed only when needed.
     
-    @type tokens: list
-    @param tokens: The RPN stack to evaluate.
-    @type call_stack: list
+    Custom variables, custom functions, and function arguments are descended
+    into with an explicit work stack, rather than through Python calls, so the
+    depth to which definitions may be nested is bounded by the call stack's
+    limit, not by the interpreter's recursion limit.
+    
+    Programs are executed by opcode, with binary operators dispatched through
+    _OPCODE_OPERATIONS, so no token is compared against strings or inspected
+    for its type while evaluating.
+    
+    @type tokens: _Program|list
+    @param tokens: The RPN stack to evaluate; lists are encoded first.
+    @type call_stack: _CallStack
     @param call_stack: A stack containing every function and variable traversed
         up to this point.
+    @type frame: sequence
+    @param frame: The argument values of the function call being evaluated,
+        indexed by parameter position.
     
     @rtype: int|float
     @return: The result of the evaluation.
     
+    @raise RecursionError: If a variable or function is invoked while it is
+        already being evaluated.
     @raise ThresholdError: If the values passed to an operand or function exceed
-        pre-defined limits.
+        pre-defined limits, or if definitions are nested too deeply.
     @raise DivisionByZeroError: If a division by zero would occur as a result of
         an operation.
     @raise IncompleteExpressionError: If there are excessive tokens in the input
@@ -706,98 +1466,1081 @@ def _evaluateRPN(tokens, call_stack):
     @raise NullSubexpressionError: If a bracketed expression contains no
         content.
     """
-    stack = []
-    for i in tokens:
-        if i in _PURE_OPERATORS:
-            token_right = stack.pop()
-            token_left = stack.pop()
-            value_right = _evaluate(token_right, call_stack)
-            value_left = _evaluate(token_left, call_stack)
-            
-            if i == '^':
-                if value_left > 9999999 or value_right > 1024:
-                    raise ThresholdError("The time required to calculate such a power is too great.")
-                stack.append(value_left ** value_right)
-            elif i in ('*', _NEGATION_MULTIPLIER):
-                stack.append(value_left * value_right)
-            elif i == '/':
-                if value_right == 0:
-                    raise DivisionByZeroError(token_left, token_right, ['RPN:'] + tokens)
+    program = tokens
+    if type(program) != _Program:
+        program = _Program(program)
+    operations = _OPCODE_OPERATIONS
+    values = [] #Operands of every expression being evaluated, each above its predecessor's.
+    activations = [] #Suspended evaluations, as [<program>, <position>, <frame>, <base>, <entity>, <memo key>].
+    calls = [] #[<token>, <frame>, <next argument>, <base>], for functions whose arguments are being evaluated.
+    (opcodes, operands, constants, references) = (program._opcodes, program._operands, program._constants, program._references)
+    (position, base, entity, key) = (0, 0, None, None)
+    try:
+        while True:
+            call = None
+            if position < len(opcodes):
+                opcode = opcodes[position]
+                operand = operands[position]
+                position += 1
+                if opcode < _OPCODE_CONSTANT:
+                    if len(values) - base < 2:
+                        raise IncompleteExpressionError(['RPN:'] + program)
+                    value_right = values.pop()
+                    values[-1] = operations[opcode](values[-1], value_right, program)
+                    continue
+                elif opcode == _OPCODE_CONSTANT:
+                    values.append(constants[operand])
+                    continue
+                elif opcode == _OPCODE_PARAMETER:
+                    values.append(frame[references[operand][2]])
+                    continue
+                elif opcode == _OPCODE_VALUE:
+                    values.append(references[operand][1])
+                    continue
+                elif opcode == _OPCODE_VARIABLE:
+                    variable = references[operand][1]
+                    if variable._computed_value is not None:
+                        values.append(variable._computed_value)
+                    elif type(variable) in (Variable, _SharedSubexpression) and variable._equation is not None:
+                        _enterCall(call_stack, variable)
+                        activations.append([program, position, frame, base, entity, key])
+                        program = variable._equation
+                        (opcodes, operands, constants, references) = (program._opcodes, program._operands, program._constants, program._references)
+                        (position, frame, base, entity, key) = (0, (), len(values), variable, None)
+                    else:
+                        values.append(variable.evaluate(call_stack))
+                    continue
+                elif opcode == _OPCODE_UNKNOWN:
+                    raise UnknownTypeError(references[operand])
                     
-                stack.append(value_left / float(value_right))
-            elif i == '\\':
-                if value_right == 0:
-                    raise DivisionByZeroError(token_left, token_right, ['RPN:'] + tokens)
+                token = references[operand]
+                if not token[2]:
+                    call = (token, [])
+                else:
+                    calls.append([token, frame, 1, len(values)])
+                    activations.append([program, position, frame, base, entity, key])
+                    program = _argumentProgram(token[2][0])
+                    (opcodes, operands, constants, references) = (program._opcodes, program._operands, program._constants, program._references)
+                    (position, base, entity, key) = (0, len(values), None, True)
+                    continue
+            else:
+                #The program is exhausted; its value is the only operand above its base.
+                count = len(values) - base
+                if count > 1:
+                    raise IncompleteExpressionError(['RPN:'] + program)
+                if count < 1:
+                    raise NullSubexpressionError()
                     
-                stack.append(int(value_left // value_right))
-            elif i == '%':
-                stack.append(value_left % value_right)
-            elif i == '+':
-                stack.append(value_left + value_right)
-            elif i == '-':
-                stack.append(value_left - value_right)
-            elif i == '<':
-                stack.append(min(value_left, value_right))
-            elif i == '>':
-                stack.append(max(value_left, value_right))
-        else:
-            stack.append(_evaluate(i, call_stack))
-            
-    if len(stack) > 1:
-        raise IncompleteExpressionError(['RPN:'] + tokens)
-    if len(stack) < 1:
-        raise NullSubexpressionError()
-        
-    return stack[0]
+                argument = False
+                if entity is not None:
+                    del call_stack[entity]
+                    if key is not None:
+                        entity._memo.put(key, values[-1])
+                    elif type(entity) == _SharedSubexpression:
+                        entity._computed_value = values[-1]
+                else:
+                    argument = key is not None
+                    
+                if not activations:
+                    return values[0]
+                (program, position, frame, base, entity, key) = activations.pop()
+                (opcodes, operands, constants, references) = (program._opcodes, program._operands, program._constants, program._references)
+                if not argument:
+                    continue
+                    
+                pending = calls[-1]
+                arguments = pending[0][2]
+                if pending[2] < len(arguments):
+                    activations.append([program, position, frame, base, entity, key])
+                    program = _argumentProgram(arguments[pending[2]])
+                    (opcodes, operands, constants, references) = (program._opcodes, program._operands, program._constants, program._references)
+                    (position, frame, base, entity, key) = (0, pending[1], len(values), None, True)
+                    pending[2] += 1
+                    continue
+                calls.pop()
+                call = (pending[0], values[pending[3]:])
+                del values[pending[3]:]
+                
+            #A function's arguments have been evaluated; apply it.
+            (token, arguments) = call
+            function = token[1]
+            if token[0] == _FUNCTION_BUILTIN:
+                values.append(function(arguments))
+            elif type(function) == Function and function._equation is not None:
+                memo_key = function._getMemoKey(arguments)
+                if memo_key is not None:
+                    result = function._memo.get(memo_key)
+                    if result is not None:
+                        values.append(result)
+                        continue
+                _enterCall(call_stack, function)
+                activations.append([program, position, frame, base, entity, key])
+                program = function._equation
+                (opcodes, operands, constants, references) = (program._opcodes, program._operands, program._constants, program._references)
+                (position, frame, base, entity, key) = (0, arguments, len(values), function, memo_key)
+            else:
+                values.append(function.evaluate(arguments, call_stack))
+    finally:
+        if entity is not None:
+            call_stack.pop(entity, None)
+        for activation in activations:
+            if activation[4] is not None:
+                call_stack.pop(activation[4], None)
+                
+def _argumentProgram(argument):
+    """
+    This function provides the compiled form of a function argument, for
+    evaluation by _evaluateRPN() against the frame of the call in which it
+    appears.
+    
+    @type argument: Equation
+    @param argument: The argument to evaluate.
+    
+    @rtype: _Program
+    @return: The argument's program.
+    
+    @raise CompilationError: If the argument has not been compiled.
+    """
+    program = argument.getRPNTokens()
+    if program is None:
+        raise CompilationError(argument._tokens)
+    if type(program) != _Program:
+        program = _Program(program)
+    return program
+    
+def _enterCall(call_stack, entity):
+    """
+    This function records that a variable or function is being evaluated.
+    
+    @type call_stack: _CallStack
+    @param call_stack: A stack containing every function and variable traversed
+        up to this point.
+    @type entity: Equation
+    @param entity: The variable or function being entered.
+    
+    @raise RecursionError: If the entity is already being evaluated.
+    @raise ThresholdError: If the call stack has reached its maximum depth.
+    """
+    if entity in call_stack:
+        raise RecursionError(list(call_stack) + [entity])
+    if len(call_stack) >= call_stack.getMaxDepth():
+        raise ThresholdError("Definitions may not be nested more than %i levels deep." % (call_stack.getMaxDepth()))
+    call_stack[entity] = None
+    
+def _operate(symbol, value_left, value_right, tokens):
+    """
+    This function applies an arithmetic operator to a pair of values.
+    
+    @type symbol: basestring
+    @param symbol: The operator to apply.
+    @type value_left: int|float
+    @param value_left: The left operand.
+    @type value_right: int|float
+    @param value_right: The right operand.
+    @type tokens: list
+    @param tokens: The RPN stack in which the operator appears, for errors.
+    
+    @rtype: int|float
+    @return: The result of the operation.
+    
+    @raise ThresholdError: If the operands exceed pre-defined limits.
+    @raise DivisionByZeroError: If a division by zero would occur.
+    """
+    return _OPCODE_OPERATIONS[_OPCODE_OPERATORS.index(symbol)](value_left, value_right, tokens)
+    
+def _operate_power(value_left, value_right, tokens):
+    if value_left > 9999999 or value_right > 1024:
+        raise ThresholdError("The time required to calculate such a power is too great.")
+    return value_left ** value_right
     
-def _evaluate(token, call_stack):
+def _operate_divide(value_left, value_right, tokens):
+    if value_right == 0:
+        raise DivisionByZeroError(value_left, value_right, ['RPN:'] + tokens)
+    return value_left / float(value_right)
+    
+def _operate_floorDivide(value_left, value_right, tokens):
+    if value_right == 0:
+        raise DivisionByZeroError(value_left, value_right, ['RPN:'] + tokens)
+    return int(value_left // value_right)
+    
+_OPCODE_OPERATIONS = (
+ _operate_power,
+ lambda value_left, value_right, tokens: value_left * value_right,
+ _operate_divide,
+ _operate_floorDivide,
+ lambda value_left, value_right, tokens: value_left % value_right,
+ lambda value_left, value_right, tokens: value_left + value_right,
+ lambda value_left, value_right, tokens: value_left - value_right,
+ lambda value_left, value_right, tokens: min(value_left, value_right),
+ lambda value_left, value_right, tokens: max(value_left, value_right),
+) #: The implementation of each binary operator, indexed by opcode.
+
+def _evaluate(token, call_stack, frame=()):
     """
     This function evaluates a token to provide a value processable by the
     computation mechanism.
     
+    Function arguments are evaluated against the caller's frame.
+    
     @type token: int|float|tuple
     @param token: The token to evaluate.
-    @type call_stack: list
+    @type call_stack: _CallStack
     @param call_stack: A stack containing every function and variable traversed
         up to this point.
+    @type frame: sequence
+    @param frame: The argument values of the function call being evaluated,
+        indexed by parameter position.
     
     @rtype: int|float
     @return: The value of the token.
     """
     if type(token) == tuple:
-        if token[0] == _VARIABLE_CUSTOM:
+        if token[0] == _VARIABLE_PARAMETER:
+            return frame[token[2]]
+        elif token[0] == _VARIABLE_CUSTOM:
             return token[1].evaluate(call_stack)
         elif token[0] in (_VARIABLE_BUILTIN, _VARIABLE_EXTERNAL):
             return token[1]
-        elif token[0] == _FUNCTION_CUSTOM:
-            return token[1].evaluate(token[2], call_stack)
         elif token[0] == _FUNCTION_BUILTIN:
-            return token[1]([i.evaluate(call_stack) for i in token[2]])
-        elif token[0] == _FUNCTION_EXTERNAL:
-            return token[1].evaluate([i.evaluate(call_stack) for i in token[2]], call_stack)
+            return token[1]([i.evaluate(call_stack, frame) for i in token[2]])
+        elif token[0] in (_FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+            return token[1].evaluate([i.evaluate(call_stack, frame) for i in token[2]], call_stack)
         else:
             raise UnknownTypeError(token)
     return token
     
-def _renderExpression(tokens):
+def _walkReferences(tokens):
     """
-    This function provides a mostly-sane, human-readable rendition of the tokens
-    that make up an expression processed by the lexer.
+    This function provides every variable and function reference in a compiled
+    RPN stack, descending into the equations passed as function parameters.
     
     @type tokens: list
-    @param tokens: The expression to render
+    @param tokens: The RPN stack to scan.
     
-    @rtype: str
-    @return: A rendition of the expression.
+    @rtype: generator
+    @return: A generator that provides each compiled reference tuple.
     """
-    buffer = []
-    pad = False
-    pad_character = ' '
-    for i in tokens:
-        if pad and not i in (')', _FUNCTION_DELIMITER):
-            buffer.append(pad_character)
+    if type(tokens) == _Program: #Only the reference pool need be scanned.
+        tokens = tokens._references
+    for token in tokens:
+        if type(token) == tuple:
+            yield token
+            if token[0] in (_FUNCTION_CUSTOM, _FUNCTION_BUILTIN, _FUNCTION_EXTERNAL):
+                for parameter in token[2]:
+                    for reference in _walkReferences(parameter.getRPNTokens()):
+                        yield reference
+                        
+def _isVolatile(entity):
+    """
+    This function determines whether a variable or function may produce a
+    different value each time it is evaluated, because it reaches a random
+    built-in or an external function, directly or through the variables and
+    functions it references.
+    
+    External variables are not volatile, since their values are fixed when
+    the stack is compiled.
+    
+    The result is recorded on every variable and function inspected along the
+    way, so each is examined only once until it is reset, as happens when it,
+    or anything it depends upon, is redefined.
+    
+    @type entity: Variable|Function
+    @param entity: The variable or function to inspect.
+        
+    @rtype: bool
+    @return: True if the entity's value may vary between evaluations.
+    """
+    references = {}
+    pending = [entity]
+    while pending:
+        current = pending[-1]
+        if current._volatile is not None:
+            pending.pop()
+            continue
             
-        if isinstance(i, basestring):
+        if current in references: #Every reference has been resolved.
+            pending.pop()
+            current._volatile = any(reference._volatile for reference in references.pop(current))
+            continue
+            
+        tokens = current.getRPNTokens()
+        if tokens is None:
+            current._volatile = True
+            continue
+        (volatile, references[current]) = _directVolatility(tokens)
+        if volatile:
+            del references[current]
+            current._volatile = True
+        else:
+            pending.extend(reference for reference in references[current] if reference._volatile is None and not reference in references)
+    return entity._volatile
+    
+def _isVolatileReference(token):
+    """
+    This function determines whether a single compiled reference may produce a
+    different value each time it is evaluated, without considering the
+    arguments of a function call.
+    
+    @type token: tuple
+    @param token: The compiled reference to inspect.
+    
+    @rtype: bool
+    @return: True if the reference's value may vary between evaluations.
+    """
+    if token[0] == _FUNCTION_BUILTIN:
+        return token[1] in _VOLATILE_FUNCTIONS
+    if token[0] in (_VARIABLE_CUSTOM, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+        return not isinstance(token[1], (Variable, Function)) or _isVolatile(token[1])
+    return False
+    
+def _directVolatility(tokens):
+    """
+    This function inspects only the references made by a compiled RPN stack
+    itself, without following them, to support a memoized determination of
+    volatility.
+    
+    @type tokens: list
+    @param tokens: The RPN stack to inspect.
+    
+    @rtype: tuple
+    @return: (<volatile>, <entities>), where volatile is True if the stack
+        directly reaches a random built-in or an external function, and
+        entities lists the variables and functions it references, whose own
+        volatility must still be considered.
+    """
+    entities = []
+    for reference in _walkReferences(tokens):
+        reference_type = reference[0]
+        if reference_type == _FUNCTION_BUILTIN:
+            if reference[1] in _VOLATILE_FUNCTIONS:
+                return (True, ())
+        elif reference_type in (_VARIABLE_CUSTOM, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+            entity = reference[1]
+            if not isinstance(entity, (Variable, Function)):
+                return (True, ())
+            entities.append(entity)
+    return (False, entities)
+    
+def _findCycle(entities, relink=None):
+    """
+    This function searches the variables and functions reachable from the
+    given entities for one that refers to itself, directly or transitively.
+    
+    The search is a depth-first traversal of compiled references, performed
+    without recursion, so that long chains of definitions cannot exhaust the
+    interpreter's stack; the position of each entity on the current path is
+    recorded, so that the search remains linear in the length of the chain.
+    
+    @type entities: iterable
+    @param entities: The Equations from which to begin searching.
+    @type relink: callable|None
+    @param relink: A function that, given an Equation, returns an additional
+        Equation to which it is to be treated as referring, or None.
+        
+    @rtype: list|None
+    @return: The entities that form a cycle, in order, with the first repeated
+        at the end, or None if there is no cycle.
+    """
+    def references(entity):
+        targets = [
+         reference[1] for reference in _walkReferences(entity.getRPNTokens() or ())
+         if reference[0] in (_VARIABLE_CUSTOM, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL) and isinstance(reference[1], Equation)
+        ]
+        if relink is not None:
+            target = relink(entity)
+            if target is not None:
+                targets.append(target)
+        return iter(targets)
+        
+    finished = set()
+    for root in entities:
+        if root in finished:
+            continue
+        path = [root]
+        positions = {root: 0} #The index of each entity in path.
+        pending = [references(root)]
+        while pending:
+            for entity in pending[-1]:
+                position = positions.get(entity)
+                if position is not None:
+                    return path[position:] + [entity]
+                if not entity in finished:
+                    positions[entity] = len(path)
+                    path.append(entity)
+                    pending.append(references(entity))
+                    break
+            else:
+                entity = path.pop()
+                del positions[entity]
+                finished.add(entity)
+                pending.pop()
+    return None
+    
+def _buildClosure(tokens):
+    """
+    This function compiles an RPN-i-fied expression into a tree of closures,
+    allowing it to be evaluated without re-interpreting its tokens.
+    
+    Operators, built-in functions, and variable references are resolved once,
+    while the tree is being built; evaluating the closure then only performs
+    the computations themselves, in the same order as _evaluateRPN().
+    
+    Malformed stacks are not compiled; the interpreter is deferred to instead,
+    so that errors surface at evaluation-time, exactly as they otherwise would.
+    
+    @type tokens: list
+    @param tokens: The RPN stack to compile.
+    
+    @rtype: callable
+    @return: A callable that takes a call stack and a frame and returns the
+        value of the expression.
+    """
+    stack = []
+    for i in tokens:
+        if i in _PURE_OPERATORS:
+            if len(stack) < 2:
+                break
+            closure_right = stack.pop()
+            closure_left = stack.pop()
+            stack.append(_buildClosure_operator(i, closure_left, closure_right, tokens))
+        else:
+            closure = _buildClosure_factor(i)
+            if closure is None:
+                break
+            stack.append(closure)
+    else:
+        if len(stack) == 1:
+            return stack[0]
+    return functools.partial(_evaluateRPN, tokens)
+    
+def _buildClosure_operator(token, closure_left, closure_right, tokens):
+    """
+    This function compiles an operator into a closure that applies it to the
+    values of two other closures.
+    
+    @type token: str
+    @param token: The operator to compile.
+    @type closure_left: callable
+    @param closure_left: The closure that provides the left-hand value.
+    @type closure_right: callable
+    @param closure_right: The closure that provides the right-hand value.
+    @type tokens: list
+    @param tokens: The RPN stack being compiled, used for error reporting.
+    
+    @rtype: callable
+    @return: A callable that takes a call stack and a frame and returns the
+        value of the operation.
+    """
+    if token == '^':
+        def _closure(call_stack, frame):
+            value_left = closure_left(call_stack, frame)
+            value_right = closure_right(call_stack, frame)
+            if value_left > 9999999 or value_right > 1024:
+                raise ThresholdError("The time required to calculate such a power is too great.")
+            return value_left ** value_right
+    elif token == '/':
+        def _closure(call_stack, frame):
+            value_left = closure_left(call_stack, frame)
+            value_right = closure_right(call_stack, frame)
+            if value_right == 0:
+                raise DivisionByZeroError(value_left, value_right, ['RPN:'] + tokens)
+            return value_left / float(value_right)
+    elif token == '\\':
+        def _closure(call_stack, frame):
+            value_left = closure_left(call_stack, frame)
+            value_right = closure_right(call_stack, frame)
+            if value_right == 0:
+                raise DivisionByZeroError(value_left, value_right, ['RPN:'] + tokens)
+            return int(value_left // value_right)
+    else:
+        function = _CLOSURE_OPERATORS[token]
+        def _closure(call_stack, frame):
+            return function(closure_left(call_stack, frame), closure_right(call_stack, frame))
+    return _closure
+    
+def _buildClosure_factor(token):
+    """
+    This function compiles a factor into a closure that provides its value.
+    
+    @type token: int|float|tuple
+    @param token: The token to compile.
+    
+    @rtype: callable|None
+    @return: A callable that takes a call stack and a frame and returns the
+        value of the token, or None if the token's type is unknown.
+    """
+    if type(token) == tuple:
+        if token[0] == _VARIABLE_PARAMETER:
+            index = token[2]
+            return lambda call_stack, frame: frame[index]
+        elif token[0] == _VARIABLE_CUSTOM:
+            variable = token[1]
+            return lambda call_stack, frame: variable.evaluate(call_stack)
+        elif token[0] in (_VARIABLE_BUILTIN, _VARIABLE_EXTERNAL):
+            value = token[1]
+            return lambda call_stack, frame: value
+            
+        parameters = token[2]
+        for parameter in parameters:
+            parameter.compileClosure()
+        if token[0] == _FUNCTION_BUILTIN:
+            function = token[1]
+            return lambda call_stack, frame: function([parameter.evaluate(call_stack, frame) for parameter in parameters])
+        elif token[0] in (_FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+            function = token[1]
+            return lambda call_stack, frame: function.evaluate([parameter.evaluate(call_stack, frame) for parameter in parameters], call_stack)
+        return None
+    return lambda call_stack, frame: token
+    
+def _generateSource(tokens, name):
+    """
+    This function generates the source of a native Python function that
+    evaluates an RPN-i-fied expression, allowing CPython's own bytecode to
+    perform the arithmetic.
+    
+    The generated function takes a call stack and a frame, like _evaluateRPN().
+    Every operand is bound to a local in the order in which the interpreter
+    would compute it, so evaluation order and side-effects are preserved, while
+    threshold and division-by-zero checks are emitted as explicit guards.
+    Simple built-in functions are inlined; guarded ones, like sqrt(), are
+    called directly.
+    
+    Malformed stacks are not translated; the generated function defers to the
+    interpreter instead, so that errors surface at evaluation-time.
+    
+    @type tokens: list
+    @param tokens: The RPN stack to translate.
+    @type name: basestring
+    @param name: A description of the expression, included as a comment.
+    
+    @rtype: tuple
+    @return: The generated source and the namespace in which it must be
+        executed; the function it defines is named '_compiled'.
+    """
+    namespace = {
+     'math': math,
+     '_evaluateRPN': _evaluateRPN,
+     'DivisionByZeroError': DivisionByZeroError,
+     'ThresholdError': ThresholdError,
+    }
+    lines = []
+    result = _generateSource_expression(tokens, 'call_stack', lines, namespace)
+    if result is None:
+        namespace['_rpn'] = tokens
+        lines = ["return _evaluateRPN(_rpn, call_stack, frame)"]
+    else:
+        lines.append("return %s" % (result))
+        
+    buffer = ["def _compiled(call_stack, frame):"]
+    for line in name.splitlines():
+        buffer.append("    # %s" % (line))
+    for line in lines:
+        if line is not None: #Skip unused stack copies.
+            buffer.append("    %s" % (line))
+    return ('\n'.join(buffer) + '\n', namespace)
+    
+def _generateSource_expression(tokens, stack_name, lines, namespace):
+    """
+    This function translates an RPN stack into statements that compute its
+    value, appending them to the lines being generated.
+    
+    @type tokens: list
+    @param tokens: The RPN stack to translate.
+    @type stack_name: str
+    @param stack_name: The name of the local that holds the call stack.
+    @type lines: list
+    @param lines: The statements generated so far; None entries are
+        placeholders that will be omitted from the final source.
+    @type namespace: dict
+    @param namespace: The globals available to the generated code, to which
+        references will be added.
+    
+    @rtype: str|None
+    @return: An expression that provides the value of the stack, or None if
+        the stack is malformed.
+    """
+    rpn_name = None
+    stack = []
+    for i in tokens:
+        if i in _PURE_OPERATORS:
+            if len(stack) < 2:
+                return None
+            value_right = stack.pop()
+            value_left = stack.pop()
+            local = "_v%i" % (len(lines))
+            if i == '^':
+                lines.append("if %s > 9999999 or %s > 1024:" % (value_left, value_right))
+                lines.append("    raise ThresholdError(\"The time required to calculate such a power is too great.\")")
+                lines.append("%s = %s ** %s" % (local, value_left, value_right))
+            elif i in ('/', '\\'):
+                if rpn_name is None:
+                    rpn_name = _generateSource_reference(tokens, namespace)
+                lines.append("if %s == 0:" % (value_right))
+                lines.append("    raise DivisionByZeroError(%s, %s, ['RPN:'] + %s)" % (value_left, value_right, rpn_name))
+                if i == '/':
+                    lines.append("%s = %s / float(%s)" % (local, value_left, value_right))
+                else:
+                    lines.append("%s = int(%s // %s)" % (local, value_left, value_right))
+            elif i == '<':
+                lines.append("%s = min(%s, %s)" % (local, value_left, value_right))
+            elif i == '>':
+                lines.append("%s = max(%s, %s)" % (local, value_left, value_right))
+            else:
+                lines.append("%s = %s %s %s" % (local, value_left, i, value_right))
+            stack.append(local)
+        else:
+            value = _generateSource_factor(i, stack_name, lines, namespace)
+            if value is None:
+                return None
+            stack.append(value)
+            
+    if len(stack) != 1:
+        return None
+    return stack[0]
+    
+def _generateSource_factor(token, stack_name, lines, namespace):
+    """
+    This function translates a factor into an expression that provides its
+    value, appending any statements needed to compute it.
+    
+    @type token: int|float|tuple
+    @param token: The token to translate.
+    @type stack_name: str
+    @param stack_name: The name of the local that holds the call stack.
+    @type lines: list
+    @param lines: The statements generated so far.
+    @type namespace: dict
+    @param namespace: The globals available to the generated code, to which
+        references will be added.
+    
+    @rtype: str|None
+    @return: An expression that provides the value of the token, or None if
+        the token cannot be translated.
+    """
+    if type(token) == tuple:
+        if token[0] in (_VARIABLE_BUILTIN, _VARIABLE_EXTERNAL):
+            return _generateSource_factor(token[1], stack_name, lines, namespace)
+            
+        elif token[0] == _VARIABLE_PARAMETER:
+            return "frame[%i]" % (token[2])
+            
+        local = "_v%i" % (len(lines))
+        if token[0] == _VARIABLE_CUSTOM:
+            lines.append("%s = %s.evaluate(%s)" % (local, _generateSource_reference(token[1], namespace), stack_name))
+            return local
+        elif not token[0] in (_FUNCTION_BUILTIN, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+            return None
+            
+        arguments = []
+        for parameter in token[2]:
+            value = _generateSource_expression(parameter.getRPNTokens(), stack_name, lines, namespace)
+            if value is None:
+                value = "%s.evaluate(%s, frame)" % (_generateSource_reference(parameter, namespace), stack_name)
+            arguments.append(value)
+            
+        local = "_v%i" % (len(lines))
+        if token[0] in (_FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+            lines.append("%s = %s.evaluate([%s], %s)" % (local, _generateSource_reference(token[1], namespace), ', '.join(arguments), stack_name))
+        elif token[1] in _INLINE_FUNCTIONS:
+            lines.append("%s = %s" % (local, _INLINE_FUNCTIONS[token[1]] % tuple(arguments)))
+        else:
+            lines.append("%s = %s([%s])" % (local, _generateSource_reference(token[1], namespace), ', '.join(arguments)))
+        return local
+        
+    if type(token) in (int, float) and not (token != token or token in (float('inf'), float('-inf'))):
+        if token < 0:
+            return "(%r)" % (token)
+        return repr(token)
+    return _generateSource_reference(token, namespace)
+    
+def _generateSource_reference(value, namespace):
+    """
+    This function makes an object available to generated code, returning the
+    name under which it may be accessed.
+    
+    @type value: object
+    @param value: The object to reference.
+    @type namespace: dict
+    @param namespace: The globals available to the generated code.
+    
+    @rtype: str
+    @return: The name bound to the object.
+    """
+    name = "_r%i" % (len(namespace))
+    namespace[name] = value
+    return name
+    
+def _evaluateVectorized(tokens, bindings, frame, rows, cache, call_stack):
+    """
+    This function evaluates an RPN-i-fied expression over arrays of values,
+    computing every row at once.
+    
+    Operators map to NumPy ufuncs and built-in functions to the array
+    implementations in _VECTORIZED_FUNCTIONS. Threshold and division-by-zero
+    checks are applied as masks, so errors report every row that failed.
+    Integers that would overflow NumPy's 64-bit types are computed exactly,
+    and calculations for which NumPy signals a floating-point error are
+    repeated row-by-row with the interpreter's own arithmetic.
+    
+    @type tokens: list
+    @param tokens: The RPN stack to evaluate.
+    @type bindings: dict
+    @param bindings: Arrays (or scalars) of values, keyed by the names of the
+        variables they replace.
+    @type frame: sequence
+    @param frame: Arrays of argument values, indexed by the parameter positions
+        of the function being evaluated.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    @type cache: dict
+    @param cache: Arrays of values already computed for unbound Variables.
+    @type call_stack: list
+    @param call_stack: A stack containing every function and variable traversed
+        up to this point.
+    
+    @rtype: numpy.ndarray|int|float
+    @return: The values of the expression; scalars are returned for
+        expressions that do not depend on any array.
+    
+    @raise ThresholdError: If the values passed to an operand or function exceed
+        pre-defined limits.
+    @raise DivisionByZeroError: If a division by zero would occur as a result of
+        an operation.
+    @raise IncompleteExpressionError: If there are excessive tokens in the input
+        stack.
+    @raise NullSubexpressionError: If a bracketed expression contains no
+        content.
+    """
+    stack = []
+    for i in tokens:
+        if i in _PURE_OPERATORS:
+            value_right = stack.pop()
+            value_left = stack.pop()
+            
+            if i == '^':
+                _checkVectorizedRows(numpy.logical_or(numpy.greater(value_left, 9999999), numpy.greater(value_right, 1024)), rows, "The time required to calculate such a power is too great.")
+                if numpy.issubdtype(numpy.result_type(value_left), numpy.integer) and numpy.any(numpy.less(value_right, 0)):
+                    value_left = numpy.asarray(value_left, dtype=float) #Integers can't be raised to negative powers.
+                stack.append(_operateVectorized(numpy.power, i, value_left, value_right, rows, tokens))
+            elif i in ('*', _NEGATION_MULTIPLIER):
+                stack.append(_operateVectorized(numpy.multiply, i, value_left, value_right, rows, tokens))
+            elif i in ('/', '\\', '%'):
+                mask = numpy.broadcast_to(numpy.equal(value_right, 0), (rows,))
+                if mask.any():
+                    failed = numpy.nonzero(mask)[0]
+                    if i == '%': #Raises the same error as the interpreter.
+                        _operate(i, _rowVectorized(value_left, failed[0], rows), _rowVectorized(value_right, failed[0], rows), tokens)
+                    raise DivisionByZeroError(
+                     numpy.broadcast_to(value_left, (rows,))[failed[0]],
+                     numpy.broadcast_to(value_right, (rows,))[failed[0]],
+                     ['RPN:'] + tokens, tuple(int(row) for row in failed)
+                    )
+                if i == '/':
+                    stack.append(_operateVectorized(numpy.true_divide, i, value_left, value_right, rows, tokens))
+                elif i == '\\':
+                    stack.append(_integerVectorized(_operateVectorized(numpy.floor_divide, i, value_left, value_right, rows, tokens)))
+                else:
+                    stack.append(_operateVectorized(numpy.mod, i, value_left, value_right, rows, tokens))
+            elif i == '+':
+                stack.append(_operateVectorized(numpy.add, i, value_left, value_right, rows, tokens))
+            elif i == '-':
+                stack.append(_operateVectorized(numpy.subtract, i, value_left, value_right, rows, tokens))
+            elif numpy.asarray(value_left).dtype.kind != numpy.asarray(value_right).dtype.kind: #min() and max() keep the type of the operand they choose.
+                stack.append(_applyVectorized(lambda values: _operate(i, values[0], values[1], tokens), (value_left, value_right), rows))
+            elif i == '<':
+                stack.append(numpy.minimum(value_left, value_right))
+            elif i == '>':
+                stack.append(numpy.maximum(value_left, value_right))
+        else:
+            stack.append(_evaluateVectorized_factor(i, bindings, frame, rows, cache, call_stack))
+            
+    if len(stack) > 1:
+        raise IncompleteExpressionError(['RPN:'] + tokens)
+    if len(stack) < 1:
+        raise NullSubexpressionError()
+        
+    return stack[0]
+    
+def _evaluateVectorized_factor(token, bindings, frame, rows, cache, call_stack):
+    """
+    This function evaluates a token over arrays of values.
+    
+    Bound variables are replaced with their arrays, while unbound variables
+    and custom functions are evaluated vectorially, in turn, so that bindings
+    propagate through them. External functions are applied row-by-row.
+    
+    @type token: int|float|tuple
+    @param token: The token to evaluate.
+    @type bindings: dict
+    @param bindings: Arrays (or scalars) of values, keyed by the names of the
+        variables they replace.
+    @type frame: sequence
+    @param frame: Arrays of argument values, indexed by the parameter positions
+        of the function being evaluated.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    @type cache: dict
+    @param cache: Arrays of values already computed for unbound Variables.
+    @type call_stack: list
+    @param call_stack: A stack containing every function and variable traversed
+        up to this point.
+    
+    @rtype: numpy.ndarray|int|float
+    @return: The values of the token.
+    
+    @raise RecursionError: If a variable or function is invoked while it is
+        already being evaluated.
+    """
+    if type(token) != tuple:
+        if type(token) == complex: #Folded constants follow Python's rules, not NumPy's.
+            return numpy.asarray(token, dtype=object)
+        return token
+        
+    if token[0] == _VARIABLE_PARAMETER:
+        return frame[token[2]]
+    elif token[0] == _VARIABLE_CUSTOM:
+        variable = token[1]
+        if variable.getName() in bindings:
+            return bindings[variable.getName()]
+        if not variable in cache:
+            if variable in call_stack:
+                raise RecursionError(call_stack + [variable])
+            cache[variable] = _evaluateVectorized(variable.getRPNTokens(), bindings, (), rows, cache, call_stack + [variable])
+        return cache[variable]
+    elif token[0] in (_VARIABLE_BUILTIN, _VARIABLE_EXTERNAL):
+        return token[1]
+        
+    function = token[1]
+    arguments = [_evaluateVectorized(parameter.getRPNTokens(), bindings, frame, rows, cache, call_stack) for parameter in token[2]]
+    if token[0] == _FUNCTION_BUILTIN:
+        implementation = _VECTORIZED_FUNCTIONS.get(function)
+        if implementation is None or any(numpy.asarray(argument).dtype.kind not in 'biuf' for argument in arguments):
+            return _applyVectorized(function, arguments, rows)
+        return _computeVectorized(function, arguments, lambda: implementation(arguments, rows), rows)
+    elif token[0] in (_FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+        if isinstance(function, Function):
+            if function in call_stack:
+                raise RecursionError(call_stack + [function])
+            return _evaluateVectorized(function.getRPNTokens(), bindings, arguments, rows, cache, call_stack + [function])
+        return _applyVectorized(lambda values: function.evaluate(values, _CallStack()), arguments, rows)
+    raise UnknownTypeError(token)
+    
+def _applyVectorized(function, arguments, rows):
+    """
+    This function applies a scalar calculation function to every row of its
+    arguments, for use when no array implementation exists or when NumPy's
+    would disagree with the interpreter.
+    
+    @type function: callable
+    @param function: A function that takes a sequence of numbers.
+    @type arguments: list
+    @param arguments: Arrays (or scalars) of argument values.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    
+    @rtype: numpy.ndarray
+    @return: The values computed for each row; the array holds the Python
+        numbers themselves if they are complex or not all of one type.
+    """
+    columns = [numpy.broadcast_to(argument, (rows,)).tolist() for argument in arguments]
+    if columns:
+        values = [function(values) for values in zip(*columns)]
+    else:
+        values = [function(()) for row in range(rows)]
+    types = set(type(value) for value in values)
+    if len(types) > 1 or complex in types: #Each row keeps the type the interpreter gave it.
+        return numpy.array(values, dtype=object)
+    return numpy.array(values)
+    
+def _operateVectorized(ufunc, symbol, value_left, value_right, rows, tokens):
+    """
+    This function applies an arithmetic operator over arrays, deferring to the
+    interpreter's arithmetic wherever NumPy's fixed-width types would disagree
+    with it.
+    
+    Integer results that could overflow 64 bits are computed exactly, with
+    Python integers, and floating-point calculations that NumPy signals as
+    dividing by zero, overflowing, or being invalid are repeated row-by-row,
+    producing whatever value or error the interpreter would.
+    
+    @type ufunc: callable
+    @param ufunc: The NumPy function that implements the operator.
+    @type symbol: basestring
+    @param symbol: The operator being applied.
+    @type value_left: numpy.ndarray|int|float
+    @param value_left: The left operands.
+    @type value_right: numpy.ndarray|int|float
+    @param value_right: The right operands.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    @type tokens: list
+    @param tokens: The RPN stack in which the operator appears, for errors.
+    
+    @rtype: numpy.ndarray|int|float
+    @return: The result of the operation for each row.
+    """
+    function = lambda values: _operate(symbol, values[0], values[1], tokens)
+    if numpy.asarray(value_left).dtype == object or numpy.asarray(value_right).dtype == object:
+        return _applyVectorized(function, (value_left, value_right), rows) #Python's numbers, including complex ones, follow the interpreter's rules.
+        
+    def compute():
+        try:
+            return ufunc(value_left, value_right)
+        except OverflowError: #An operand is already too large for 64 bits.
+            return ufunc(numpy.asarray(value_left, dtype=object), numpy.asarray(value_right, dtype=object))
+    result = _computeVectorized(function, (value_left, value_right), compute, rows)
+    if numpy.asarray(result).dtype.kind in 'iu':
+        with numpy.errstate(all='ignore'):
+            estimate = ufunc(numpy.asarray(value_left, dtype=float), numpy.asarray(value_right, dtype=float))
+        if numpy.any(numpy.greater_equal(numpy.absolute(estimate), _VECTORIZED_INTEGER_LIMIT)):
+            return ufunc(numpy.asarray(value_left, dtype=object), numpy.asarray(value_right, dtype=object))
+    return result
+    
+def _integerVectorized(values):
+    """
+    This function converts floored values to integers, as int() does, using
+    Python integers only for values too large for 64 bits.
+    
+    @type values: numpy.ndarray|int|float
+    @param values: The values to convert.
+    
+    @rtype: numpy.ndarray|int
+    @return: The integral values.
+    
+    @raise ValueError: If a value is NaN.
+    @raise OverflowError: If a value is infinite.
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind in 'iu':
+        return values
+    if values.dtype.kind == 'f' and numpy.all(numpy.less(numpy.absolute(values), _VECTORIZED_INTEGER_LIMIT)):
+        return values.astype(numpy.int64)
+    return numpy.frompyfunc(int, 1, 1)(values)
+    
+def _computeVectorized(function, arguments, compute, rows):
+    """
+    This function performs an array calculation, repeating it row-by-row with
+    the equivalent scalar function if NumPy signals a division by zero, an
+    overflow, or an invalid operation along the way, so that any error the
+    interpreter would raise is raised instead of being hidden in the result,
+    and any value it would produce instead, such as the complex power of a
+    negative base, is used.
+    
+    @type function: callable
+    @param function: A function that takes a sequence of numbers.
+    @type arguments: sequence
+    @param arguments: Arrays (or scalars) of argument values.
+    @type compute: callable
+    @param compute: A function that takes no arguments and performs the array
+        calculation.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    
+    @rtype: numpy.ndarray|int|float
+    @return: The computed values.
+    """
+    signals = []
+    with numpy.errstate(all='call', under='ignore', call=lambda error, flag: signals.append(error)):
+        values = compute()
+    if signals:
+        return _applyVectorized(function, arguments, rows)
+    return values
+    
+def _rowVectorized(values, row, rows):
+    """
+    This function extracts a single row's value as a Python number.
+    
+    @type values: numpy.ndarray|int|float
+    @param values: An array (or scalar) of values.
+    @type row: int
+    @param row: The row to extract.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    
+    @rtype: int|float
+    @return: The row's value.
+    """
+    return numpy.asarray(numpy.broadcast_to(values, (rows,))[row]).item()
+    
+def _checkVectorizedRows(mask, rows, message, values=None):
+    """
+    This function raises a ThresholdError that identifies every row selected
+    by a mask, if any are.
+    
+    @type mask: numpy.ndarray|bool
+    @param mask: True for each row that exceeds a limit.
+    @type rows: int
+    @param rows: The number of rows being evaluated.
+    @type message: basestring
+    @param message: A description of the limit.
+    @type values: numpy.ndarray|int|float|None
+    @param values: The values being checked, the first selected of which is
+        substituted into message, if given.
+    
+    @raise ThresholdError: If any row is selected.
+    """
+    mask = numpy.broadcast_to(mask, (rows,))
+    if mask.any():
+        failed = numpy.nonzero(mask)[0]
+        if values is not None:
+            message = message % (_rowVectorized(values, failed[0], rows))
+        raise ThresholdError(message, tuple(int(row) for row in failed))
+        
+def _copyCompiled(equation):
+    """
+    This function copies a compiled equation, together with the equations
+    passed as the arguments of its function calls, so that the copy may be
+    rewritten or given a native evaluator without affecting the original. The
+    variables and functions it refers to are shared.
+    
+    @type equation: Equation
+    @param equation: The compiled equation to copy.
+    
+    @rtype: Equation
+    @return: The compiled copy.
+    """
+    root = Equation(equation.getTokens(), equation.getPlaceholders())
+    pending = [(equation, root)]
+    while pending:
+        (original, duplicate) = pending.pop()
+        program = original.getRPNTokens()
+        if program is None:
+            continue
+        if type(program) != _Program:
+            program = _Program(program)
+            
+        references = []
+        for token in program._references:
+            if token[0] in (_FUNCTION_CUSTOM, _FUNCTION_BUILTIN, _FUNCTION_EXTERNAL) and token[2]:
+                parameters = [Equation(parameter.getTokens()) for parameter in token[2]]
+                pending.extend(zip(token[2], parameters))
+                token = token[:2] + (parameters,) + token[3:]
+            references.append(token)
+        duplicate._equation = _Program()
+        (duplicate._equation._opcodes, duplicate._equation._operands, duplicate._equation._constants, duplicate._equation._references) = (
+         program._opcodes, program._operands, program._constants, tuple(references)
+        )
+    return root
+    
+def _renderExpression(tokens):
+    """
+    This function provides a mostly-sane, human-readable rendition of the tokens
+    that make up an expression processed by the lexer.
+    
+    @type tokens: list
+    @param tokens: The expression to render
+    
+    @rtype: str
+    @return: A rendition of the expression.
+    """
+    buffer = []
+    pad = False
+    pad_character = ' '
+    for i in tokens:
+        if pad and not i in (')', _FUNCTION_DELIMITER):
+            buffer.append(pad_character)
+            
+        if isinstance(i, basestring):
             if i[0] == _FUNCTION_PREFIX:
                 i = i[2:]
                 pad = False
@@ -811,7 +2554,7 @@ def _renderExpression(tokens):
                 pad = not i == '('
         else:
             if type(i) == tuple:
-                if i[0] in (_VARIABLE_CUSTOM, _VARIABLE_EXTERNAL, _VARIABLE_BUILTIN, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+                if i[0] in (_VARIABLE_CUSTOM, _VARIABLE_EXTERNAL, _VARIABLE_BUILTIN, _VARIABLE_PARAMETER, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
                     i = i[1]
                 elif i[0] == _FUNCTION_BUILTIN:
                     i = "%s(%s)" % (i[1].__name__[1:] + ", ".join([str(parameter) for parameter in i[2]]))
@@ -821,90 +2564,2080 @@ def _renderExpression(tokens):
     return ''.join(buffer)
     
     
-#Logical entities
+#Caching
 ########################################
-class Equation(object):
+class _LRUCache(object):
     """
-    This class models an equation, which is any expression that can be evaluated
-    to produce a numeric value.
+    This class models a bounded mapping that discards its least-recently-used
+    entries once full, keeping count of how effective it has been. It may be
+    shared between threads.
     """
-    _tokens = None #: The tokens that make up this expression.
-    _equation = None #: The expression to be evaluated in RPN, with substitutions.
+    _lock = None #: Serializes access to the cache's state.
+    _entries = None #: The cached values, ordered from least- to most-recently used.
+    _size = None #: The maximum number of entries to retain.
+    _hits = 0 #: The number of lookups that found a value.
+    _misses = 0 #: The number of lookups that found nothing.
+    _evictions = 0 #: The number of entries discarded to make room for others.
     
-    def __init__(self, tokens):
+    def __init__(self, size):
         """
-        This constructs a new Equation.
+        This constructs a new, empty cache.
         
-        @type tokens: list
-        @param tokens: A list of tokens that represent the expression modeled by
-            this equation.
+        @type size: int
+        @param size: The maximum number of entries to retain; if not positive,
+            nothing will be cached.
+        """
+        self._lock = threading.RLock()
+        self._entries = collections.OrderedDict()
+        self._size = size
         
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+    def get(self, key):
         """
-        if not tokens:
-            raise TokensError()
+        This function provides the value cached under the given key, marking it
+        as recently used.
+        
+        @type key: hashable
+        @param key: The key to look up.
+        
+        @rtype: object|None
+        @return: The cached value or None if there is none.
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self._misses += 1
+                return None
+            self._entries[key] = value
+            self._hits += 1
+            return value
             
-        self._tokens = tokens
+    def peek(self, key):
+        """
+        This function provides the value cached under the given key, without
+        marking it as recently used or counting the access.
+        
+        @type key: hashable
+        @param key: The key to look up.
+        
+        @rtype: object|None
+        @return: The cached value or None if there is none.
+        """
+        with self._lock:
+            return self._entries.get(key)
+            
+    def put(self, key, value):
+        """
+        This function caches a value, discarding the least-recently-used
+        entries if the cache is full.
+        
+        @type key: hashable
+        @param key: The key under which to cache the value.
+        @type value: object
+        @param value: The value to cache; it may not be None.
+        
+        @rtype: list
+        @return: The keys of all discarded entries.
+        """
+        with self._lock:
+            evicted = []
+            if self._size <= 0:
+                return evicted
+            
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self._size:
+                evicted.append(self._entries.popitem(False)[0])
+                self._evictions += 1
+            return evicted
+        
+    def pop(self, key):
+        """
+        This function removes the value cached under the given key, if any.
+        
+        @type key: hashable
+        @param key: The key to discard.
+        
+        @rtype: object|None
+        @return: The discarded value or None if there was none.
+        """
+        with self._lock:
+            return self._entries.pop(key, None)
+        
+    def clear(self):
+        """
+        This function discards every cached value.
+        """
+        with self._lock:
+            self._entries.clear()
+        
+    def getStatistics(self):
+        """
+        Returns a summary of this cache's state and effectiveness.
+        
+        @rtype: dict
+        @return: The current 'size' and 'maximum' size of the cache, and the
+            number of 'hits', 'misses', and 'evictions' it has seen.
+        """
+        with self._lock:
+            return {
+             'size': len(self._entries),
+             'maximum': self._size,
+             'hits': self._hits,
+             'misses': self._misses,
+             'evictions': self._evictions,
+            }
+        
+    def __len__(self):
+        return len(self._entries)
+        
+class _LookupCache(_LRUCache):
+    """
+    This class extends _LRUCache to retain the results of an external lookup
+    handler, including the absence of any result, each for a limited time,
+    keeping count of the calls made to the handler and of those avoided.
+    """
+    _ttl = None #: The number of seconds for which results are retained, or None if they never expire.
+    _calls = 0 #: The number of calls made to the handler.
+    _expirations = 0 #: The number of cached results discarded because they had expired.
+    _builtins = 0 #: The number of lookups answered by built-in names without calling the handler.
+    
+    def __init__(self, size, ttl=None):
+        """
+        This constructs a new, empty cache.
+        
+        @type size: int
+        @param size: The maximum number of results to retain; if not positive,
+            nothing will be cached.
+        @type ttl: int|float|None
+        @param ttl: The number of seconds for which results are retained, or
+            None if they never expire.
+        """
+        _LRUCache.__init__(self, size)
+        self._ttl = ttl
+        
+    def lookup(self, key, handler, arguments):
+        """
+        This function provides the result of calling the handler with the given
+        arguments, calling it only if no unexpired result is cached under the
+        given key.
+        
+        @type key: hashable
+        @param key: The key under which the result is cached.
+        @type handler: callable
+        @param handler: The lookup handler.
+        @type arguments: tuple
+        @param arguments: The arguments with which to call the handler.
+        
+        @rtype: object|None
+        @return: The handler's result, which may be None.
+        """
+        entry = self._fetch(key)
+        if entry is not None:
+            return entry[0]
+            
+        with self._lock:
+            self._calls += 1
+        value = handler(*arguments)
+        self._store(key, value)
+        return value
+        
+    def lookupMany(self, keys, handler):
+        """
+        This function provides the results of a bulk lookup handler for every
+        given key, calling it once, for the keys that have no unexpired result
+        cached, if there are any.
+        
+        @type keys: iterable
+        @param keys: (<prefix>, <key>) tuples, as produced by
+            _collectLookups().
+        @type handler: callable
+        @param handler: The bulk lookup handler, which takes a tuple of variable
+            names and a tuple of (<arity>, <name>) function specs and returns a
+            dictionary of results keyed by name or spec, in which absent keys
+            have no result.
+            
+        @rtype: dict
+        @return: Every result, which may be None, keyed by (<prefix>, <key>).
+        """
+        results = {}
+        missing = []
+        for key in keys:
+            entry = self._fetch(key)
+            if entry is not None:
+                results[key] = entry[0]
+            else:
+                missing.append(key)
+                
+        if missing:
+            with self._lock:
+                self._calls += 1
+            values = handler(
+             tuple(name for (prefix, name) in missing if prefix == _VARIABLE_PREFIX),
+             tuple(spec for (prefix, spec) in missing if prefix == _FUNCTION_PREFIX),
+            ) or {}
+            for key in missing:
+                value = values.get(key[1])
+                self._store(key, value)
+                results[key] = value
+        return results
+        
+    def gather(self, keys, handler):
+        """
+        This function provides the results of an asynchronous lookup handler
+        for every given key, calling it for each key that has no unexpired
+        result cached and awaiting all of the calls concurrently.
+        
+        @type keys: iterable
+        @param keys: The (<prefix>, <key>) tuples to look up.
+        @type handler: callable
+        @param handler: A callable that takes a key and returns an awaitable
+            that produces its result.
+            
+        @rtype: asyncio.Future
+        @return: A Future that produces every result, which may be None, keyed
+            by (<prefix>, <key>).
+        """
+        results = {}
+        missing = []
+        for key in keys:
+            entry = self._fetch(key)
+            if entry is not None:
+                results[key] = entry[0]
+            else:
+                missing.append(key)
+                
+        future = asyncio.Future()
+        if not missing:
+            future.set_result(results)
+            return future
+            
+        with self._lock:
+            self._calls += len(missing)
+        gathering = asyncio.gather(*[handler(key) for key in missing])
+        def store(gathering):
+            if future.cancelled():
+                return
+            if gathering.cancelled():
+                future.cancel()
+            elif gathering.exception() is not None:
+                future.set_exception(gathering.exception())
+            else:
+                for (key, value) in zip(missing, gathering.result()):
+                    self._store(key, value)
+                    results[key] = value
+                future.set_result(results)
+        gathering.add_done_callback(store)
+        future.add_done_callback(lambda future: future.cancelled() and gathering.cancel())
+        return future
+        
+    def _fetch(self, key):
+        """
+        This function retrieves the cached result for the given key, discarding
+        it if it has expired.
+        
+        @type key: hashable
+        @param key: The key under which the result is cached.
+        
+        @rtype: tuple|None
+        @return: A (<value>,) tuple, or None if no unexpired result is cached.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            (value, expiry) = entry
+            if expiry is None or expiry > _monotonic():
+                return (value,)
+            with self._lock:
+                self._entries.pop(key, None)
+                self._expirations += 1
+                self._hits -= 1
+                self._misses += 1
+        return None
+        
+    def _store(self, key, value):
+        """
+        This function caches a result from the handler.
+        
+        @type key: hashable
+        @param key: The key under which the result is cached.
+        @type value: object|None
+        @param value: The handler's result.
+        """
+        if self._ttl is None:
+            self.put(key, (value, None))
+        else:
+            self.put(key, (value, _monotonic() + self._ttl))
+            
+    def skipBuiltin(self):
+        """
+        This function records that a lookup was answered by a built-in name
+        without calling the handler.
+        """
+        with self._lock:
+            self._builtins += 1
+            
+    def getStatistics(self):
+        """
+        Returns a summary of this cache's state and effectiveness.
+        
+        @rtype: dict
+        @return: The dictionary described by _LRUCache.getStatistics(), with
+            the number of handler 'calls' made, of results that 'expired', of
+            lookups answered by 'builtins', and of handler calls 'saved' by the
+            cache and by built-in names together.
+        """
+        with self._lock:
+            statistics = _LRUCache.getStatistics(self)
+            statistics['calls'] = self._calls
+            statistics['expired'] = self._expirations
+            statistics['builtins'] = self._builtins
+            statistics['saved'] = self._hits + self._builtins
+            return statistics
+            
+class _ExpressionCache(_LRUCache):
+    """
+    This class extends _LRUCache with an index of the names on which each
+    cached entry depends, allowing entries to be invalidated when any of those
+    names are redefined.
+    """
+    _dependencies = None #: The (<prefix>, <name>) references on which each cached entry depends, keyed by entry.
+    _dependents = None #: The keys of cached entries, keyed by the (<prefix>, <name>) references they depend upon.
+    
+    def __init__(self, size):
+        """
+        This constructs a new, empty cache.
+        
+        @type size: int
+        @param size: The maximum number of entries to retain; if not positive,
+            nothing will be cached.
+        """
+        _LRUCache.__init__(self, size)
+        self._dependencies = {}
+        self._dependents = {}
+        
+    def put(self, key, value, dependencies=()):
+        """
+        This function caches a value, discarding the least-recently-used
+        entries if the cache is full.
+        
+        @type key: hashable
+        @param key: The key under which to cache the value.
+        @type value: object
+        @param value: The value to cache; it may not be None.
+        @type dependencies: iterable
+        @param dependencies: The (<prefix>, <name>) references that, if
+            redefined, invalidate the value.
+        
+        @rtype: list
+        @return: The keys of all discarded entries.
+        """
+        with self._lock:
+            self._unindex(key)
+            evicted = _LRUCache.put(self, key, value)
+            for evicted_key in evicted:
+                self._unindex(evicted_key)
+            if key in self._entries:
+                dependencies = tuple(dependencies)
+                self._dependencies[key] = dependencies
+                for dependency in dependencies:
+                    self._dependents.setdefault(dependency, set()).add(key)
+            return evicted
+        
+    def pop(self, key):
+        """
+        This function removes the value cached under the given key, if any.
+        
+        @type key: hashable
+        @param key: The key to discard.
+        
+        @rtype: object|None
+        @return: The discarded value or None if there was none.
+        """
+        with self._lock:
+            self._unindex(key)
+            return _LRUCache.pop(self, key)
+        
+    def invalidate(self, dependency):
+        """
+        This function discards every entry that depends on the given reference.
+        
+        @type dependency: tuple
+        @param dependency: A (<prefix>, <name>) reference that has been
+            redefined.
+        """
+        with self._lock:
+            for key in list(self._dependents.get(dependency, ())):
+                self.pop(key)
+            
+    def clear(self):
+        """
+        This function discards every cached value.
+        """
+        with self._lock:
+            _LRUCache.clear(self)
+            self._dependencies.clear()
+            self._dependents.clear()
+        
+    def _unindex(self, key):
+        for dependency in self._dependencies.pop(key, ()):
+            keys = self._dependents[dependency]
+            keys.discard(key)
+            if not keys:
+                del self._dependents[dependency]
+                
+                
+#Logical entities
+########################################
+class _CallStack(collections.OrderedDict):
+    """
+    This class records the variables and functions being evaluated, in the
+    order in which they were entered, so that recursion can be detected in
+    constant time, and limits how deeply they may be nested.
+    """
+    _max_depth = None #: The number of entries beyond which evaluation is refused.
+    
+    def __init__(self, max_depth=_MAX_DEPTH):
+        """
+        This constructs a new, empty call stack.
+        
+        @type max_depth: int
+        @param max_depth: The number of entries beyond which evaluation is
+            refused.
+        """
+        collections.OrderedDict.__init__(self)
+        self._max_depth = max_depth
+        
+    def getMaxDepth(self):
+        """
+        Returns the number of entries beyond which evaluation is refused.
+        
+        @rtype: int
+        @return: The maximum depth of this stack.
+        """
+        return self._max_depth
+        
+        
+class _Program(object):
+    """
+    This class holds a compiled RPN stack in a compact form: a byte-sized opcode
+    and an integer operand per token, in parallel arrays, with the operands
+    indexing a pool of constants and a pool of variable and function
+    references.
+    
+    The pools are held as tuples, so that programs without constants or without
+    references share the empty one.
+    
+    It behaves as a read-only sequence of the RPN tokens it encodes, decoding
+    them on access, so it can be inspected, rendered, and compiled into native
+    evaluators like the lists it replaces.
+    """
+    __slots__ = (
+     '_opcodes', #An array of opcodes, one per token.
+     '_operands', #An array of indices into the constant or reference pool, one per token.
+     '_constants', #The numbers, and any other literal values, pushed by the program.
+     '_references', #The variable and function tokens the program refers to.
+    )
+    
+    def __init__(self, tokens=()):
+        """
+        This constructs a new program from an RPN stack.
+        
+        @type tokens: iterable
+        @param tokens: The RPN tokens to encode.
+        """
+        self.encode(tokens)
+        
+    def encode(self, tokens):
+        """
+        This function replaces the contents of this program with an encoding of
+        the given RPN tokens.
+        
+        @type tokens: iterable
+        @param tokens: The RPN tokens to encode.
+        """
+        opcodes = []
+        operands = []
+        constants = []
+        references = []
+        for token in tokens:
+            if type(token) == tuple:
+                opcodes.append(_OPCODE_REFERENCES.get(token[0], _OPCODE_UNKNOWN))
+                operands.append(len(references))
+                references.append(token)
+            elif isinstance(token, basestring) and token in _OPCODE_SYMBOLS:
+                opcodes.append(_OPCODE_SYMBOLS[token])
+                operands.append(0)
+            else:
+                opcodes.append(_OPCODE_CONSTANT)
+                operands.append(len(constants))
+                constants.append(token)
+        (self._opcodes, self._operands) = (array.array('B', opcodes), array.array('i', operands))
+        (self._constants, self._references) = (tuple(constants), tuple(references))
+        
+    def _decode(self, position):
+        opcode = self._opcodes[position]
+        if opcode < _OPCODE_CONSTANT:
+            return _OPCODE_OPERATORS[opcode]
+        elif opcode == _OPCODE_CONSTANT:
+            return self._constants[self._operands[position]]
+        return self._references[self._operands[position]]
+        
+    def __len__(self):
+        return len(self._opcodes)
+        
+    def __iter__(self):
+        (constants, references) = (self._constants, self._references)
+        for (opcode, operand) in zip(self._opcodes, self._operands):
+            if opcode < _OPCODE_CONSTANT:
+                yield _OPCODE_OPERATORS[opcode]
+            elif opcode == _OPCODE_CONSTANT:
+                yield constants[operand]
+            else:
+                yield references[operand]
+            
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(position) for position in range(*index.indices(len(self._opcodes)))]
+        if index < 0:
+            index += len(self._opcodes)
+            if index < 0:
+                raise IndexError(index)
+        return self._decode(index)
+        
+    def __add__(self, other):
+        return list(self) + other
+        
+    def __radd__(self, other):
+        return other + list(self)
+        
+    def __eq__(self, other):
+        if isinstance(other, (_Program, list)):
+            return list(self) == list(other)
+        return NotImplemented
+        
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+        
+    __hash__ = None
+    
+    def __repr__(self):
+        return "_Program(%r)" % (list(self),)
+        
+        
+class Equation(object):
+    """
+    This class models an equation, which is any expression that can be evaluated
+    to produce a numeric value.
+    
+    Equations, and the variables, parameters, and functions derived from them,
+    declare their attributes as slots, since a session may hold a great many of
+    them, including one for every argument of every function call.
+    """
+    __slots__ = (
+     '_tokens', #The tokens that make up this expression.
+     '_equation', #The expression to be evaluated in RPN, with substitutions, as a _Program; None if not yet compiled.
+     '_evaluator', #A callable that evaluates the expression natively, if one has been built.
+     '_source', #The Python source from which _evaluator was generated, if any.
+     '_max_depth', #The number of variables and functions that may be nested when this equation is evaluated.
+     '_placeholders', #The names of the variables bound anew by each evaluation, in order of their positions in the frame.
+    )
+    
+    def __init__(self, tokens, placeholders=()):
+        """
+        This constructs a new Equation.
+        
+        @type tokens: list
+        @param tokens: A list of tokens that represent the expression modeled by
+            this equation.
+        @type placeholders: sequence
+        @param placeholders: The names of variables whose values are to be
+            bound by each evaluation, shadowing any variables of the same name.
+        
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        if not tokens:
+            raise TokensError()
+            
+        self._tokens = tokens
+        self._equation = None
+        self._evaluator = None
+        self._source = None
+        self._max_depth = _MAX_DEPTH
+        self._placeholders = tuple(placeholders)
+        
+    def copy(self):
+        """
+        Returns a non-compiled copy.
+        """
+        return Equation(self._tokens, self._placeholders)
+        
+    def compile(self, functions, variables):
+        """
+        This function compiles this equation, performing semantic validation and
+        replacing symbolic function and variable references with object-based
+        ones. Sub-expressions whose values cannot change are reduced to
+        constants.
+        
+        When done, this equation will be ready for evaluation.
+        
+        @type functions: defaultdict
+        @param functions: A dictionary of functions, keyed by arity and name.
+        @type variables: defaultdict
+        @param variables: A dictionary of variables, keyed by name.
+        
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        if self._equation: #Already compiled.
+            return
+            
+        if not self._tokens:
+            raise TokensError()
+            
+        if self._placeholders:
+            variables = variables.copy()
+            for (index, name) in enumerate(self._placeholders):
+                variables[name] = Parameter(name, index)
+        equation = _parseExpression(self._tokens, functions, variables)
+        if equation is None: #Identify the problem.
+            equation = _foldConstants(_convertRPN(_validateExpression(self._tokens, functions, variables)))
+        self._equation = _Program(equation)
+        
+    def recompile(self, functions, variables):
+        """
+        This function discards this equation's compiled form and compiles it
+        again, so that its references are resolved against the current
+        contents of the given dictionaries. Any native evaluator is rebuilt
+        with the same backend.
+        
+        If compilation fails, the previous compiled form is retained.
+        
+        @type functions: defaultdict
+        @param functions: A dictionary of functions, keyed by arity and name.
+        @type variables: defaultdict
+        @param variables: A dictionary of variables, keyed by name.
+        
+        @raise FunctionError: If a referenced function cannot be resolved.
+        @raise VariableError: If a referenced variable cannot be resolved.
+        """
+        equation = self._equation
+        self._equation = None
+        try:
+            self.compile(functions, variables)
+        except Error:
+            self._equation = equation
+            raise
+        self.refresh()
+        
+    def refresh(self):
+        """
+        This function rebuilds this equation's native evaluator, if it has one,
+        with the same backend, after its RPN stack has been altered.
+        """
+        if self._source is not None:
+            self.compileSource()
+        elif self._evaluator is not None:
+            self.compileClosure()
+            
+    def compileClosure(self):
+        """
+        This function builds a tree of closures from this equation's compiled
+        RPN stack, which will be used in place of the interpreter whenever this
+        equation is evaluated.
+        
+        Results and errors are identical to those produced by the interpreter;
+        only the per-token dispatch overhead is removed.
+        
+        @raise CompilationError: If this equation has not been compiled.
+        @raise ThresholdError: If function calls are nested too deeply for
+            closures to be built, in which case the interpreter remains in use.
+        """
+        if self._equation == None:
+            raise CompilationError(self._tokens)
+            
+        try:
+            evaluator = _buildClosure(self._equation)
+        except RuntimeError: #Python's recursion limit was reached.
+            self._evaluator = self._source = None
+            raise ThresholdError("Function calls are nested too deeply to be compiled natively.")
+        self._evaluator = evaluator
+        self._source = None
+        
+    def compileSource(self):
+        """
+        This function translates this equation's compiled RPN stack into Python
+        source and executes it to produce a native function, which will be used
+        in place of the interpreter whenever this equation is evaluated.
+        
+        The generated source may be inspected with getSource().
+        
+        @raise CompilationError: If this equation has not been compiled.
+        @raise ThresholdError: If function calls are nested too deeply for
+            source to be generated, in which case the interpreter remains in
+            use.
+        """
+        if self._equation == None:
+            raise CompilationError(self._tokens)
+            
+        try:
+            (source, namespace) = _generateSource(self._equation, str(self))
+            exec(compile(source, "<calc: %s>" % (self), 'exec'), namespace)
+        except RuntimeError: #Python's recursion limit was reached.
+            self._evaluator = self._source = None
+            raise ThresholdError("Function calls are nested too deeply to be compiled natively.")
+        self._evaluator = namespace['_compiled']
+        self._source = source
+        
+    def evaluate(self, stack=None, frame=(), bindings=None):
+        """
+        This function provides the numeric value of this equation.
+        
+        Evaluation alters nothing, so an equation with placeholders may be
+        evaluated with different bindings concurrently.
+        
+        @type stack: None|_CallStack
+        @param stack: A stack containing every function and variable traversed
+            until this point.
+        @type frame: sequence
+        @param frame: The argument values of the function call in which this
+            equation is being evaluated, indexed by parameter position.
+        @type bindings: dict|None
+        @param bindings: The values of this equation's placeholders, keyed by
+            name, which take the place of frame; names that are not
+            placeholders are ignored.
+            
+        @rtype: int|float
+        @return: The value of this equation.
+        
+        @raise CompilationError: If this equation has not been compiled.
+        @raise VariableError: If a placeholder is not bound.
+        @raise RecursionError: If this equation has already been invoked during
+            the evaluation process.
+        @raise ThresholdError: If the values passed to an operand or function exceed
+            pre-defined limits, if definitions are nested more deeply than the
+            maximum depth of the evaluation, or if function calls are nested
+            too deeply for a native evaluator to follow.
+        @raise DivisionByZeroError: If a division by zero would occur as a result of
+            an operation.
+        @raise IncompleteExpressionError: If there are excessive tokens in the input
+            stack.
+        @raise NullSubexpressionError: If a bracketed expression contains no
+            content.
+        """
+        if self._equation == None:
+            raise CompilationError(self._tokens)
+            
+        if bindings is not None or self._placeholders and not frame:
+            frame = self._bind(bindings or {})
+        if stack is None:
+            stack = _CallStack(self._max_depth)
+        _enterCall(stack, self)
+        try:
+            if self._evaluator is not None:
+                try:
+                    return self._evaluator(stack, frame)
+                except RuntimeError: #Python's recursion limit was reached.
+                    raise ThresholdError("Function calls are nested too deeply to be evaluated natively.")
+            return _evaluateRPN(self._equation, stack, frame)
+        finally:
+            del stack[self]
+        
+    def getMaxDepth(self):
+        """
+        Returns the number of variables and functions that may be nested when
+        this equation is evaluated.
+        
+        @rtype: int
+        @return: The maximum depth of evaluations started by this equation.
+        """
+        return self._max_depth
+        
+    def setMaxDepth(self, max_depth):
+        """
+        Sets the number of variables and functions that may be nested when this
+        equation is evaluated, beyond which ThresholdError is raised.
+        
+        Nesting is tracked without Python recursion, so the limit may exceed
+        sys.getrecursionlimit() when this equation is interpreted.
+        
+        @type max_depth: int
+        @param max_depth: The maximum depth of evaluations started by this
+            equation.
+        """
+        self._max_depth = max_depth
+        
+    def evaluate_vectorized(self, bindings):
+        """
+        This function computes this equation for every row of a set of arrays
+        in a single pass, without altering any variables.
+        
+        Variables named in bindings take their values from the given arrays;
+        unbound variables and custom functions are evaluated over the arrays in
+        turn, so bindings propagate through them. This differs from the
+        bindings of evaluate() and Session.evaluate_many(), which shadow only
+        the equation's own references.
+        
+        Results match those of evaluate(), up to floating-point rounding:
+        integers too large for 64 bits are computed exactly, giving an array of
+        Python integers, and rows for which evaluate() would produce complex
+        numbers or values of differing types give an array of those values.
+        Rows that evaluate() would reject raise its errors, though, when rows
+        fail in different ways, the error raised is that of the first
+        calculation to fail rather than that of the first row.
+        
+        @type bindings: dict
+        @param bindings: Sequences (or scalars) of values, keyed by variable
+            name; all sequences must be of the same length. Every placeholder
+            must be bound.
+            
+        @rtype: numpy.ndarray
+        @return: The value of this equation for each row.
+        
+        @raise ImportError: If NumPy is not available.
+        @raise CompilationError: If this equation has not been compiled.
+        @raise VariableError: If a placeholder is not bound.
+        @raise RecursionError: If a variable or function is invoked while it is
+            already being evaluated.
+        @raise ThresholdError: If the values passed to an operand or function
+            exceed pre-defined limits; getRows() identifies the offending rows.
+        @raise DivisionByZeroError: If a division by zero would occur as a result
+            of an operation; getRows() identifies the offending rows.
+        @raise IncompleteExpressionError: If there are excessive tokens in the input
+            stack.
+        @raise NullSubexpressionError: If a bracketed expression contains no
+            content.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for vectorized evaluation")
+        if self._equation == None:
+            raise CompilationError(self._tokens)
+            
+        arrays = dict((name, numpy.asarray(values)) for (name, values) in bindings.items())
+        rows = max([len(array) for array in arrays.values() if array.ndim] or [1])
+        result = _evaluateVectorized(self._equation, arrays, self._bind(arrays), rows, {}, [self])
+        return numpy.array(numpy.broadcast_to(result, (rows,)))
+        
+    def getTokens(self):
+        return self._tokens
+        
+    def getRPNTokens(self):
+        return self._equation
+        
+    def getReferences(self):
+        """
+        Returns every variable and function name this equation refers to.
+        
+        @rtype: set
+        @return: A set of (<prefix:str>, <name:str>) tuples, as produced by
+            _collectReferences().
+        """
+        references = _collectReferences(self._tokens)
+        if self._placeholders:
+            references.difference_update((_VARIABLE_PREFIX, name) for name in self._placeholders)
+        return references
+        
+    def getPlaceholders(self):
+        """
+        Returns the names of the variables bound by each evaluation.
+        
+        @rtype: tuple
+        @return: The names of this equation's placeholders, in order.
+        """
+        return self._placeholders
+        
+    def _bind(self, bindings):
+        """
+        This function arranges the values of this equation's placeholders into
+        a frame.
+        
+        @type bindings: dict
+        @param bindings: The values of the placeholders, keyed by name.
+        
+        @rtype: list
+        @return: The values, indexed by placeholder position.
+        
+        @raise VariableError: If a placeholder is not bound.
+        """
+        try:
+            return [bindings[name] for name in self._placeholders]
+        except KeyError as e:
+            raise VariableError(e.args[0], self._tokens)
+            
+    def getSource(self):
+        """
+        Returns the Python source that evaluates this equation, as used by
+        compileSource().
+        
+        @rtype: str
+        @return: The source of a function that takes a call stack.
+        
+        @raise CompilationError: If this equation has not been compiled.
+        """
+        if self._source is not None:
+            return self._source
+        if self._equation == None:
+            raise CompilationError(self._tokens)
+        return _generateSource(self._equation, str(self))[0]
+        
+    def __getstate__(self):
+        """
+        Provides this equation's attributes for pickling; a native evaluator is
+        recorded only as having existed, and is rebuilt when unpickled.
+        """
+        state = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                state[name] = getattr(self, name)
+        state['_evaluator'] = self._evaluator is not None
+        return state
+        
+    def __setstate__(self, state):
+        evaluator = state.pop('_evaluator')
+        for (name, value) in state.items():
+            setattr(self, name, value)
+        self._evaluator = None
+        if self._source is not None:
+            self.compileSource()
+        elif evaluator:
+            self.compileClosure()
+            
+    def __str__(self):
+        return _renderExpression(self._tokens)
+        
+class Variable(Equation):
+    """
+    This class models a variable, which is an equation that stores a value for
+    later (re-)use.
+    """
+    __slots__ = (
+     '_name', #The name of this variable.
+     '_computed_value', #The pre-computed value of this variable.
+     '_volatile', #Whether this variable's value may differ between evaluations, or None if not yet determined.
+    )
+    
+    def __init__(self, tokens, name):
+        """
+        This constructs a new Variable.
+        
+        @type tokens: list
+        @param tokens: A list of tokens that represent the expression modeled by
+            this variable.
+        @type name: basestring
+        @param name: The name of this variable.
+        
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        Equation.__init__(self, tokens)
+        self._name = name
+        self._computed_value = None
+        self._volatile = None
+        
+    def copy(self):
+        """
+        Returns a non-compiled copy.
+        """
+        return Variable(self._tokens, self._name)
+        
+    def compute(self, stack=None):
+        """
+        This function pre-computes the value of this variable, preventing
+        redundant when it will be used repeatedly. The value is retained until
+        reset() is called.
+        
+        @type stack: _CallStack
+        @param stack: A stack containing every function and variable traversed
+            until this point.
+        
+        @raise CompilationError: If this equation has not been compiled.
+        @raise RecursionError: If this equation has already been invoked during
+            the evaluation process.
+        @raise ThresholdError: If the values passed to an operand or function exceed
+            pre-defined limits.
+        @raise DivisionByZeroError: If a division by zero would occur as a result of
+            an operation.
+        @raise IncompleteExpressionError: If there are excessive tokens in the input
+            stack.
+        @raise NullSubexpressionError: If a bracketed expression contains no
+            content.
+        """
+        if self._computed_value == None:
+            self._computed_value = Equation.evaluate(self, stack)
+            
+    def evaluate(self, stack=None, compute=False):
+        """
+        This function returns the value of this variable, either pre-computed or
+        dynamically calculated, depending on status.
+        
+        @type stack: _CallStack
+        @param stack: A stack containing every function and variable traversed
+            until this point.
+        @type compute: bool
+        @param compute: If True, the result of evaluating this variable will be
+            cached if it has not already been computed.
+            
+        @rtype: int|float
+        @return: The value of this variable.
+        
+        @raise CompilationError: If this equation has not been compiled.
+        @raise RecursionError: If this equation has already been invoked during
+            the evaluation process.
+        @raise ThresholdError: If the values passed to an operand or function exceed
+            pre-defined limits.
+        @raise DivisionByZeroError: If a division by zero would occur as a result of
+            an operation.
+        @raise IncompleteExpressionError: If there are excessive tokens in the input
+            stack.
+        @raise NullSubexpressionError: If a bracketed expression contains no
+            content.
+        """
+        if compute:
+            self.compute(stack)
+        if self._computed_value is not None:
+            return self._computed_value
+        else:
+            return Equation.evaluate(self, stack)
+            
+    def reset(self):
+        """
+        This function clears any pre-computed value from this variable, and its
+        classification as volatile, forcing both to be determined anew.
+        """
+        self._computed_value = None
+        self._volatile = None
+        
+    def getName(self):
+        return self._name
+        
+    def __getstate__(self):
+        """
+        Provides this variable's attributes for pickling, without any
+        pre-computed value or classification as volatile.
+        """
+        state = Equation.__getstate__(self)
+        state['_computed_value'] = None
+        state['_volatile'] = None
+        return state
+        
+    def __str__(self):
+        return "v:%s" % (self._name)
+        
+class Parameter(object):
+    """
+    This class models a parameter, which is a placeholder for the value passed
+    in a particular position to each call to a function.
+    """
+    __slots__ = (
+     '_name', #The name of this parameter.
+     '_index', #The position of this parameter in its function's frame.
+    )
+    
+    def __init__(self, name, index):
+        """
+        This constructs a new Parameter.
+        
+        @type name: basestring
+        @param name: The name of this parameter.
+        @type index: int
+        @param index: The position of this parameter in its function's frame.
+        """
+        self._name = name
+        self._index = index
+        
+    def copy(self):
+        """
+        Returns a copy.
+        """
+        return Parameter(self._name, self._index)
+        
+    def getName(self):
+        return self._name
+        
+    def getIndex(self):
+        return self._index
+        
+    def __str__(self):
+        return "p:%s" % (self._name)
+        
+class _SharedSubexpression(Variable):
+    """
+    This class models a subexpression that appears in several places within a
+    Session, computed once and then reused until something it depends upon is
+    redefined.
+    """
+    __slots__ = ()
+    
+    def __init__(self, name):
+        """
+        This constructs a new _SharedSubexpression; its RPN stack is assigned by
+        _shareSubexpressions().
+        
+        @type name: basestring
+        @param name: A name for this subexpression, which cannot collide with
+            any that may be written in an expression.
+        """
+        self._tokens = None
+        self._equation = None
+        self._evaluator = None
+        self._source = None
+        self._max_depth = _MAX_DEPTH
+        self._placeholders = ()
+        self._name = name
+        self._computed_value = None
+        self._volatile = None
+        
+    def recompile(self, functions, variables):
+        """
+        Subexpressions have no source tokens, so they continue to refer to the
+        entities against which they were compiled; any entity that uses them
+        and refers to a redefined name is itself recompiled.
+        """
+        
+    def evaluate(self, stack=None, compute=True):
+        """
+        This function returns the value of this subexpression, computing it
+        only if it has not yet been cached.
+        
+        @type stack: _CallStack
+        @param stack: A stack containing every function and variable traversed
+            until this point.
+        @type compute: bool
+        @param compute: If True, the result is cached.
+        
+        @rtype: int|float
+        @return: The value of this subexpression.
+        """
+        return Variable.evaluate(self, stack, compute)
+        
+    def getReferences(self):
+        """
+        Returns the names of every variable and function this subexpression
+        refers to, as determined from its compiled references.
+        
+        @rtype: set
+        @return: A set of (<prefix:str>, <name:str>) tuples.
+        """
+        references = set()
+        for reference in _walkReferences(self._equation):
+            if isinstance(reference[1], Variable):
+                references.add((_VARIABLE_PREFIX, reference[1].getName()))
+            elif isinstance(reference[1], Function):
+                references.add((_FUNCTION_PREFIX, reference[1].getName()))
+        return references
+        
+    def __str__(self):
+        return "v:%s" % (self._name)
+        
+class Function(Equation):
+    """
+    This class models a function, which is an equation that requires zero or
+    more parameters to produce a result.
+    """
+    __slots__ = (
+     '_name', #The name of this function.
+     '_parameters', #The (<name>, <Parameter>) pairs of this function's parameters, in order.
+     '_memo', #Results previously computed by this function, keyed by argument values.
+     '_volatile', #Whether this function may produce different results for the same arguments, or None if not yet determined.
+    )
+    
+    def __init__(self, tokens, name):
+        """
+        This constructs a new Function.
+        
+        @type tokens: list
+        @param tokens: A list of tokens that represent the expression modeled by
+            this function.
+        @type name: basestring
+        @param name: The name of this function.
+        
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        Equation.__init__(self, tokens[1:])
+        self._name = name
+        self._parameters = []
+        self._memo = _LRUCache(_FUNCTION_MEMO_SIZE)
+        self._volatile = None
+        
+        parameters = tokens[0]
+        if parameters:
+            for (index, i) in enumerate([j.strip() for j in parameters.split(_FUNCTION_DELIMITER)]):
+                self._parameters.append((i, Parameter(i, index)))
+                
+    def copy(self):
+        """
+        Returns a non-compiled copy.
+        """
+        return Function([', '.join(name for (name, parameter) in self._parameters)] + list(self._tokens), self._name)
+        
+    def compile(self, functions, variables):
+        """
+        This function compiles this function, extending Equation.compile(),
+        which it invokes, with references to function parameters as variables.
+        
+        @type functions: defaultdict
+        @param functions: A dictionary of functions, keyed by arity and name.
+        @type variables: defaultdict
+        @param variables: A dictionary of variables, keyed by name.
+        
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        variables = variables.copy()
+        for (name, parameter) in self._parameters:
+            variables[name] = parameter
+            
+        Equation.compile(self, functions, variables)
+        self.reset()
+        
+    def evaluate(self, arguments, stack):
+        """
+        This function provides the numeric value of this function.
+        
+        The arguments form a frame, private to this call, against which the
+        function's parameters are resolved, so a Function may be evaluated by
+        any number of threads at once. The results of pure functions are
+        memoized, keyed by their argument values.
+        
+        @type arguments: sequence
+        @param arguments: The values, or equations that provide them, that are
+            mapped, in order, to this function's parameters.
+        @type stack: _CallStack|None
+        @param stack: A stack containing every function and variable traversed
+            until this point.
+        
+        @rtype: int|float
+        @return: The value of this function.
+        
+        @raise CompilationError: If this equation has not been compiled.
+        @raise RecursionError: If this equation has already been invoked during
+            the evaluation process.
+        @raise ThresholdError: If the values passed to an operand or function exceed
+            pre-defined limits.
+        @raise DivisionByZeroError: If a division by zero would occur as a result of
+            an operation.
+        @raise IncompleteExpressionError: If there are excessive tokens in the input
+            stack.
+        @raise NullSubexpressionError: If a bracketed expression contains no
+            content.
+        """
+        frame = []
+        for argument in arguments:
+            if isinstance(argument, Equation):
+                argument = argument.evaluate(stack)
+            frame.append(argument)
+            
+        key = self._getMemoKey(frame)
+        if key is not None:
+            result = self._memo.get(key)
+            if result is not None:
+                return result
+                
+        result = Equation.evaluate(self, stack, frame)
+        
+        if key is not None:
+            self._memo.put(key, result)
+        return result
+        
+    def _getMemoKey(self, frame):
+        """
+        Returns the key under which the result of a call with the given argument
+        values is memoized.
+        
+        @type frame: sequence
+        @param frame: The argument values of the call.
+        
+        @rtype: tuple|None
+        @return: The key, or None if the result may not be memoized.
+        """
+        if self.isPure() and all(isinstance(argument, numbers.Number) for argument in frame):
+            return tuple((type(argument), argument) for argument in frame)
+        return None
+        
+    def reset(self):
+        """
+        This function discards every result memoized by this function and its
+        classification as pure, forcing both to be determined anew.
+        """
+        self._memo.clear()
+        self._volatile = None
+        
+    def isPure(self):
+        """
+        Indicates whether this function always produces the same result for the
+        same arguments, which is the case unless its body reaches a random
+        built-in or an external function. Only the results of pure functions
+        are memoized.
+        
+        @rtype: bool
+        @return: True if this function is pure.
+        """
+        return not _isVolatile(self)
+        
+    def setMemoSize(self, size):
+        """
+        This function sets the number of results this function memoizes,
+        discarding any already memoized.
+        
+        @type size: int
+        @param size: The maximum number of results to retain; if not positive,
+            nothing will be memoized.
+        """
+        self._memo = _LRUCache(size)
+        
+    def getMemoStatistics(self):
+        """
+        Returns a summary of this function's memo table and its effectiveness.
+        
+        @rtype: dict
+        @return: The dictionary described by _LRUCache.getStatistics(), with
+            'pure' indicating whether results are memoized at all.
+        """
+        statistics = self._memo.getStatistics()
+        statistics['pure'] = self.isPure()
+        return statistics
+        
+    def getArity(self):
+        return len(self._parameters)
+        
+    def getParameters(self):
+        return self._parameters
+        
+    def getReferences(self):
+        """
+        Returns every variable and function name this function refers to,
+        excluding its own parameters.
+        
+        @rtype: set
+        @return: A set of (<prefix:str>, <name:str>) tuples, as produced by
+            _collectReferences().
+        """
+        return Equation.getReferences(self).difference((_VARIABLE_PREFIX, name) for (name, parameter) in self._parameters)
+        
+    def getName(self):
+        return self._name
+        
+    def __getstate__(self):
+        """
+        Provides this function's attributes for pickling, recording only the
+        size of its memo table.
+        """
+        state = Equation.__getstate__(self)
+        state['_memo'] = self._memo.getStatistics()['maximum']
+        state['_volatile'] = None
+        return state
+        
+    def __setstate__(self, state):
+        memo_size = state.pop('_memo')
+        Equation.__setstate__(self, state)
+        self._memo = _LRUCache(memo_size)
+        
+    def __str__(self):
+        return "f:%s/%i" % (self._name, len(self._parameters))
+        
+        
+class PreparedEquation(object):
+    """
+    This class models an equation bound to a Session, which remains compiled
+    until a variable, function, or external value it references changes.
+    """
+    _session = None #: The Session against which this equation is compiled.
+    _tokens = None #: The tokens that make up this expression.
+    _equation = None #: The compiled Equation, or None if not yet compiled.
+    _versions = None #: The (<reference>, <version>) pairs of every name mentioned, as compiled.
+    _lookups = None #: The (<prefix>, <key>, <value>) external lookups made while compiling.
+    _placeholders = () #: The names of the variables bound by each evaluation.
+    
+    def __init__(self, session, tokens, placeholders=()):
+        """
+        This constructs a new PreparedEquation. It will be compiled when first
+        used.
+        
+        @type session: Session
+        @param session: The Session against which the equation is compiled.
+        @type tokens: list
+        @param tokens: A list of tokens that represent the expression modeled by
+            this equation.
+        @type placeholders: sequence
+        @param placeholders: The names of variables whose values are to be
+            bound by each evaluation, as by Equation.
+        
+        @raise TokensError: If no tokens are provided.
+        """
+        if not tokens:
+            raise TokensError()
+            
+        self._session = session
+        self._tokens = tokens
+        self._placeholders = tuple(placeholders)
+        
+    def getEquation(self):
+        """
+        This function provides the compiled Equation, recompiling it first if
+        anything it references has changed.
+        
+        @rtype: Equation
+        @return: The compiled Equation.
+        
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        if self._equation is None:
+            (self._equation, self._versions, self._lookups) = self._session._compilePrepared(self._tokens, self._placeholders)
+            return self._equation
+            
+        session = self._session
+        prefetch = session._prefetch([(prefix, key) for (prefix, key, value) in self._lookups])
+        try: #Recompilation reuses the results the check fetched.
+            if not session._isCurrent(self._versions, self._lookups):
+                (self._equation, self._versions, self._lookups) = session._compilePrepared(self._tokens, self._placeholders)
+        finally:
+            session._release(prefetch)
+        return self._equation
+        
+    def evaluate(self, bindings=None):
+        """
+        This function provides the numeric value of this equation.
+        
+        @type bindings: dict|None
+        @param bindings: The values of this equation's placeholders, keyed by
+            name.
+        
+        @rtype: int|float
+        @return: The value of this equation.
+        
+        @raise VariableError: If a placeholder is not bound.
+        @raise RecursionError: If this equation has already been invoked during
+            the evaluation process.
+        @raise ThresholdError: If the values passed to an operand or function exceed
+            pre-defined limits.
+        @raise DivisionByZeroError: If a division by zero would occur as a result of
+            an operation.
+        @raise IncompleteExpressionError: If there are excessive tokens in the input
+            stack.
+        @raise NullSubexpressionError: If a bracketed expression contains no
+            content.
+        """
+        return self.getEquation().evaluate(bindings=bindings)
+        
+    def getTokens(self):
+        return self._tokens
+        
+    def __call__(self, bindings=None):
+        return self.evaluate(bindings)
+        
+    def __str__(self):
+        return _renderExpression(self._tokens)
+        
+class Session(object):
+    """
+    This class provides a context in which equations may be evaluated. Sessions
+    store variables and functions that are needed to support complex equations.
+    """
+    _variables = None #: A dictionary of all local variables.
+    _functions = None #: A dictionary of all local functions.
+    _equation = None #: A list of all equations to be evaluated.
+    _variable_lookup_handler = None #: A callable used to access external variables on-demand.
+    _function_lookup_handler = None #: A callable used to access external functions on-demand.
+    _cache = None #: PreparedEquations, keyed by the expressions from which they were built.
+    _versions = None #: Redefinition counters, keyed by (<prefix>, <name>) reference.
+    _compiling = None #: Per-thread state of the compilations in progress, so that concurrent compilations do not disturb one another.
+    _dependents = None #: The entities that refer to each (<prefix>, <name>) reference.
+    _shared = None #: The _SharedSubexpressions created by shareSubexpressions().
+    _parent = None #: The Session from which this one was forked, whose definitions it inherits, or None.
+    _forks = None #: The Sessions forked from this one, which follow its redefinitions.
+    _lookup_cache = None #: Results from the lookup handlers, keyed by (<prefix>, <name or spec>).
+    _shadowable = None #: The names of built-in variables and functions that the lookup handlers may override.
+    _bulk_lookup_handler = None #: A callable used to access many external variables and functions at once.
+    _workers = None #: The pool of worker processes kept for evaluate_parallel(), as (<executor>, <key>, <warm>), where key holds what the workers were given, or None.
+    _stale = None #: The namespace keys of inherited definitions that must be copied into this fork when next resolved, keyed by the (<prefix>, <name>) under which they are referenced.
+    _copies = None #: The inherited definitions copied into this fork, keyed by namespace key and, above that, by the (<prefix>, <name>) under which they are referenced.
+    
+    def __init__(self, input=None, variable_lookup_handler=None, function_lookup_handler=None, cache_size=_EQUATION_CACHE_SIZE, lookup_cache_size=_LOOKUP_CACHE_SIZE, lookup_ttl=None, shadowable=(), bulk_lookup_handler=None):
+        """
+        This creates a new session.
+        
+        If any expressions are provided, they will be processed, with appropriate
+        entities resulting.
+        
+        Once all entities have been generated, they will be compiled; handling
+        this process in a two-stage manner prevents circular referencing from
+        being a problem.
+        
+        @type input: basestring
+        @param input: The variables, functions, and equations with which this
+            session will be initialized.
+        @type variable_lookup_handler: callable
+        @param variable_lookup_handler: A callable that takes a variable-name
+            as a basestring and returns a value or None, used to access external
+            variables on-demand.
+        @type function_lookup_handler: callable
+        @param function_lookup_handler: A callable that takes an arity-number
+            and function-name as a basestring and returns a value or None, used
+            to access external functions on-demand.
+        @type cache_size: int
+        @param cache_size: The number of compiled equations to retain for reuse
+            by createEquation() and evaluate_equation(); 0 disables caching.
+        @type lookup_cache_size: int
+        @param lookup_cache_size: The number of results from the lookup
+            handlers, including the absence of a result, to retain; 0 disables
+            caching.
+        @type lookup_ttl: int|float|None
+        @param lookup_ttl: The number of seconds for which results from the
+            lookup handlers are retained, or None if they never expire.
+        @type shadowable: iterable
+        @param shadowable: The names of built-in variables and functions that
+            the lookup handlers may override; other built-in names are resolved
+            without consulting the handlers.
+        @type bulk_lookup_handler: callable
+        @param bulk_lookup_handler: A callable that takes a tuple of
+            variable-names and a tuple of (<arity>, <name>) function-specs and
+            returns a dictionary of values keyed by name or spec, in which
+            absent keys have no value, used in place of the other handlers to
+            access every external name in an expression at once.
+            
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        session = self
+        class variables_dict(collections.defaultdict):
+            def __missing__(self, key):
+                value = session._lookupVariable(key)
+                lookups = getattr(session._compiling, 'lookups', None)
+                if lookups is not None:
+                    lookups.append((_VARIABLE_PREFIX, key, value))
+                return value
+                
+        class functions_dict(collections.defaultdict):
+            def __missing__(self, key):
+                value = session._lookupFunction(key)
+                lookups = getattr(session._compiling, 'lookups', None)
+                if lookups is not None:
+                    lookups.append((_FUNCTION_PREFIX, key, value))
+                return value
+                
+        self._variable_lookup_handler = variable_lookup_handler
+        self._function_lookup_handler = function_lookup_handler
+        self._bulk_lookup_handler = bulk_lookup_handler
+        self._variables = variables_dict()
+        self._functions = functions_dict()
+        self._equations = []
+        self._cache = _ExpressionCache(cache_size)
+        self._versions = {}
+        self._dependents = {}
+        self._shared = []
+        self._stale = {}
+        self._copies = {}
+        self._forks = weakref.WeakSet()
+        self._compiling = threading.local()
+        self._lookup_cache = _LookupCache(lookup_cache_size, lookup_ttl)
+        self._shadowable = frozenset(shadowable)
+        if input:
+            self._define(input)
+            self._compileEntities()
+            
+    def fork(self, input=None, cache_size=_EQUATION_CACHE_SIZE):
+        """
+        This creates a new Session that inherits every variable and function
+        known to this one, without copying any of them, and in which further
+        definitions may be made without affecting this Session.
+        
+        Inherited definitions are resolved through this Session's namespaces,
+        and so through its lookup handlers, when first needed, and are used as
+        compiled here; only those that depend, directly or transitively, on a
+        name the fork redefines are copied into it, and recompiled, the next
+        time they are resolved.
+        
+        The fork's getVariables(), getFunctions(), and evaluate() cover only
+        the definitions made in, or copied into, it. It follows this Session
+        thereafter: whenever this Session redefines or clears a name, whatever
+        the fork compiled against the previous definition is recompiled, and
+        copies made from it are discarded, to be copied anew from the current
+        definition when next resolved, so inherited and copied definitions
+        always agree.
+        
+        @type input: basestring
+        @param input: The variables, functions, and equations with which the
+            fork will be initialized.
+        @type cache_size: int
+        @param cache_size: The number of compiled equations the fork retains.
+        
+        @rtype: Session
+        @return: The new Session.
+        
+        @raise RecursionError: If any definition in the input would cause a
+            variable or function to refer to itself, directly or transitively.
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        session = Session(cache_size=cache_size)
+        session._parent = self
+        self._forks.add(session)
+        if input:
+            session._define(input)
+            for name in list(session._variables.keys()):
+                session._overlay((_VARIABLE_PREFIX, name))
+            for (arity, name) in list(session._functions.keys()):
+                session._overlay((_FUNCTION_PREFIX, name))
+            session._compileEntities()
+        return session
+        
+    def getParent(self):
+        """
+        Returns the Session from which this one was forked, or None.
+        
+        @rtype: Session|None
+        @return: The parent Session.
+        """
+        return self._parent
+        
+        
+    def _define(self, input):
+        """
+        This function adds the variables, functions, and equations expressed in
+        the given input to this Session, without compiling them.
+        
+        @type input: basestring
+        @param input: A semicolon-separated series of expressions.
+        """
+        for i in input.split(';'):
+            (tokens, line_type) = _parseLine(i)
+            if tokens:
+                if line_type == _LINE_VARIABLE:
+                    name = tokens[0]
+                    self._variables[name] = Variable(tokens[1:], name)
+                elif line_type == _LINE_FUNCTION:
+                    name = tokens[0]
+                    function = Function(tokens[1:], name)
+                    self._functions[(function.getArity(), name)] = function
+                else:
+                    self._equations.append(Equation(tokens))
+                    
+    def getVariables(self):
+        """
+        Returns a dictionary of Variables, keyed by variable name.
+        
+        @rtype: dict
+        @return: A dictionary of Variables, keyed by variable name.
+        """
+        return self._variables
+        
+    def listVariables(self):
+        """
+        This provides a collection of 'name' variable identifiers.
+        
+        All variables known to this Session will be represented.
+        
+        @rtype: tuple
+        @return: A collection of 'name' variable-identifying strings.
+        """
+        variables = set(_VARIABLES.keys())
+        for name in self._variables.keys():
+            variables.add(name)
+        if self._parent is not None:
+            variables.update(self._parent.listVariables())
+            
+        return tuple(sorted(variables))
+        
+    def createVariable(self, expression):
+        """
+        This creates a new variable within the context of this session. However,
+        it will not be assigned to this session unless explicitly set with
+        setVariable().
+        
+        @type expression: basestring
+        @param expression: The expression used to model this variable.
+        
+        @rtype: Variable
+        @return: The newly created Variable.
+        
+        @raise InstantiationError: If an invalid expression is provided.
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        if not isinstance(expression, basestring):
+            raise InstantiationError("Non-string input")
+        (tokens, line_type) = _parseLine(expression)
+        if not tokens:
+            raise InstantiationError("Nothing expressed")
+        if not line_type == _LINE_VARIABLE:
+            raise InstantiationError("Not a variable")
+            
+        variable = Variable(tokens[1:], tokens[0])
+        prefetch = self._prefetch(_collectEntityLookups((variable,)))
+        try:
+            variable.compile(self._functions, self._variables)
+        finally:
+            self._release(prefetch)
+        
+        return variable
+        
+    def setVariable(self, variable):
+        """
+        This adds a new variable to the set of variables known to this Session.
+        
+        Entities known to this Session that refer to the variable's name are
+        recompiled to use it, and their computed values are discarded.
+        
+        Variables from other sessions may be added, with the results being that
+        entities in the context of this Session will refer to the alien
+        variable, which in turn may refer to other alien entities. This will
+        probably be meaningless in most cases, however.
+        
+        @type variable: Variable
+        @param variable: The Variable to add.
+        
+        @raise InstantiationError: If something other than a Variable is
+            provided.
+        @raise RecursionError: If the variable would refer to itself, directly
+            or transitively; the Session is left unchanged.
+        """
+        if not type(variable) == Variable:
+            raise InstantiationError("Non-Variable input")
+            
+        self._checkCycles(variable, (_VARIABLE_PREFIX, variable.getName()))
+        previous = dict.get(self._variables, variable.getName())
+        if previous is not None:
+            self._untrack(previous)
+        self._variables[variable.getName()] = variable
+        self._track(variable)
+        self._redefine((_VARIABLE_PREFIX, variable.getName()), variable)
+        
+    def clearVariable(self, name):
+        """
+        This function removes the named variable from its namespace, if it
+        exists.
+        
+        @type name: basestring
+        @param name: The name of the variable to dereference.
+        """
+        if name in self._variables:
+            self._untrack(self._variables.pop(name))
+            self._redefine((_VARIABLE_PREFIX, name))
+        
+    def getFunctions(self):
+        """
+        Returns a dictionary of functions keyed by arity and name.
+        
+        @rtype: dict
+        @return: A dictionary of functions keyed by arity and name.
+        """
+        return self._functions
+        
+    def listFunctions(self):
+        """
+        This provides a collection of 'name/arity' function identifiers.
+        
+        All functions known to this Session will be represented.
+        
+        @rtype: tuple
+        @return: A collection of 'name/arity' function-identifying strings.
+        """
+        functions = set()
+        for (arity, name) in _FUNCTIONS.keys():
+            functions.add("%s/%i" % (name, arity))
+            
+        for (arity, name) in self._functions.keys():
+            functions.add("%s/%i" % (name, arity))
+        if self._parent is not None:
+            functions.update(self._parent.listFunctions())
+            
+        return tuple(sorted(functions))
+        
+    def createFunction(self, expression):
+        """
+        This creates a new function within the context of this session. However,
+        it will not be assigned to this session unless explicitly set with
+        setFunction().
+        
+        @type expression: basestring
+        @param expression: The expression used to model this function.
+        
+        @rtype: Function
+        @return: The newly created Function.
+        
+        @raise InstantiationError: If an invalid expression is provided.
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        if not isinstance(expression, basestring):
+            raise InstantiationError("Non-string input")
+        (tokens, line_type) = _parseLine(expression)
+        if not tokens:
+            raise InstantiationError("Nothing expressed")
+        if not line_type == _LINE_FUNCTION:
+            raise InstantiationError("Not a function")
+            
+        function = Function(tokens[1:], tokens[0])
+        prefetch = self._prefetch(_collectEntityLookups((function,)))
+        try:
+            function.compile(self._functions, self._variables)
+        finally:
+            self._release(prefetch)
+        
+        return function
+        
+    def setFunction(self, function):
+        """
+        This adds a new function to the set of functions known to this Session.
+        
+        Entities known to this Session that refer to the function's name are
+        recompiled to use it, and their computed values are discarded.
+        
+        Functions from other sessions may be added, with the results being that
+        entities in the context of this Session will refer to the alien
+        function, which in turn may refer to other alien entities. This will
+        probably be meaningless in most cases, however.
+        
+        @type function: Function
+        @param function: The Function to add.
+        
+        @raise InstantiationError: If something other than a Function is
+            provided.
+        @raise RecursionError: If the function would refer to itself, directly
+            or transitively; the Session is left unchanged.
+        """
+        if not type(function) == Function:
+            raise InstantiationError("Non-Function input")
+            
+        spec = (function.getArity(), function.getName())
+        self._checkCycles(function, (_FUNCTION_PREFIX, function.getName()), function.getArity())
+        previous = dict.get(self._functions, spec)
+        if previous is not None:
+            self._untrack(previous)
+        self._functions[spec] = function
+        self._track(function)
+        self._redefine((_FUNCTION_PREFIX, function.getName()), function)
+        
+    def clearFunction(self, name, arity):
+        """
+        This function removes the named function from its namespace, if it
+        exists.
+        
+        @type name: basestring
+        @param name: The name of the function to dereference.
+        @type arity: int
+        @param arity: The arity of the function to dereference.
+        """
+        function = self._functions.pop((arity, name), None)
+        if function is not None:
+            self._untrack(function)
+            self._redefine((_FUNCTION_PREFIX, name))
+        
+    def getEquations(self):
+        """
+        Returns a list of all equations to be evaluated by this Session.
+        
+        Evaluations will occur in the order of this list.
+        
+        @rtype: list
+        @return: A list of all functions to be evaluated by this Session.
+        """
+        return self._equations
+        
+    def createEquation(self, expression, placeholders=()):
+        """
+        This creates a new equation within the context of this session. However,
+        it will not be assigned to this session unless explicitly set with
+        addEquation().
+        
+        Placeholders are variables bound anew by each evaluation, as
+        evaluate(bindings={...}), in the manner of the parameters of a query;
+        they shadow any variables or external values of the same name, and
+        neither this Session nor the equation is modified to evaluate them.
+        
+        Each expression is compiled once and cached; every call returns an
+        independent copy of the compiled form, which may be altered without
+        affecting other callers.
+        
+        @type expression: basestring
+        @param expression: The expression used to model this equation.
+        @type placeholders: sequence
+        @param placeholders: The names of the variables to be bound by each
+            evaluation.
+        
+        @rtype: Equation
+        @return: The newly created Equation.
+        
+        @raise InstantiationError: If an invalid expression is provided.
+        @raise TokensError: If no tokens are provided.
+        @raise UnterminatedFunctionError: If a function call is missing its terminal
+            parenthesis.
+        @raise UnexpectedCharacterError: If a token appears in a position where it
+            contradicts the syntactic structure of an expression.
+        @raise ConsecutiveFactorError: If two factors appear consecutively.
+        @raise ConsecutiveOperatorError: If two operators appear consecutively.
+        @raise UnbalancedParenthesesError: If the expression ends without closing
+            all parentheses.
+        @raise IncompleteExpressionError: If the expression ends while expecting a
+            factor.
+        """
+        if not isinstance(expression, basestring):
+            raise InstantiationError("Non-string input")
+        key = _cacheKey(expression, placeholders)
+        prepared = self._cache.get(key)
+        if prepared is None:
+            (tokens, line_type) = _parseLine(expression)
+            if not tokens:
+                raise InstantiationError("Nothing expressed")
+            if not line_type == _LINE_EQUATION:
+                raise InstantiationError("Not an equation")
+                
+            return _copyCompiled(self._cachePrepared(key, PreparedEquation(self, tokens, placeholders)))
+        return _copyCompiled(prepared.getEquation())
+        
+    def addEquation(self, equation):
+        """
+        This adds a new equation to the batch of equations to be evaluated by
+        this Session.
+        
+        Equations from other sessions may be added, but the results may be
+        meaningless.
+        
+        @type equation: Equation
+        @param equation: The Equation to add.
+        
+        @raise InstantiationError: If something other than an Equation is
+            provided.
+        """
+        if not type(equation) == Equation:
+            raise InstantiationError("Non-Equation input")
+            
+        self._equations.append(equation)
+        self._track(equation)
         
-    def copy(self):
-        """
-        Returns a non-compiled copy.
+    def clearEquation(self, equation):
         """
-        return Equation(self._tokens)
+        This function removes the given equation from its evaluation batch, if it
+        exists.
         
-    def compile(self, functions, variables):
+        @type equation: Equation
+        @param equation: The equation to be removed from this session's
+            evaluation batch.
         """
-        This function compiles this equation, performing semantic validation and
-        replacing symbolic function and variable references with object-based
-        ones.
-        
-        When done, this equation will be ready for evaluation.
-        
-        @type functions: defaultdict
-        @param functions: A dictionary of functions, keyed by arity and name.
-        @type variables: defaultdict
-        @param variables: A dictionary of variables, keyed by name.
+        try:
+            self._equations.remove(equation)
+        except: pass
+        else:
+            self._untrack(equation)
         
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+    def clearEquations(self):
         """
-        if self._equation: #Already compiled.
-            return
-            
-        if not self._tokens:
-            raise TokensError()
-            
-        self._equation = _convertRPN(_validateExpression(self._tokens, functions, variables))
+        This function removes all equations from its evaluation batch.
+        """
+        for equation in self._equations:
+            self._untrack(equation)
+        self._equations = []
         
-    def evaluate(self, stack=None):
+    def evaluate(self):
         """
-        This function provides the numeric value of this equation.
+        This function evaluates all equations in this session's batch queue.
         
-        @type stack: None|list
-        @param stack: A stack containing every function and variable traversed
-            until this point.
-            
-        @rtype: int|float
-        @return: The value of this equation.
+        It returns information about the variables used to perform the
+        computations and the results of each equation.
+        
+        Variable values are retained between calls, until something on which
+        they depend is redefined; variables that involve random numbers or
+        external functions are recomputed each time.
+                    
+        @rtype: tuple
+        @return: A tuple containing two sequences of paired values::
+            - The first contains (<name:str>,<value:int|float>) for each variable
+            - The second holds (<expression:str>,<result:int|float> per equation
         
         @raise CompilationError: If this equation has not been compiled.
         @raise RecursionError: If this equation has already been invoked during
@@ -918,44 +4651,145 @@ class Equation(object):
         @raise NullSubexpressionError: If a bracketed expression contains no
             content.
         """
-        if self._equation == None:
-            raise CompilationError(self._tokens)
-            
-        if not stack:
-            stack = []
-        elif self in stack:
-            raise RecursionError(stack + [self])
-        stack.append(self)
+        try:
+            values = self._computeVariables()
+            results = [(str(equation), equation.evaluate()) for equation in self._equations]
+        finally:
+            for variable in self._variables.values():
+                if _isVolatile(variable):
+                    variable.reset()
+                    
+        return (tuple(sorted(values)), tuple(results))
         
-        return _evaluateRPN(self._equation, stack[:])
+    def shareSubexpressions(self):
+        """
+        This function finds subexpressions that appear more than once among
+        this Session's variables, functions, and batch of equations, including
+        the arguments passed to functions, and rewrites them so that each is
+        computed only once, then reused until something it depends upon is
+        redefined.
         
-    def getTokens(self):
-        return self._tokens
+        Subexpressions that involve function parameters, random numbers, or
+        external functions are not shared. Entities recompiled in response to a
+        redefinition no longer share anything until this function is invoked
+        again.
         
-    def getRPNTokens(self):
-        return self._equation
+        @rtype: dict
+        @return: A dictionary of statistics: 'subexpressions', the number of
+            distinct subexpressions shared; 'occurrences', the number of places
+            in which they were substituted; and 'nodes', the number of RPN
+            tokens no longer evaluated repeatedly.
+        """
+        entities = [
+         entity for entity in list(self._functions.values()) + list(self._variables.values()) + self._equations
+         if entity.getRPNTokens() is not None
+        ]
+        
+        def create():
+            self._shared.append(_SharedSubexpression("`shared %i`" % (len(self._shared) + 1)))
+            return self._shared[-1]
+        (shared, statistics) = _shareSubexpressions(entities, create)
+        
+        for subexpression in shared:
+            self._track(subexpression)
+        for entity in entities:
+            entity.refresh()
+        return statistics
+        
+    def evaluate_equation(self, input, bindings=None):
+        """
+        This function evaluates a single equation and returns its result. It is
+        intended for repeated reuse of initialised variables and functions.
         
-    def __str__(self):
-        return _renderExpression(self._tokens)
+        @type input: basestring
+        @param input: The equation to be evaluated.
+        @type bindings: dict|None
+        @param bindings: Values for variables, keyed by name, that shadow any
+            known to this Session without modifying it; the equation is
+            compiled once for each distinct set of names bound.
         
-class Variable(Equation):
-    """
-    This class models a variable, which is an equation that stores a value for
-    later (re-)use.
-    """
-    _name = None #: The name of this variable.
-    _computed_value = None #: The pre-computed value of this variable.
-    
-    def __init__(self, tokens, name):
+        @rtype: number
+        @return: The evaluated number.
         """
-        This constructs a new Variable.
+        placeholders = bindings and sorted(bindings) or ()
+        key = _cacheKey(input, placeholders)
+        prepared = self._cache.get(key)
+        if prepared is None:
+            (tokens, line_type) = _parseLine(input)
+            if line_type != _LINE_EQUATION:
+                raise CompilationError(input)
+                
+            return self._cachePrepared(key, PreparedEquation(self, tokens, placeholders)).evaluate(bindings=placeholders and bindings or None)
+        return prepared.evaluate(placeholders and bindings or None)
         
-        @type tokens: list
-        @param tokens: A list of tokens that represent the expression modeled by
-            this variable.
-        @type name: basestring
-        @param name: The name of this variable.
+    def getCacheStatistics(self):
+        """
+        Returns a summary of the state and effectiveness of this Session's cache
+        of compiled equations.
+        
+        @rtype: dict
+        @return: The current 'size' and 'maximum' size of the cache, and the
+            number of 'hits', 'misses', and 'evictions' it has seen.
+        """
+        return self._cache.getStatistics()
+        
+    def getLookupStatistics(self):
+        """
+        Returns a summary of the state and effectiveness of this Session's cache
+        of results from its lookup handlers.
+        
+        @rtype: dict
+        @return: The current 'size' and 'maximum' size of the cache; the number
+            of 'hits', 'misses', 'evictions', and 'expired' results it has seen;
+            the number of handler 'calls' made; the number of lookups of
+            'builtins' answered without the handlers; and the number of handler
+            calls 'saved' altogether.
+        """
+        return self._lookup_cache.getStatistics()
+        
+    def clearLookupCache(self):
+        """
+        This function discards every cached result from the lookup handlers, so
+        that each is consulted anew.
+        """
+        self._lookup_cache.clear()
+        
+    def _cachePrepared(self, key, prepared):
+        """
+        This function compiles a PreparedEquation and retains it for reuse.
+        
+        It will be discarded once any variable or function it names is
+        redefined in this Session.
         
+        @type key: basestring|tuple
+        @param key: The key, from _cacheKey(), under which to retain the
+            equation.
+        @type prepared: PreparedEquation
+        @param prepared: The equation to compile and retain.
+        
+        @rtype: Equation
+        @return: The compiled Equation, which needs no check for currency.
+        """
+        equation = prepared.getEquation()
+        self._cache.put(key, prepared, _collectReferences(prepared.getTokens()))
+        return equation
+        
+    def _compilePrepared(self, tokens, placeholders=()):
+        """
+        This function compiles an equation on behalf of a PreparedEquation,
+        recording everything needed to tell when it becomes outdated.
+        
+        @type tokens: list
+        @param tokens: The tokenized expression to compile.
+        @type placeholders: tuple
+        @param placeholders: The names of the variables to be bound by each
+            evaluation.
+            
+        @rtype: tuple
+        @return: The compiled Equation, a tuple of (<reference>, <version>)
+            pairs for every name it mentions, and a tuple of every external
+            lookup made as (<prefix>, <key>, <value>).
+            
         @raise TokensError: If no tokens are provided.
         @raise UnterminatedFunctionError: If a function call is missing its terminal
             parenthesis.
@@ -968,212 +4802,562 @@ class Variable(Equation):
         @raise IncompleteExpressionError: If the expression ends while expecting a
             factor.
         """
-        Equation.__init__(self, tokens)
-        self._name = name
-        
-    def copy(self):
+        equation = Equation(tokens, placeholders)
+        recorded = getattr(self._compiling, 'lookups', None)
+        self._compiling.lookups = lookups = []
+        prefetch = self._prefetch(_collectEntityLookups((equation,)))
+        try:
+            equation.compile(self._functions, self._variables)
+        finally:
+            self._release(prefetch)
+            self._compiling.lookups = recorded
+        lookups = tuple(lookups)
+        versions = tuple((reference, self._versions.get(reference, 0)) for reference in _collectReferences(tokens))
+        return (equation, versions, lookups)
+        
+    def _isCurrent(self, versions, lookups):
         """
-        Returns a non-compiled copy.
+        This function determines whether a PreparedEquation's compiled form is
+        still valid.
+        
+        @type versions: tuple
+        @param versions: The (<reference>, <version>) pairs recorded at
+            compilation-time.
+        @type lookups: tuple
+        @param lookups: The (<prefix>, <key>, <value>) external lookups made at
+            compilation-time, each of which will be repeated.
+            
+        @rtype: bool
+        @return: True if no referenced name has been redefined and every
+            external lookup still produces the same value.
         """
-        return Variable(self._tokens, self._name)
-        
-    def compute(self, stack=None):
+        for (reference, version) in versions:
+            if self._versions.get(reference, 0) != version:
+                return False
+        for (prefix, key, value) in lookups:
+            if prefix == _VARIABLE_PREFIX:
+                if self._lookupVariable(key) != value:
+                    return False
+            elif self._lookupFunction(key) != value:
+                return False
+        return True
+        
+    def _compileEntities(self):
         """
-        This function pre-computes the value of this variable, preventing
-        redundant when it will be used repeatedly. This function should be
-        invoked only when beginning a batch of equations, and it should be
-        followed by a call to reset().
-        
-        @type stack: list
-        @param stack: A stack containing every function and variable traversed
-            until this point.
+        This function compiles every variable, function, and equation given to
+        this Session at construction, and records the references among them.
         
-        @raise CompilationError: If this equation has not been compiled.
-        @raise RecursionError: If this equation has already been invoked during
-            the evaluation process.
-        @raise ThresholdError: If the values passed to an operand or function exceed
-            pre-defined limits.
-        @raise DivisionByZeroError: If a division by zero would occur as a result of
-            an operation.
-        @raise IncompleteExpressionError: If there are excessive tokens in the input
-            stack.
-        @raise NullSubexpressionError: If a bracketed expression contains no
-            content.
+        @raise RecursionError: If any variable or function refers to itself,
+            directly or transitively.
         """
-        if not stack:
-            stack = []
+        functions = list(self._functions.values())
+        variables = list(self._variables.values())
+        prefetch = self._prefetch(_collectEntityLookups(functions + variables + self._equations))
+        try:
+            for function in functions: #Forks may copy inherited definitions meanwhile.
+                function.compile(self._functions, self._variables)
+                
+            for variable in variables:
+                variable.compile(self._functions, self._variables)
+                
+            for equation in self._equations:
+                equation.compile(self._functions, self._variables)
+        finally:
+            self._release(prefetch)
             
-        if self._computed_value == None:
-            self._computed_value = Equation.evaluate(self, stack)
+        cycle = _findCycle(functions + variables)
+        if cycle:
+            raise RecursionError(cycle)
             
-    def evaluate(self, stack=None, compute=False):
+        for entity in functions + variables + self._equations:
+            self._track(entity)
+            
+    def _checkCycles(self, entity, reference, arity=None):
         """
-        This function returns the value of this variable, either pre-computed or
-        dynamically calculated, depending on status.
+        This function ensures that defining the given variable or function would
+        not cause anything to refer to itself, directly or transitively.
         
-        @type stack: list
-        @param stack: A stack containing every function and variable traversed
-            until this point.
-        @type compute: bool
-        @param compute: If True, the result of evaluating this variable will be
-            cached if it has not already been computed.
-            
-        @rtype: int|float
-        @return: The value of this variable.
+        Entities that refer to the name being defined are recompiled against the
+        new definition, so they are treated as already referring to it.
         
-        @raise CompilationError: If this equation has not been compiled.
-        @raise RecursionError: If this equation has already been invoked during
-            the evaluation process.
-        @raise ThresholdError: If the values passed to an operand or function exceed
-            pre-defined limits.
-        @raise DivisionByZeroError: If a division by zero would occur as a result of
-            an operation.
-        @raise IncompleteExpressionError: If there are excessive tokens in the input
-            stack.
-        @raise NullSubexpressionError: If a bracketed expression contains no
-            content.
+        @type entity: Equation
+        @param entity: The new definition, compiled.
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) being defined.
+        @type arity: int|None
+        @param arity: The number of parameters, if a function is being defined.
+        
+        @raise RecursionError: If a cycle would be formed.
         """
-        if not stack:
-            stack = []
+        builtin = _FUNCTIONS.get((arity, reference[1]))
+        def refersToDefinition(dependent):
+            if arity is None:
+                return True
+            for token in _walkReferences(dependent.getRPNTokens() or ()):
+                if token[0] in (_FUNCTION_BUILTIN, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL) and len(token[2]) == arity:
+                    if token[1] is builtin and builtin is not None:
+                        return True
+                    if isinstance(token[1], Function) and token[1].getName() == reference[1]:
+                        return True
+            return False
             
-        if compute:
-            self.compute(stack)
-        if self._computed_value:
-            return self._computed_value
-        else:
-            return Equation.evaluate(self, stack)
+        dependents = set()
+        session = self
+        while session is not None: #Inherited definitions are copied to refer to it too.
+            dependents.update(session._dependents.get(reference, ()))
+            session = session._parent
+        relinked = set(
+         dependent for dependent in dependents
+         if dependent is not entity and not isinstance(dependent, _SharedSubexpression) and refersToDefinition(dependent)
+        )
+        cycle = _findCycle((entity,), lambda dependent: dependent in relinked and entity or None)
+        if cycle:
+            raise RecursionError(cycle)
             
-    def reset(self):
+    def _lookupVariable(self, name):
         """
-        This function clears any pre-computed value from this variable, forcing
-        it to be re-evaluated the next time it is used.
+        This function resolves a variable that is not defined in this Session,
+        from the Session it was forked from or through the lookup handlers.
+        
+        @type name: basestring
+        @param name: The name of the variable.
+        
+        @rtype: Variable|int|float|None
+        @return: The inherited Variable, the external value, or None if the
+            name cannot be resolved.
         """
-        self._computed_value = None
+        if self._parent is not None:
+            if name in self._stale.get((_VARIABLE_PREFIX, name), ()):
+                self._materialize((_VARIABLE_PREFIX, name))
+            variable = dict.get(self._variables, name)
+            if variable is None:
+                variable = self._parent._variables[name]
+            if variable is not None:
+                return variable
+        if self._variable_lookup_handler is not None or self._bulk_lookup_handler is not None:
+            if name in _VARIABLES and not name in self._shadowable:
+                self._lookup_cache.skipBuiltin()
+                return None
+            if self._bulk_lookup_handler is not None:
+                return self._lookupBulk((_VARIABLE_PREFIX, name))
+            return self._lookup_cache.lookup((_VARIABLE_PREFIX, name), self._variable_lookup_handler, (name,))
+        return None
         
-    def getName(self):
-        return self._name
+    def _lookupFunction(self, spec):
+        """
+        This function resolves a function that is not defined in this Session,
+        from the Session it was forked from or through the lookup handlers.
         
-    def __str__(self):
-        return "v:%s" % (self._name)
+        @type spec: tuple
+        @param spec: The (<arity>, <name>) of the function.
         
-class Parameter(Variable):
-    """
-    This class models a parameter, which is a variable specific to one call to a
-    function.
-    """
-    def __init__(self, name):
+        @rtype: Function|object|None
+        @return: The inherited Function, the external function, or None if the
+            spec cannot be resolved.
         """
-        This constructs a new Parameter.
+        if self._parent is not None:
+            if spec in self._stale.get((_FUNCTION_PREFIX, spec[1]), ()):
+                self._materialize((_FUNCTION_PREFIX, spec[1]))
+            function = dict.get(self._functions, spec)
+            if function is None:
+                function = self._parent._functions[spec]
+            if function is not None:
+                return function
+        if self._function_lookup_handler is not None or self._bulk_lookup_handler is not None:
+            if spec in _FUNCTIONS and not spec[1] in self._shadowable:
+                self._lookup_cache.skipBuiltin()
+                return None
+            if self._bulk_lookup_handler is not None:
+                return self._lookupBulk((_FUNCTION_PREFIX, spec))
+            return self._lookup_cache.lookup((_FUNCTION_PREFIX, spec), self._function_lookup_handler, spec)
+        return None
         
-        @type name: basestring
-        @param name: The name of this variable.
+    def _lookupBulk(self, key):
         """
-        self._name = name
+        This function provides the bulk lookup handler's result for the given
+        key, from those prefetched for the expressions being compiled if
+        possible.
         
-    def copy(self):
+        @type key: tuple
+        @param key: The (<prefix>, <key>) to look up.
+        
+        @rtype: object|None
+        @return: The handler's result, which may be None.
         """
-        Returns a non-compiled copy.
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        prefetched = getattr(root._compiling, 'prefetched', None)
+        if prefetched is not None and key in prefetched:
+            return prefetched[key]
+        return self._lookup_cache.lookupMany((key,), self._bulk_lookup_handler)[key]
+        
+    def _prefetch(self, keys):
         """
-        return Parameter(self._name)
+        This function resolves, with a single call to the bulk lookup handler,
+        every one of the given names that is neither defined nor built-in,
+        holding the results for the lookups made while compiling.
+        
+        The results are held, for the calling thread only, by the Session that
+        owns the handler, which is the root of a fork; they must be released
+        with _release().
         
-    def assign(self, equation, stack):
+        @type keys: iterable
+        @param keys: (<prefix>, <key>) tuples, as produced by
+            _collectLookups().
+            
+        @rtype: tuple
+        @return: The Session that holds the results and the results it
+            previously held, to be given to _release().
         """
-        This function assigns a value to this parameter, allowing it to be used
-        when the function is called.
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        previous = getattr(root._compiling, 'prefetched', None)
+        if root._bulk_lookup_handler is None:
+            return (root, previous)
+            
+        unresolved = []
+        seen = set()
+        for key in keys:
+            (prefix, name) = key
+            if prefix == _VARIABLE_PREFIX:
+                (builtins, namespace, builtin_name) = (_VARIABLES, '_variables', name)
+            else:
+                (builtins, namespace, builtin_name) = (_FUNCTIONS, '_functions', name[1])
+            if name in builtins and not builtin_name in root._shadowable:
+                continue
+            if previous is not None and key in previous or key in seen:
+                continue
+            seen.add(key)
+            
+            session = self
+            while session is not None and not name in getattr(session, namespace):
+                session = session._parent
+            if session is None:
+                unresolved.append(key)
+                
+        if unresolved:
+            prefetched = dict(previous or ())
+            prefetched.update(root._lookup_cache.lookupMany(unresolved, root._bulk_lookup_handler))
+            root._compiling.prefetched = prefetched
+        return (root, previous)
         
-        @type equation: Equation
-        @param equation: The equation attached to this parameter.
-        @type stack: list|None
-        @param stack: A stack containing every function and variable traversed
-            until this point.
+    def _release(self, prefetch):
+        """
+        This function discards the results held by _prefetch().
         
-        @raise CompilationError: If this equation has not been compiled.
-        @raise RecursionError: If this equation has already been invoked during
-            the evaluation process.
-        @raise ThresholdError: If the values passed to an operand or function exceed
-            pre-defined limits.
-        @raise DivisionByZeroError: If a division by zero would occur as a result of
-            an operation.
-        @raise IncompleteExpressionError: If there are excessive tokens in the input
-            stack.
-        @raise NullSubexpressionError: If a bracketed expression contains no
-            content.
+        @type prefetch: tuple
+        @param prefetch: The value returned by _prefetch().
         """
-        if isinstance(equation, numbers.Number):
-            self._equation = [equation]
-        else:
-            self._equation = equation.getRPNTokens()
-        self.compute(stack[:])
+        (root, previous) = prefetch
+        root._compiling.prefetched = previous
+        
+    def _overlay(self, reference):
+        """
+        This function marks every inherited variable and function that depends,
+        directly or transitively, on the given reference, which this fork now
+        defines itself, to be copied into the fork when next resolved.
+        
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) being defined.
+        
+        @rtype: list
+        @return: The (<prefix>, <name>) references of the definitions marked.
+        """
+        marked = []
+        pending = [reference]
+        visited = set(pending)
+        while pending:
+            reference = pending.pop()
+            session = self._parent
+            while session is not None:
+                for dependent in session._dependents.get(reference, ()):
+                    if isinstance(dependent, _SharedSubexpression):
+                        continue
+                    elif isinstance(dependent, Variable):
+                        (dependent_reference, key) = ((_VARIABLE_PREFIX, dependent.getName()), dependent.getName())
+                    elif isinstance(dependent, Function):
+                        (dependent_reference, key) = ((_FUNCTION_PREFIX, dependent.getName()), (dependent.getArity(), dependent.getName()))
+                    else:
+                        continue
+                    self._stale.setdefault(dependent_reference, set()).add(key)
+                    if not dependent_reference in visited:
+                        visited.add(dependent_reference)
+                        pending.append(dependent_reference)
+                        marked.append(dependent_reference)
+                session = session._parent
+        return marked
+        
+    def _materialize(self, reference):
+        """
+        This function copies the inherited definitions marked under the given
+        reference into this fork, along with every other marked definition to
+        which the copies refer, and compiles the copies against the fork's
+        namespaces.
+        
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) of the definitions to copy.
+        """
+        copies = []
+        pending = [reference]
+        while pending:
+            reference = pending.pop()
+            for key in self._stale.pop(reference, ()):
+                if reference[0] == _VARIABLE_PREFIX:
+                    (namespace, original) = (self._variables, self._parent._variables[key])
+                else:
+                    (namespace, original) = (self._functions, self._parent._functions[key])
+                if original is None or dict.get(namespace, key) is not None:
+                    continue
+                copy = original.copy()
+                dict.__setitem__(namespace, key, copy)
+                self._copies.setdefault(reference, {})[key] = copy
+                copies.append(copy)
+                pending.extend(dependency for dependency in copy.getReferences() if dependency in self._stale)
+        prefetch = self._prefetch(_collectEntityLookups(copies))
+        try:
+            for copy in copies:
+                copy.compile(self._functions, self._variables)
+                self._track(copy)
+        finally:
+            self._release(prefetch)
+            
+    def _getDefinitions(self):
+        """
+        Provides every variable and function known to this Session, including
+        those inherited from the Session from which it was forked, copying any
+        marked inherited definitions into it first.
+        
+        @rtype: tuple
+        @return: Dictionaries of Variables, keyed by name, and of Functions,
+            keyed by arity and name.
+        """
+        if self._parent is None:
+            return (dict(self._variables), dict(self._functions))
+        for reference in list(self._stale):
+            self._materialize(reference)
+        (variables, functions) = self._parent._getDefinitions()
+        variables.update(self._variables)
+        functions.update(self._functions)
+        return (variables, functions)
+        
+    def _redefine(self, reference, entity=None):
+        """
+        This function records that a variable or function has been redefined,
+        outdating everything compiled against its previous definition.
+        
+        Entities that refer to the name directly are recompiled in place, so
+        that they resolve it anew; if that fails, as when the name has been
+        cleared, they retain the previous definition. The computed values of
+        all transitive dependents are then discarded.
+        
+        In a fork, inherited definitions that depend on a newly-defined name
+        are marked to be copied, and anything that refers to them is updated
+        likewise.
+        
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) of the redefined entity.
+        @type entity: Equation|None
+        @param entity: The new definition, if any, which continues to refer
+            to whatever it was compiled against.
+        """
+        self._versions[reference] = self._versions.get(reference, 0) + 1
+        self._cache.invalidate(reference)
+        if entity is not None and self._parent is not None:
+            for stale_reference in self._overlay(reference):
+                self._redefine(stale_reference)
+        
+        for dependent in list(self._dependents.get(reference, ())):
+            if dependent is not entity:
+                try:
+                    dependent.recompile(self._functions, self._variables)
+                except Error:
+                    pass
+        self._invalidate(reference)
+        for fork in list(self._forks):
+            fork._inherit(reference)
+            
+    def _inherit(self, reference):
+        """
+        This function updates this fork after the Session from which it was
+        forked has redefined, or cleared, the given reference.
+        
+        Copies of the previous definitions are discarded and marked to be
+        copied anew, as are new definitions that depend on a name this fork
+        defines or copies; everything compiled here against the reference is
+        then updated, as by _redefine().
         
-    def unassign(self):
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) redefined by the parent.
         """
-        This function clears the value of this parameter, allowing its values to
-        be removed from the interpreter once they are no longer needed.
+        if reference[0] == _VARIABLE_PREFIX:
+            namespace = self._variables
+        else:
+            namespace = self._functions
+        copies = self._copies.pop(reference, {})
+        discarded = [key for (key, copy) in copies.items() if dict.get(namespace, key) is copy]
+        for key in discarded:
+            self._untrack(dict.pop(namespace, key))
+        if discarded:
+            self._stale.setdefault(reference, set()).update(discarded)
+        elif not reference in self._stale:
+            session = self._parent
+            while session is not None:
+                if reference[0] == _VARIABLE_PREFIX:
+                    definitions = [(reference[1], dict.get(session._variables, reference[1]))]
+                else:
+                    definitions = [(spec, function) for (spec, function) in dict.items(session._functions) if spec[1] == reference[1]]
+                definitions = [(key, entity) for (key, entity) in definitions if entity is not None]
+                for (key, entity) in definitions:
+                    if dict.get(namespace, key) is None and any(self._shadows(dependency) for dependency in entity.getReferences()):
+                        self._stale.setdefault(reference, set()).add(key)
+                if definitions:
+                    break
+                session = session._parent
+            if reference in self._stale:
+                for stale_reference in self._overlay(reference):
+                    self._redefine(stale_reference)
+        self._redefine(reference)
+        
+    def _shadows(self, reference):
         """
-        self._equation = None
-        self.reset()
+        Indicates whether this fork defines, copies, or has marked to be copied,
+        anything under the given reference, such that inherited definitions
+        that refer to it must be copied too.
         
-    def getName(self):
-        return self._name
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) to check.
         
-    def __str__(self):
-        return "p:%s" % (self._name)
+        @rtype: bool
+        @return: True if the reference resolves differently in this fork.
+        """
+        if reference in self._stale:
+            return True
+        if reference[0] == _VARIABLE_PREFIX:
+            return dict.get(self._variables, reference[1]) is not None
+        return any(spec[1] == reference[1] for spec in dict.keys(self._functions))
         
-class Function(Equation):
-    """
-    This class models a function, which is an equation that requires zero or
-    more parameters to produce a result.
-    """
-    _name = None #: The name of this function.
-    _parameters = None #: The names and values of this function's parameters.
-    
-    def __init__(self, tokens, name):
+    def _invalidate(self, reference):
         """
-        This constructs a new Function.
+        This function discards the computed value of every variable, the
+        memoized results of every function, and the classification of each as
+        volatile, for everything that depends, directly or transitively, on
+        the given reference.
         
-        @type tokens: list
-        @param tokens: A list of tokens that represent the expression modeled by
-            this function.
-        @type name: basestring
-        @param name: The name of this function.
+        @type reference: tuple
+        @param reference: The (<prefix>, <name>) of the changed entity.
+        """
+        pending = [reference]
+        visited = set(pending)
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if isinstance(dependent, Variable):
+                    dependent.reset()
+                    dependent_reference = (_VARIABLE_PREFIX, dependent.getName())
+                elif isinstance(dependent, Function):
+                    dependent.reset()
+                    dependent_reference = (_FUNCTION_PREFIX, dependent.getName())
+                else:
+                    continue
+                if not dependent_reference in visited:
+                    visited.add(dependent_reference)
+                    pending.append(dependent_reference)
+                    
+    def _track(self, entity):
+        """
+        This function records the references made by the given entity, so that
+        it is updated when any of them is redefined.
         
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+        @type entity: Equation
+        @param entity: The variable, function, or equation to track.
         """
-        Equation.__init__(self, tokens[1:])
-        self._name = name
-        self._parameters = []
+        dependents = self._dependents
+        for reference in entity.getReferences():
+            if reference in dependents:
+                dependents[reference].add(entity)
+            else:
+                dependents[reference] = set((entity,))
+            
+    def _untrack(self, entity):
+        """
+        This function forgets the references made by the given entity.
         
-        parameters = tokens[0]
-        if parameters:
-            for i in [j.strip() for j in parameters.split(_FUNCTION_DELIMITER)]:
-                self._parameters.append((i, Parameter(i)))
-                
-    def copy(self):
+        @type entity: Equation
+        @param entity: The variable, function, or equation to stop tracking.
         """
-        Returns a non-compiled copy.
+        for reference in entity.getReferences():
+            dependents = self._dependents.get(reference)
+            if dependents is not None:
+                dependents.discard(entity)
+                if not dependents:
+                    del self._dependents[reference]
+        
+    def _computeVariables(self):
         """
-        return Function(self._tokens, self._name)
+        This function computes the value of every variable, computing those
+        that others reference first, so that each is evaluated only once and
+        its value is reused by every variable that depends upon it.
         
-    def compile(self, functions, variables):
+        @rtype: list
+        @return: The (<name>, <value>) of every variable.
         """
-        This function compiles this function, extending Equation.compile(),
-        which it invokes, with references to function parameters as variables.
+        ordered = []
+        visited = set()
+        for variable in self._variables.values():
+            pending = [(variable, False)]
+            while pending:
+                (entity, expanded) = pending.pop()
+                if expanded: #Everything it references precedes it.
+                    if isinstance(entity, Variable):
+                        ordered.append(entity)
+                    continue
+                if entity in visited:
+                    continue
+                    
+                visited.add(entity)
+                pending.append((entity, True))
+                tokens = entity.getRPNTokens()
+                if tokens is None:
+                    continue
+                for reference in _walkReferences(tokens):
+                    if reference[0] in (_VARIABLE_CUSTOM, _FUNCTION_CUSTOM) and not reference[1] in visited:
+                        pending.append((reference[1], False))
+                        
+        for variable in ordered:
+            variable.compute()
+        return [(name, variable.evaluate()) for (name, variable) in self._variables.items()]
         
-        @type functions: defaultdict
-        @param functions: A dictionary of functions, keyed by arity and name.
-        @type variables: defaultdict
-        @param variables: A dictionary of variables, keyed by name.
+    def evaluate_many(self, input, rows):
+        """
+        This function evaluates a single equation against each of a batch of
+        variable bindings, compiling it only once.
+        
+        The names bound by the first row become the equation's inputs,
+        shadowing any variables of the same name known to this Session, which
+        is not modified. Every subsequent row must bind the same names; a row
+        that omits one, or binds another, is reported with a VariableError.
+        
+        As with the bindings of evaluate_equation(), only the equation's own
+        references are shadowed: variables known to this Session that refer to
+        a bound name keep their defined values. Equation.evaluate_vectorized(),
+        by contrast, propagates bindings through such variables.
+        
+        Errors that occur while evaluating a row, including those Python raises
+        itself, such as math domain errors or remainders by zero, are reported
+        alongside it, without interrupting the batch.
         
+        @type input: basestring
+        @param input: The equation to be evaluated.
+        @type rows: iterable
+        @param rows: A sequence of dictionaries of numbers, keyed by variable
+            name.
+            
+        @rtype: generator
+        @return: A generator that provides (<result:int|float|None>,
+            <error:Exception|None>) for each row, in order.
+            
+        @raise CompilationError: If the input is not an equation.
         @raise TokensError: If no tokens are provided.
         @raise UnterminatedFunctionError: If a function call is missing its terminal
             parenthesis.
@@ -1185,30 +5369,107 @@ class Function(Equation):
             all parentheses.
         @raise IncompleteExpressionError: If the expression ends while expecting a
             factor.
+        @raise VariableError: If a variable is neither bound nor known.
+        @raise FunctionError: If a function was referenced but not found.
         """
-        variables = variables.copy()
-        for (name, parameter) in self._parameters:
-            variables[name] = parameter
+        (tokens, line_type) = _parseLine(input)
+        if line_type != _LINE_EQUATION:
+            raise CompilationError(input)
             
-        Equation.compile(self, functions, variables)
-        
-    def evaluate(self, arguments, stack):
+        rows = iter(rows)
+        try:
+            bindings = next(rows)
+        except StopIteration:
+            return
+            
+        names = sorted(bindings)
+        bound = frozenset(names)
+        variables = self._variables.copy()
+        for (index, name) in enumerate(names):
+            variables[name] = Parameter(name, index)
+        equation = Equation(tokens)
+        equation.compile(self._functions, variables)
+        
+        while True:
+            result = None
+            error = None
+            try:
+                for name in names:
+                    if not name in bindings:
+                        raise VariableError(name, tokens)
+                if len(bindings) > len(names):
+                    raise VariableError(min(name for name in bindings if not name in bound), tokens)
+                result = equation.evaluate(None, [bindings[name] for name in names])
+            except Exception as e:
+                error = e
+            yield (result, error)
+            
+            try:
+                bindings = next(rows)
+            except StopIteration:
+                return
+                
+    def extract_equation(self, input, placeholders=()):
         """
-        This function provides the numeric value of this function.
+        This function provides a PreparedEquation, a callable that evaluates an
+        equation without repeated parsing, recompiling it only when a variable,
+        function, or external value it references has changed.
         
-        It assigns values to all parameters, evaluates the function, and then
-        clears the parameters.
+        @type input: basestring
+        @param input: The equation to be evaluated.
+        @type placeholders: sequence
+        @param placeholders: The names of variables to be bound by each
+            evaluation, as by createEquation().
         
-        @type arguments: tuple
-        @param arguments: A tuple of equations that are mapped, in order, to this
-            function's parameters.
-        @type stack: list|None
-        @param stack: A stack containing every function and variable traversed
-            until this point.
+        @rtype: PreparedEquation
+        @return: A callable that provides a number, requiring no arguments
+            other than the bindings of any placeholders.
         
-        @rtype: int|float
-        @return: The value of this function.
+        @raise CompilationError: If the input is not an equation.
+        @raise TokensError: If no tokens are provided.
+        """
+        (tokens, line_type) = _parseLine(input)
+        if line_type != _LINE_EQUATION:
+            raise CompilationError(input)
+            
+        return PreparedEquation(self, tokens, placeholders)
+        
+    def evaluate_parallel(self, workers=None, chunk_size=None, warm_up=False):
+        """
+        This function evaluates all equations in this session's batch queue,
+        like evaluate(), but divides them among a pool of worker processes.
+        
+        Variables are computed here, once, and their values are sent to every
+        worker along with this Session's functions and equations, from which
+        each worker builds and compiles its own copy of the Session; only the
+        bounds of each chunk of equations are sent thereafter. The variables a
+        fork inherits are sent as definitions, to be compiled by each worker.
+        Lookup handlers are sent too, so, where processes are spawned rather
+        than forked, they must be picklable, and the workers consult them when
+        they compile their Sessions.
+        
+        The pool is kept for later calls until closeWorkers() is called. It is
+        rebuilt whenever the number of workers or anything sent to them
+        differs, including the values of variables that may differ between
+        evaluations, such as those that use random().
+        
+        Results are returned in the original order; if any equation fails, the
+        first error, by position, is raised.
+        
+        @type workers: int|None
+        @param workers: The number of worker processes to use; by default, one
+            per CPU.
+        @type chunk_size: int|None
+        @param chunk_size: The number of equations evaluated per task; by
+            default, enough to give each worker four tasks.
+        @type warm_up: bool
+        @param warm_up: If True, every worker is started, and has compiled its
+            Session, before any equations are dispatched, as by startWorkers().
+            
+        @rtype: tuple
+        @return: A tuple of the form returned by evaluate().
         
+        @raise ImportError: If concurrent.futures is not available.
         @raise CompilationError: If this equation has not been compiled.
         @raise RecursionError: If this equation has already been invoked during
             the evaluation process.
@@ -1221,465 +5482,794 @@ class Function(Equation):
         @raise NullSubexpressionError: If a bracketed expression contains no
             content.
         """
-        for ((name, parameter), argument) in zip(self._parameters, arguments):
-            parameter.assign(argument, stack)
+        if not workers:
+            workers = multiprocessing.cpu_count()
+        if not chunk_size:
+            chunk_size = max(1, -(-len(self._equations) // (workers * 4)))
             
-        result = Equation.evaluate(self, stack)
+        (values, executor) = self._prepareWorkers(workers, warm_up)
+        futures = []
+        try:
+            for start in range(0, len(self._equations), chunk_size):
+                futures.append(executor.submit(_evaluateParallelChunk, start, start + chunk_size))
+                
+            results = []
+            for future in futures:
+                results.extend(future.result())
+        except concurrent.futures.BrokenExecutor:
+            self.closeWorkers()
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+                
+        return (tuple(sorted(values)), tuple(results))
         
-        for (name, parameter) in self._parameters:
-            parameter.unassign()
+    def startWorkers(self, workers=None):
+        """
+        This function prepares the pool of worker processes used by
+        evaluate_parallel(), returning once every worker has started and
+        compiled its copy of this Session, so that later calls pay no start-up
+        cost.
+        
+        @type workers: int|None
+        @param workers: The number of worker processes to start; by default,
+            one per CPU.
             
-        return result
+        @raise ImportError: If concurrent.futures is not available.
+        @raise RecursionError: If a variable has already been invoked during
+            the evaluation process.
+        @raise ThresholdError: If the values passed to an operand or function exceed
+            pre-defined limits.
+        @raise DivisionByZeroError: If a division by zero would occur as a result of
+            an operation.
+        """
+        self._prepareWorkers(workers or multiprocessing.cpu_count(), True)
         
-    def getArity(self):
-        return len(self._parameters)
+    def closeWorkers(self):
+        """
+        This function shuts down the pool of worker processes kept by
+        evaluate_parallel(), if there is one, waiting for the workers to exit.
+        """
+        (pool, self._workers) = (self._workers, None)
+        if pool is not None:
+            pool[0].shutdown()
+            
+    def _prepareWorkers(self, workers, warm_up):
+        """
+        This function computes this Session's variables and provides a pool of
+        worker processes holding copies of this Session, reusing the kept pool
+        if it was given the same definitions and otherwise replacing it.
+        
+        @type workers: int
+        @param workers: The number of worker processes.
+        @type warm_up: bool
+        @param warm_up: If True, every worker is started, and has compiled its
+            Session, before the pool is provided.
+            
+        @rtype: tuple
+        @return: The (<name>, <value>) pairs of every variable, as computed by
+            evaluate(), and the concurrent.futures.ProcessPoolExecutor.
+            
+        @raise ImportError: If concurrent.futures is not available.
+        """
+        if concurrent is None:
+            raise ImportError("concurrent.futures is required for parallel evaluation")
+            
+        try:
+            values = self._computeVariables()
+        finally:
+            for variable in self._variables.values():
+                if _isVolatile(variable):
+                    variable.reset()
+                    
+        (variables, functions) = self._getDefinitions()
+        definitions = (
+         [(name, [value]) for (name, value) in values] +
+         [(name, variable.getTokens()) for (name, variable) in variables.items() if not name in self._variables],
+         [(function.getName(), [name for (name, parameter) in function.getParameters()], function.getTokens()) for function in functions.values()],
+         [equation.getTokens() for equation in self._equations],
+        )
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        handlers = (root._variable_lookup_handler, root._function_lookup_handler, root._shadowable, root._bulk_lookup_handler)
+        key = (workers, definitions, handlers)
+        
+        pool = self._workers
+        if pool is not None and pool[1] == key and (pool[2] or not warm_up):
+            return (values, pool[0])
+        self.closeWorkers() #A pool that was not warmed may not have started every worker.
+        
+        barrier = multiprocessing.Barrier(workers)
+        executor = concurrent.futures.ProcessPoolExecutor(
+         workers,
+         initializer=_initializeParallelWorker,
+         initargs=(definitions,) + handlers + (barrier,),
+        )
+        try:
+            if warm_up: #Each task holds its worker until all have started.
+                list(executor.map(_warmParallelWorker, range(workers)))
+        except:
+            executor.shutdown()
+            raise
+        self._workers = (executor, key, warm_up)
+        return (values, executor)
+        
+    def dumps(self):
+        """
+        This function serializes this Session's variables, functions, and
+        equations, in their compiled forms, so that an equivalent Session may be
+        restored by loads() without lexing, validating, or compiling anything.
         
-    def getName(self):
-        return self._name
+        The source of every definition is stored too, along with a version
+        stamp; if the stamp does not match that of the loading module, the
+        definitions are recompiled from source instead. Sessions that made use
+        of their lookup handlers are stored as source only, since the values
+        the handlers provide may have changed by the time they are loaded.
         
-    def __str__(self):
-        return "f:%s/%i" % (self._name, len(self._parameters))
+        Computed values, memoized results, and cached equations are not
+        stored; native evaluators are rebuilt when loaded.
         
+        @rtype: bytes
+        @return: The serialized Session.
         
-class Session(object):
-    """
-    This class provides a context in which equations may be evaluated. Sessions
-    store variables and functions that are needed to support complex equations.
-    """
-    _variables = None #: A dictionary of all local variables.
-    _functions = None #: A dictionary of all local functions.
-    _equation = None #: A list of all equations to be evaluated.
-    
-    def __init__(self, input=None, variable_lookup_handler=None, function_lookup_handler=None):
+        @raise pickle.PicklingError: If a variable or function from another
+            Session cannot be serialized.
         """
-        This creates a new session.
+        (variables, functions) = self._getDefinitions()
+        source = (
+         [(name, variable.getTokens()) for (name, variable) in variables.items()],
+         [(function.getName(), [name for (name, parameter) in function.getParameters()], function.getTokens()) for function in functions.values()],
+         [equation.getTokens() for equation in self._equations],
+         bool(self._shared),
+        )
+        entities = list(variables.values()) + list(functions.values()) + self._equations + self._shared
+        #Calls to custom functions are compiled as external references, so
+        #functions provided by the lookup handler are those not defined here.
+        defined = set(id(entity) for entity in entities)
+        payload = None
+        if not any(
+         reference[0] == _VARIABLE_EXTERNAL or (reference[0] in (_FUNCTION_CUSTOM, _FUNCTION_EXTERNAL) and not id(reference[1]) in defined)
+         for entity in entities for reference in _walkReferences(entity.getRPNTokens() or ())
+        ):
+            payload = self._dumpEntities(entities)
+        return pickle.dumps((_SERIALIZATION_FORMAT, _SERIALIZATION_VERSION, source, payload), pickle.HIGHEST_PROTOCOL)
+        
+    def dump(self, file):
+        """
+        This function writes this Session to a file, as serialized by dumps().
         
-        If any expressions are provided, they will be processed, with appropriate
-        entities resulting.
+        @type file: file
+        @param file: A file opened for writing in binary mode.
+        """
+        file.write(self.dumps())
         
-        Once all entities have been generated, they will be compiled; handling
-        this process in a two-stage manner prevents circular referencing from
-        being a problem.
+    def loads(self, data):
+        """
+        This function restores the variables, functions, and equations of a
+        Session serialized by dumps() into this Session, which must not yet
+        define any.
         
-        @type input: basestring
-        @param input: The variables, functions, and equations with which this
-            session will be initialized.
-        @type variable_lookup_handler: callable
-        @param variable_lookup_handler: A callable that takes a variable-name
-            as a basestring and returns a value or None, used to access external
-            variables on-demand.
-        @type function_lookup_handler: callable
-        @param function_lookup_handler: A callable that takes an arity-number
-            and function-name as a basestring and returns a value or None, used
-            to access external functions on-demand.
-            
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+        Data is unpickled, so it must only be loaded from trusted sources.
+        
+        @type data: bytes
+        @param data: The serialized Session.
+        
+        @raise InstantiationError: If this Session is not empty or the data was
+            not produced by dumps().
+        @raise RecursionError: If the definitions are recompiled from source and
+            any variable or function refers to itself.
         """
-        class variables_dict(collections.defaultdict):
-            def __missing__(self, key):
-                if variable_lookup_handler is not None:
-                    return variable_lookup_handler(key)
-                return None
-                
-        class functions_dict(collections.defaultdict):
-            def __missing__(self, key):
-                if function_lookup_handler is not None:
-                    return function_lookup_handler(key[0], key[1])
-                return None
-                
-        self._variables = variables_dict()
-        self._functions = functions_dict()
-        self._equations = []
-        if input:
-            for i in input.split(';'):
-                (tokens, line_type) = _parseLine(i)
-                if tokens:
-                    if line_type == _LINE_VARIABLE:
-                        name = tokens[0]
-                        self._variables[name] = Variable(tokens[1:], name)
-                    elif line_type == _LINE_FUNCTION:
-                        name = tokens[0]
-                        function = Function(tokens[1:], name)
-                        self._functions[(function.getArity(), name)] = function
-                    else:
-                        self._equations.append(Equation(tokens))
-                        
-            for function in self._functions.values():
-                function.compile(self._functions, self._variables)
-                
-            for variable in self._variables.values():
-                variable.compile(self._functions, self._variables)
-                
-            for equation in self._equations:
-                equation.compile(self._functions, self._variables)
+        if self._variables or self._functions or self._equations:
+            raise InstantiationError("Sessions may only be loaded while empty")
+        try:
+            (format, version, source, payload) = pickle.loads(data)
+        except Exception:
+            raise InstantiationError("Not a serialized Session")
+        if format != _SERIALIZATION_FORMAT:
+            raise InstantiationError("Not a serialized Session")
+            
+        if version == _SERIALIZATION_VERSION and payload is not None:
+            self._loadEntities(payload)
+        else:
+            (variables, functions, equations, shared) = source
+            for (name, tokens) in variables:
+                self._variables[name] = Variable(tokens, name)
+            for (name, parameters, tokens) in functions:
+                function = Function([', '.join(parameters)] + list(tokens), name)
+                self._functions[(function.getArity(), name)] = function
+            for tokens in equations:
+                self._equations.append(Equation(tokens))
+            self._compileEntities()
+            if shared:
+                self.shareSubexpressions()
                 
-    def getVariables(self):
+    def load(self, file):
         """
-        Returns a dictionary of Variables, keyed by variable name.
+        This function restores a Session from a file written by dump(), as
+        described by loads().
         
-        @rtype: dict
-        @return: A dictionary of Variables, keyed by variable name.
+        @type file: file
+        @param file: A file opened for reading in binary mode.
         """
-        return self._variables
+        self.loads(file.read())
         
-    def listVariables(self):
+    def _dumpEntities(self, entities):
         """
-        This provides a collection of 'name' variable identifiers.
+        This function pickles the compiled state of the given entities, each
+        of which refers to the others, and to pre-defined functions, by
+        position, so that long chains of references are not pickled
+        recursively.
         
-        All variables known to this Session will be represented.
+        @type entities: list
+        @param entities: This Session's variables, functions, equations, and
+            shared subexpressions.
         
-        @rtype: tuple
-        @return: A collection of 'name' variable-identifying strings.
+        @rtype: bytes
+        @return: The pickled entities, as read by _loadEntities().
         """
-        variables = set(_VARIABLES.keys())
-        for name in self._variables.keys():
-            variables.add(name)
+        positions = dict((id(entity), position) for (position, entity) in enumerate(entities))
+        def persistent_id(obj):
+            if isinstance(obj, Equation):
+                position = positions.get(id(obj))
+                if position is not None:
+                    return ('e', position)
+            elif type(obj) == types.FunctionType:
+                spec = _BUILTIN_FUNCTION_SPECS.get(obj)
+                if spec is not None:
+                    return ('b', spec)
+            return None
             
-        return tuple(sorted(variables))
-        
-    def createVariable(self, expression):
+        stream = io.BytesIO()
+        pickler = pickle.Pickler(stream, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id
+        pickler.dump([type(entity) for entity in entities])
+        pickler.dump([entity.__getstate__() for entity in entities])
+        return stream.getvalue()
+        
+    def _loadEntities(self, payload):
         """
-        This creates a new variable within the context of this session. However,
-        it will not be assigned to this session unless explicitly set with
-        setVariable().
-        
-        @type expression: basestring
-        @param expression: The expression used to model this variable.
-        
-        @rtype: Variable
-        @return: The newly created Variable.
+        This function restores entities pickled by _dumpEntities() into this
+        Session and records the references among them.
         
-        @raise InstantiationError: If an invalid expression is provided.
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+        @type payload: bytes
+        @param payload: The pickled entities.
         """
-        if not isinstance(expression, basestring):
-            raise InstantiationError("Non-string input")
-        (tokens, line_type) = _parseLine(expression)
-        if not tokens:
-            raise InstantiationError("Nothing expressed")
-        if not line_type == _LINE_VARIABLE:
-            raise InstantiationError("Not a variable")
+        unpickler = pickle.Unpickler(io.BytesIO(payload))
+        entities = [entity_type.__new__(entity_type) for entity_type in unpickler.load()]
+        def persistent_load(key):
+            if key[0] == 'e':
+                return entities[key[1]]
+            return _FUNCTIONS[key[1]]
+        unpickler.persistent_load = persistent_load
+        for (entity, state) in zip(entities, unpickler.load()):
+            entity.__setstate__(state)
             
-        variable = Variable(tokens[1:], tokens[0])
-        variable.compile(self._functions, self._variables)
-        
-        return variable
+        for entity in entities:
+            if type(entity) == _SharedSubexpression:
+                self._shared.append(entity)
+            elif type(entity) == Variable:
+                self._variables[entity.getName()] = entity
+            elif type(entity) == Function:
+                self._functions[(entity.getArity(), entity.getName())] = entity
+            else:
+                self._equations.append(entity)
+        for entity in list(self._functions.values()) + list(self._variables.values()) + self._equations:
+            self._track(entity)
+            
+            
+#Asynchronous evaluation
+########################################
+class AsyncSession(Session):
+    """
+    This class extends Session for use with asyncio, taking lookup handlers
+    that return awaitables, such as coroutines, instead of values.
+    
+    The external names an expression needs are looked up concurrently before it
+    is compiled, so that compilation waits for the slowest lookup rather than
+    for every lookup in turn; createVariable(), createFunction(),
+    createEquation(), evaluate_equation(), and evaluate() therefore return
+    asyncio Futures. Definitions are given to define(), rather than to the
+    constructor, for the same reason, and may be replaced thereafter by passing
+    the results of createVariable() and createFunction() to setVariable() and
+    setFunction().
+    
+    Lookups are never made while compiling, so external names are resolved only
+    by these methods; extract_equation(), evaluate_many(), fork(),
+    evaluate_parallel(), and startWorkers(), which would compile without them,
+    raise NotImplementedError.
+    """
+    _async_variable_lookup_handler = None #: A callable used to access external variables asynchronously.
+    _async_function_lookup_handler = None #: A callable used to access external functions asynchronously.
+    _gathered = None #: The results of the lookups made for the expression being compiled, keyed by (<prefix>, <key>).
+    
+    def __init__(self, variable_lookup_handler=None, function_lookup_handler=None, cache_size=_EQUATION_CACHE_SIZE, lookup_cache_size=_LOOKUP_CACHE_SIZE, lookup_ttl=None, shadowable=()):
+        """
+        This function creates a new, empty AsyncSession.
         
-    def setVariable(self, variable):
+        @type variable_lookup_handler: callable
+        @param variable_lookup_handler: A callable that takes a variable-name as
+            a basestring and returns an awaitable that produces a value or None,
+            used to access external variables on-demand.
+        @type function_lookup_handler: callable
+        @param function_lookup_handler: A callable that takes an arity-number
+            and function-name as a basestring and returns an awaitable that
+            produces a value or None, used to access external functions
+            on-demand.
+        @type cache_size: int
+        @param cache_size: The number of compiled equations to retain for reuse
+            by createEquation() and evaluate_equation(); 0 disables caching.
+        @type lookup_cache_size: int
+        @param lookup_cache_size: The number of results from the lookup
+            handlers, including the absence of a result, to retain; 0 disables
+            caching.
+        @type lookup_ttl: int|float|None
+        @param lookup_ttl: The number of seconds for which results from the
+            lookup handlers are retained, or None if they never expire.
+        @type shadowable: iterable
+        @param shadowable: The names of built-in variables and functions that
+            the lookup handlers may override; other built-in names are resolved
+            without consulting the handlers.
+            
+        @raise ImportError: If asyncio is unavailable.
         """
-        This adds a new variable to the set of variables known to this Session.
+        if asyncio is None:
+            raise ImportError("asyncio is required for asynchronous sessions")
+        Session.__init__(self, None, None, None, cache_size, lookup_cache_size, lookup_ttl, shadowable)
+        self._async_variable_lookup_handler = variable_lookup_handler
+        self._async_function_lookup_handler = function_lookup_handler
         
-        Variables from other sessions may be added, with the results being that
-        newly defined entities in the context of this Session will refer to the
-        alien variable, which in turn may refer to other alien entities. This
-        will probably be meaningless in most cases, however.
+    def define(self, input):
+        """
+        This function adds and compiles the variables, functions, and equations
+        expressed in the given input, once every external name they need has
+        been looked up.
         
-        @type variable: Variable
-        @param variable: The Variable to add.
+        @type input: basestring
+        @param input: A semicolon-separated series of expressions.
         
-        @raise InstantiationError: If something other than a Variable is
-            provided.
-        """
-        if not type(variable) == Variable:
-            raise InstantiationError("Non-Variable input")
+        @rtype: asyncio.Future
+        @return: A Future that produces None once the definitions are compiled,
+            or raises any error a Session would raise on construction,
+            including errors in parsing the input, in which case this
+            AsyncSession is left empty.
             
-        self._variables[variable.getName()] = variable
-        
-    def clearVariable(self, name):
+        @raise InstantiationError: If anything has already been defined in
+            this AsyncSession.
         """
-        This function removes the named variable from its namespace, if it
-        exists.
-        
-        @type name: basestring
-        @param name: The name of the variable to dereference.
+        if self._variables or self._functions or self._equations:
+            raise InstantiationError("Definitions may only be given to an empty session")
+        try:
+            self._define(input)
+        except Exception as e:
+            self._discardDefinitions()
+            future = asyncio.Future()
+            future.set_exception(e)
+            return future
+        return self._afterLookups(
+         _collectEntityLookups(list(self._functions.values()) + list(self._variables.values()) + self._equations),
+         self._compileDefinitions
+        )
+        
+    def createEquation(self, expression, placeholders=()):
         """
-        if self._variables.has_key[name]:
-            del self._variables[name]
+        This creates a new equation within the context of this session, as
+        Session.createEquation() does, once every external name it needs has
+        been looked up.
         
-    def getFunctions(self):
-        """
-        Returns a dictionary of functions keyed by arity and name.
+        @type expression: basestring
+        @param expression: The expression used to model this equation.
+        @type placeholders: sequence
+        @param placeholders: The names of the variables to be bound by each
+            evaluation.
         
-        @rtype: dict
-        @return: A dictionary of functions keyed by arity and name.
+        @rtype: asyncio.Future
+        @return: A Future that produces the newly created Equation, or raises
+            any error Session.createEquation() would raise.
         """
-        return self._functions
+        return self._afterLookups(self._collectExpressionLookups(expression, placeholders), Session.createEquation, self, expression, placeholders)
         
-    def listFunctions(self):
+    def createVariable(self, expression):
         """
-        This provides a collection of 'name/arity' function identifiers.
+        This creates a new variable within the context of this session, as
+        Session.createVariable() does, once every external name it needs has
+        been looked up.
         
-        All functions known to this Session will be represented.
+        @type expression: basestring
+        @param expression: The expression used to model this variable.
         
-        @rtype: tuple
-        @return: A collection of 'name/arity' function-identifying strings.
+        @rtype: asyncio.Future
+        @return: A Future that produces the newly created Variable, or raises
+            any error Session.createVariable() would raise.
         """
-        functions = set()
-        for (arity, name) in _FUNCTIONS.keys():
-            functions.add("%s/%i" % (name, arity))
-            
-        for (arity, name) in self._functions.keys():
-            functions.add("%s/%i" % (name, arity))
-            
-        return tuple(sorted(functions))
+        return self._afterLookups(self._collectDefinitionLookups(expression, _LINE_VARIABLE, Variable), Session.createVariable, self, expression)
         
     def createFunction(self, expression):
         """
-        This creates a new function within the context of this session. However,
-        it will not be assigned to this session unless explicitly set with
-        setFunction().
+        This creates a new function within the context of this session, as
+        Session.createFunction() does, once every external name it needs has
+        been looked up.
         
         @type expression: basestring
         @param expression: The expression used to model this function.
         
-        @rtype: Function
-        @return: The newly created Function.
-        
-        @raise InstantiationError: If an invalid expression is provided.
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+        @rtype: asyncio.Future
+        @return: A Future that produces the newly created Function, or raises
+            any error Session.createFunction() would raise.
         """
-        if not isinstance(expression, basestring):
-            raise InstantiationError("Non-string input")
-        (tokens, line_type) = _parseLine(expression)
-        if not tokens:
-            raise InstantiationError("Nothing expressed")
-        if not line_type == _LINE_FUNCTION:
-            raise InstantiationError("Not a function")
-            
-        function = Function(tokens[1:], tokens[0])
-        function.compile(self._functions, self._variables)
-        
-        return function
+        return self._afterLookups(self._collectDefinitionLookups(expression, _LINE_FUNCTION, Function), Session.createFunction, self, expression)
         
-    def setFunction(self, function):
+    def evaluate_equation(self, input, bindings=None):
         """
-        This adds a new function to the set of functions known to this Session.
+        This function evaluates a single equation, as
+        Session.evaluate_equation() does, once every external name it needs has
+        been looked up.
         
-        Functions from other sessions may be added, with the results being that
-        newly defined entities in the context of this Session will refer to the
-        alien function, which in turn may refer to other alien entities. This
-        will probably be meaningless in most cases, however.
+        @type input: basestring
+        @param input: The equation to be evaluated.
+        @type bindings: dict|None
+        @param bindings: Values for variables, keyed by name, that shadow any
+            known to this Session without modifying it.
         
-        @type function: Function
-        @param function: The Function to add.
+        @rtype: asyncio.Future
+        @return: A Future that produces the evaluated number, or raises any
+            error Session.evaluate_equation() would raise.
+        """
+        return self._afterLookups(self._collectExpressionLookups(input, bindings and sorted(bindings) or ()), Session.evaluate_equation, self, input, bindings)
         
-        @raise InstantiationError: If something other than a Function is
-            provided.
+    def evaluate(self):
         """
-        if not type(function) == Function:
-            raise InstantiationError("Non-Function input")
-            
-        self._functions[(function.getArity(), function.getName())] = function
+        This function evaluates all equations in this session's batch queue, as
+        Session.evaluate() does.
         
-    def clearFunction(self, name, arity):
+        @rtype: asyncio.Future
+        @return: A Future that produces the result of Session.evaluate(), or
+            raises any error it would raise.
         """
-        This function removes the named function from its namespace, if it
-        exists.
+        return self._afterLookups((), Session.evaluate, self)
         
-        @type name: basestring
-        @param name: The name of the function to dereference.
-        @type arity: int
-        @param arity: The arity of the function to dereference.
+    def extract_equation(self, input, placeholders=()):
         """
-        self._functions.pop((arity, name), None)
+        PreparedEquations recompile themselves when used, when no lookups can
+        be awaited, so they cannot be provided by an AsyncSession.
         
-    def getEquations(self):
+        @raise NotImplementedError: Always; use createEquation() instead.
         """
-        Returns a list of all equations to be evaluated by this Session.
+        raise NotImplementedError("AsyncSession does not support extract_equation(); use createEquation()")
         
-        Evaluations will occur in the order of this list.
+    def evaluate_many(self, input, rows):
+        """
+        The equation would be compiled without awaiting its lookups, so
+        batches of bindings cannot be evaluated by an AsyncSession.
         
-        @rtype: list
-        @return: A list of all functions to be evaluated by this Session.
+        @raise NotImplementedError: Always; use createEquation() with
+            placeholders instead.
         """
-        return self._equations
+        raise NotImplementedError("AsyncSession does not support evaluate_many(); use createEquation() with placeholders")
         
-    def createEquation(self, expression):
+    def fork(self, input=None, cache_size=_EQUATION_CACHE_SIZE):
         """
-        This creates a new equation within the context of this session. However,
-        it will not be assigned to this session unless explicitly set with
-        addEquation().
+        Forks resolve inherited names synchronously, so an AsyncSession cannot
+        be forked.
         
-        @type expression: basestring
-        @param expression: The expression used to model this equation.
+        @raise NotImplementedError: Always.
+        """
+        raise NotImplementedError("AsyncSession does not support fork()")
         
-        @rtype: Equation
-        @return: The newly created Equation.
+    def evaluate_parallel(self, workers=None, chunk_size=None, warm_up=False):
+        """
+        Worker processes compile their Sessions without awaiting lookups, so
+        an AsyncSession cannot be evaluated in parallel.
         
-        @raise InstantiationError: If an invalid expression is provided.
-        @raise TokensError: If no tokens are provided.
-        @raise UnterminatedFunctionError: If a function call is missing its terminal
-            parenthesis.
-        @raise UnexpectedCharacterError: If a token appears in a position where it
-            contradicts the syntactic structure of an expression.
-        @raise ConsecutiveFactorError: If two factors appear consecutively.
-        @raise ConsecutiveOperatorError: If two operators appear consecutively.
-        @raise UnbalancedParenthesesError: If the expression ends without closing
-            all parentheses.
-        @raise IncompleteExpressionError: If the expression ends while expecting a
-            factor.
+        @raise NotImplementedError: Always; use evaluate() instead.
         """
-        if not isinstance(expression, basestring):
-            raise InstantiationError("Non-string input")
-        (tokens, line_type) = _parseLine(expression)
-        if not tokens:
-            raise InstantiationError("Nothing expressed")
-            
-        equation = None
-        if line_type == _LINE_EQUATION:
-            equation = Equation(tokens)
-        else:
-            raise InstantiationError("Not an equation")
-            
-        equation.compile(self._functions, self._variables)
-        return equation
+        raise NotImplementedError("AsyncSession does not support evaluate_parallel(); use evaluate()")
         
-    def addEquation(self, equation):
+    def startWorkers(self, workers=None):
         """
-        This adds a new equation to the batch of equations to be evaluated by
-        this Session.
+        Worker processes compile their Sessions without awaiting lookups, so
+        an AsyncSession cannot start them.
         
-        Equations from other sessions may be added, but the results may be
-        meaningless.
+        @raise NotImplementedError: Always.
+        """
+        raise NotImplementedError("AsyncSession does not support startWorkers()")
         
-        @type equation: Equation
-        @param equation: The Equation to add.
+    def _compileDefinitions(self):
+        """
+        This function compiles the definitions given to define(), discarding
+        them if they cannot be compiled.
         
-        @raise InstantiationError: If something other than an Equation is
-            provided.
+        @raise RecursionError: If any variable or function refers to itself,
+            directly or transitively.
         """
-        if not type(equation) == Equation:
-            raise InstantiationError("Non-Equation input")
+        try:
+            self._compileEntities()
+        except:
+            self._discardDefinitions()
+            raise
             
-        self._equations.append(equation)
+    def _discardDefinitions(self):
+        """
+        This function discards every definition given to define(), leaving this
+        AsyncSession empty.
+        """
+        self._variables.clear()
+        self._functions.clear()
+        del self._equations[:]
+        self._dependents.clear()
+            
+    def _collectExpressionLookups(self, expression, placeholders):
+        """
+        This function identifies every external name that evaluating or
+        compiling the given expression may need.
         
-    def clearEquation(self, equation):
+        @type expression: basestring
+        @param expression: The expression to be scanned.
+        @type placeholders: sequence
+        @param placeholders: The names of variables bound by each evaluation,
+            which need not be looked up.
+            
+        @rtype: list
+        @return: A list of (<prefix>, <key>) tuples, as produced by
+            _collectLookups(); the list is empty if the expression cannot be
+            parsed, so that the error is raised by the Session.
         """
-        This function removes the given equation from its evaluation batch, if it
-        exists.
+        prepared = self._cache.peek(_cacheKey(expression, placeholders))
+        if prepared is not None:
+            tokens = prepared.getTokens()
+        elif not isinstance(expression, basestring):
+            return []
+        else:
+            try:
+                tokens = _parseLine(expression)[0]
+            except Error:
+                return []
+        return [key for key in _collectLookups(tokens) if not (key[0] == _VARIABLE_PREFIX and key[1] in placeholders)]
         
-        @type equation: Equation
-        @param equation: The equation to be removed from this session's
-            evaluation batch.
+    def _collectDefinitionLookups(self, expression, line_type, entity_class):
         """
-        try:
-            self._equations.remove(equation)
-        except: pass
+        This function identifies every external name that compiling the given
+        definition may need, omitting the parameters of functions.
         
-    def clearEquations(self):
+        @type expression: basestring
+        @param expression: The definition to be scanned.
+        @type line_type: int
+        @param line_type: The type of line expected, _LINE_VARIABLE or
+            _LINE_FUNCTION.
+        @type entity_class: type
+        @param entity_class: The class that models the definition.
+        
+        @rtype: list
+        @return: A list of (<prefix>, <key>) tuples, as produced by
+            _collectLookups(); the list is empty if the definition cannot be
+            parsed or is of another type, so that the error is raised by the
+            Session.
         """
-        This function removes all equations from its evaluation batch.
+        if not isinstance(expression, basestring):
+            return []
+        try:
+            (tokens, found_type) = _parseLine(expression)
+            if not tokens or found_type != line_type:
+                return []
+            return list(_collectEntityLookups((entity_class(tokens[1:], tokens[0]),)))
+        except Error:
+            return []
+            
+    def _afterLookups(self, keys, function, *arguments):
         """
-        self._equations = []
+        This function looks up every given name that is neither defined nor
+        built-in, concurrently, then calls the given function while the results
+        are available to _lookupVariable() and _lookupFunction().
+        
+        @type keys: iterable
+        @param keys: (<prefix>, <key>) tuples, as produced by
+            _collectLookups().
+        @type function: callable
+        @param function: The callable to be invoked once the names have been
+            looked up.
+        @type arguments: tuple
+        @param arguments: The arguments with which to invoke the callable.
         
-    def evaluate(self):
+        @rtype: asyncio.Future
+        @return: A Future that produces the callable's result or raises its
+            error.
         """
-        This function evaluates all equations in this session's batch queue.
+        unresolved = []
+        seen = set()
+        for key in keys:
+            (prefix, name) = key
+            if prefix == _VARIABLE_PREFIX:
+                (handler, builtins, namespace, builtin_name) = (self._async_variable_lookup_handler, _VARIABLES, self._variables, name)
+            else:
+                (handler, builtins, namespace, builtin_name) = (self._async_function_lookup_handler, _FUNCTIONS, self._functions, name[1])
+            if handler is None or key in seen or name in namespace or name in builtins and not builtin_name in self._shadowable:
+                continue
+            seen.add(key)
+            unresolved.append(key)
+            
+        future = asyncio.Future()
+        gathering = self._lookup_cache.gather(unresolved, self._lookupAsync)
+        def proceed(gathering):
+            if future.cancelled():
+                return
+            if gathering.cancelled():
+                future.cancel()
+                return
+            error = gathering.exception()
+            if error is None:
+                previous = self._gathered
+                self._gathered = gathering.result()
+                try:
+                    result = function(*arguments)
+                except Exception as e:
+                    error = e
+                finally:
+                    self._gathered = previous
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        gathering.add_done_callback(proceed)
+        return future
         
-        It returns information about the variables used to perform the
-        computations and the results of each equation.
-                    
-        @rtype: tuple
-        @return: A tuple containing two sequences of paired values::
-            - The first contains (<name:str>,<value:int|float>) for each variable
-            - The second holds (<expression:str>,<result:int|float> per equation
+    def _lookupAsync(self, key):
+        """
+        This function invokes the appropriate lookup handler for the given key.
         
-        @raise CompilationError: If this equation has not been compiled.
-        @raise RecursionError: If this equation has already been invoked during
-            the evaluation process.
-        @raise ThresholdError: If the values passed to an operand or function exceed
-            pre-defined limits.
-        @raise DivisionByZeroError: If a division by zero would occur as a result of
-            an operation.
-        @raise IncompleteExpressionError: If there are excessive tokens in the input
-            stack.
-        @raise NullSubexpressionError: If a bracketed expression contains no
-            content.
+        @type key: tuple
+        @param key: The (<prefix>, <key>) to look up.
+        
+        @rtype: awaitable
+        @return: The handler's result.
         """
-        values = []
-        for (variable_type, variable) in self._variables.items():
-            variable.compute()
-            values.append((variable_type, variable.evaluate()))
-            
-        results = [(str(equation), equation.evaluate()) for equation in self._equations]
-            
-        for variable in self._variables.values():
-            variable.reset()
-            
-        return (tuple(sorted(values)), tuple(results))
+        (prefix, name) = key
+        if prefix == _VARIABLE_PREFIX:
+            return self._async_variable_lookup_handler(name)
+        return self._async_function_lookup_handler(name[0], name[1])
         
-    def evaluate_equation(self, input):
+    def _lookupVariable(self, name):
         """
-        This function evaluates a single equation and returns its result. It is
-        intended for repeated reuse of initialised variables and functions.
+        This function resolves a variable that is not defined in this
+        AsyncSession from the results gathered by _afterLookups(), since the
+        asynchronous handlers cannot be awaited while compiling.
         
-        @type input: basestring
-        @param input: The equation to be evaluated.
+        @type name: basestring
+        @param name: The name of the variable.
         
-        @rtype: number
-        @return: The evaluated number.
+        @rtype: int|float|None
+        @return: The external value, or None if the name was not resolved.
         """
-        return self.extract_equation(input)()
+        if self._async_variable_lookup_handler is not None:
+            if name in _VARIABLES and not name in self._shadowable:
+                self._lookup_cache.skipBuiltin()
+                return None
+            if self._gathered is not None:
+                return self._gathered.get((_VARIABLE_PREFIX, name))
+        return None
         
-    def extract_equation(self, input):
+    def _lookupFunction(self, spec):
         """
-        This function provides a callable that runs through the compilation and
-        evaluation steps of an equation on every invocation, allowing for
-        internal and external values to change without requiring repeated
-        parsing.
+        This function resolves a function that is not defined in this
+        AsyncSession from the results gathered by _afterLookups(), since the
+        asynchronous handlers cannot be awaited while compiling.
         
-        @type input: basestring
-        @param input: The equation to be evaluated.
+        @type spec: tuple
+        @param spec: The (<arity>, <name>) of the function.
         
-        @rtype: callable
-        @return: A callable that provides a number, requiring no arguments.
+        @rtype: object|None
+        @return: The external function, or None if the spec was not resolved.
         """
-        (tokens, line_type) = _parseLine(input)
-        if line_type != _LINE_EQUATION:
-            raise CompilationError(input)
-            
-        equation = Equation(tokens)
-        def _evaluate(equation):
-            equation = equation.copy()
-            equation.compile(self._functions, self._variables)
-            return equation.evaluate()
-        return functools.partial(_evaluate, equation)
+        if self._async_function_lookup_handler is not None:
+            if spec in _FUNCTIONS and not spec[1] in self._shadowable:
+                self._lookup_cache.skipBuiltin()
+                return None
+            if self._gathered is not None:
+                return self._gathered.get((_FUNCTION_PREFIX, spec))
+        return None
         
         
+#Parallel evaluation
+########################################
+_parallel_session = None #: The Session built by each worker process for evaluate_parallel().
+_parallel_barrier = None #: The barrier at which each worker process waits for the others while warming up.
+
+def _initializeParallelWorker(definitions, variable_lookup_handler, function_lookup_handler, shadowable, bulk_lookup_handler, barrier):
+    """
+    This function builds and compiles the Session against which a worker
+    process evaluates equations.
+    
+    @type definitions: tuple
+    @param definitions: Lists of (<name>, <tokens>) variables, (<name>,
+        <parameter names>, <tokens>) functions, and the tokens of each
+        equation, as prepared by Session.evaluate_parallel().
+    @type variable_lookup_handler: callable|None
+    @param variable_lookup_handler: The Session's variable lookup handler.
+    @type function_lookup_handler: callable|None
+    @param function_lookup_handler: The Session's function lookup handler.
+    @type shadowable: frozenset
+    @param shadowable: The built-in names the handlers may override.
+    @type bulk_lookup_handler: callable|None
+    @param bulk_lookup_handler: The Session's bulk lookup handler.
+    @type barrier: multiprocessing.Barrier
+    @param barrier: The barrier shared by every worker in the pool, used by
+        _warmParallelWorker().
+    """
+    global _parallel_session, _parallel_barrier
+    (variables, functions, equations) = definitions
+    session = Session(None, variable_lookup_handler, function_lookup_handler, 0, shadowable=shadowable, bulk_lookup_handler=bulk_lookup_handler)
+    for (name, tokens) in variables:
+        session._variables[name] = Variable(tokens, name)
+    for (name, parameters, tokens) in functions:
+        function = Function([', '.join(parameters)] + list(tokens), name)
+        session._functions[(function.getArity(), name)] = function
+    for tokens in equations:
+        session._equations.append(Equation(tokens))
+    session._compileEntities()
+    _parallel_session = session
+    _parallel_barrier = barrier
+    
+def _warmParallelWorker(index):
+    """
+    This function waits until every worker process in the pool is running it,
+    so that, with one task submitted per worker, each worker must have started
+    and compiled its Session before any task completes.
+    """
+    _parallel_barrier.wait()
+    return index
+    
+def _evaluateParallelChunk(start, end):
+    """
+    This function evaluates a slice of the worker's equations.
+    
+    @type start: int
+    @param start: The index of the first equation to evaluate.
+    @type end: int
+    @param end: The index after the last equation to evaluate.
+    
+    @rtype: list
+    @return: A list of (<expression:str>, <result:int|float>) pairs.
+    """
+    return [(str(equation), equation.evaluate()) for equation in _parallel_session.getEquations()[start:end]]
+    
+    
 #Exceptions
 ########################################
 class Error(Exception):
-    pass
+    def __reduce__(self):
+        """
+        Errors are pickled as their rendered messages, since the expressions
+        they describe refer to compiled entities, allowing them to be raised
+        in another process.
+        """
+        return (_rebuildError, (self.__class__, str(self)))
+        
+_REMOTE_ERROR_TYPES = {} #: Subclasses of Error types, created by _rebuildError(), keyed by the types they extend.
+
+def _rebuildError(error_type, message):
+    """
+    This function reconstructs an Error pickled by Error.__reduce__(), as an
+    instance of a subclass of its original type that renders the original
+    message.
+    
+    @type error_type: type
+    @param error_type: The type of the pickled Error.
+    @type message: str
+    @param message: The Error's rendered message.
+    
+    @rtype: Error
+    @return: The reconstructed Error.
+    """
+    remote_type = _REMOTE_ERROR_TYPES.get(error_type)
+    if remote_type is None:
+        remote_type = _REMOTE_ERROR_TYPES[error_type] = type(error_type.__name__, (error_type,), {
+         '__str__': lambda self: self.args[0],
+         '__reduce__': lambda self: (_rebuildError, (error_type, self.args[0])),
+        })
+    error = Exception.__new__(remote_type)
+    error.args = (message,)
+    return error
+    
     
 class CompilationError(Error):
     _expression = None #: The expression in which the error occurred.
@@ -1688,7 +6278,7 @@ class CompilationError(Error):
         self._expression = expression
         
     def __str__(self):
-        return "expression not compiled : %s"  (_renderExpression(self._expression))
+        return "expression not compiled : %s" % (_renderExpression(self._expression))
     
 class ConsecutiveFactorError(Error):
     _token = None #: The offending token.
@@ -1703,7 +6293,7 @@ class ConsecutiveFactorError(Error):
                         break
             elif token[0] == _FUNCTION_BUILTIN:
                 self._token = token[1].__name__
-            elif token[0] in (_VARIABLE_CUSTOM, _VARIABLE_EXTERNAL, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
+            elif token[0] in (_VARIABLE_CUSTOM, _VARIABLE_EXTERNAL, _VARIABLE_PARAMETER, _FUNCTION_CUSTOM, _FUNCTION_EXTERNAL):
                 self._token = token[1]
                 
         else:
@@ -1731,13 +6321,20 @@ class DivisionByZeroError(Error):
     _value_left = None #: The value being divided.
     _value_right = None #: The value that is equal to 0.
     _expression = None #: The expression being evaluated.
+    _rows = None #: The rows that failed, during vectorized evaluation.
     
-    def __init__(self, value_left, value_right, expression):
+    def __init__(self, value_left, value_right, expression, rows=None):
         self._value_left = value_left
         self._value_right = value_right
         self._expression = expression
+        self._rows = rows
+        
+    def getRows(self):
+        return self._rows
         
     def __str__(self):
+        if self._rows is not None:
+            return "division by 0 (%s/%s) in rows %s : %s" % (self._value_left, self._value_right, list(self._rows), _renderExpression(self._expression))
         return "division by 0 (%s/%s) : %s" % (self._value_left, self._value_right, _renderExpression(self._expression))
         
 class FunctionError(Error):
@@ -1801,11 +6398,18 @@ class RecursionError(Error):
         
 class ThresholdError(Error):
     _message = None #: The description of this error.
+    _rows = None #: The rows that failed, during vectorized evaluation.
     
-    def __init__(self, message):
+    def __init__(self, message, rows=None):
         self._message = message
+        self._rows = rows
+        
+    def getRows(self):
+        return self._rows
         
     def __str__(self):
+        if self._rows is not None:
+            return "calculation too expensive in rows %s : %s" % (list(self._rows), self._message)
         return "calculation too expensive : %s" % (self._message)
         
 class TokensError(Error):
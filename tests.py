@@ -1,7 +1,12 @@
 #! /usr/bin/python
 # -*- coding: utf-8 -*-
 import unittest
+import asyncio
 import math
+import pickle
+import sys
+import threading
+import time
 
 import calc
 
@@ -275,15 +280,11 @@ class ComputationTest(unittest.TestCase):
 			self.fail("No error generated. Expected %s." % (calc.NullSubexpressionError.__class__.__name__))
 		except calc.NullSubexpressionError: pass
 		
-		session = calc.Session("g = 67q; q = 5g; x(y, z)= 2 x(y, z)")
-		try:
-			session.createEquation("g").evaluate()
-			self.fail("No error generated. Expected %s." % (calc.RecursionError.__class__.__name__))
-		except calc.RecursionError: pass
-		try:
-			session.createEquation("x(1, 2)").evaluate()
-			self.fail("No error generated. Expected %s." % (calc.RecursionError.__class__.__name__))
-		except calc.RecursionError: pass
+		for input in ("g = 67q; q = 5g", "x(y, z)= 2 x(y, z)"):
+			try:
+				calc.Session(input)
+				self.fail("No error generated. Expected %s." % (calc.RecursionError.__class__.__name__))
+			except calc.RecursionError: pass
 		
 		try:
 			self._session.createEquation("75^2048").evaluate()
@@ -320,5 +321,963 @@ class ComputationTest(unittest.TestCase):
 			self.fail("No error generated. Expected %s." % (calc.VariableError.__class__.__name__))
 		except calc.VariableError: pass
 		
+	def testClosures(self):
+		"""
+		This test ensures that equations compiled into closures produce the same
+		values and errors as the interpreter.
+		"""
+		for expression in (
+		 "1 - ---1", "-1-(-(-1 + 1 + 1 * 5))", "10\\3", "10/3", "10 % 3", "1 < 2", "1 > 2", "10^2",
+		 "g(d, f) + c - e", "77(a) - 22b", "g(-c)", "g(g(g(2)))", "`number 5` + `5.6`",
+		 "sqrt(16) + fact(5) + sum(1, 5, 2) + atan(-1, -1)",
+		):
+			equation = self._session_full.createEquation(expression)
+			closure = self._session_full.createEquation(expression)
+			closure.compileClosure()
+			self.assertEqual(closure.evaluate(), equation.evaluate())
+			
+		function = self._session_full.getFunctions()[(2, 'g')]
+		function.compileClosure()
+		self.assertEqual(self._session_full.createEquation("g(1, 3)").evaluate(), 4)
+		
+		for (expression, error) in (
+		 ("75^2048", calc.ThresholdError),
+		 ("1 / (1 - 1)", calc.DivisionByZeroError),
+		 ("1 \\ 0", calc.DivisionByZeroError),
+		 ("sqrt(-1)", calc.ThresholdError),
+		 ("()", calc.NullSubexpressionError),
+		):
+			equation = self._session.createEquation(expression)
+			equation.compileClosure()
+			self.assertRaises(error, equation.evaluate)
+		
+	def testDeepNesting(self):
+		"""
+		This test ensures that function calls nested beyond what the native
+		backends can follow raise ThresholdError rather than Python's own
+		recursion error, leaving the interpreter in use.
+		"""
+		expression = "g(" * 200 + "1" + ")" * 200
+		for backend in ('compileClosure', 'compileSource'):
+			equation = calc.Session("g(x) = x + 1").createEquation(expression)
+			limit = sys.getrecursionlimit()
+			sys.setrecursionlimit(300)
+			try:
+				self.assertRaises(calc.ThresholdError, getattr(equation, backend))
+			finally:
+				sys.setrecursionlimit(limit)
+			self.assertEqual(equation.evaluate(), 201)
+			
+	def testSource(self):
+		"""
+		This test ensures that equations translated into Python source produce
+		the same values and errors as the interpreter, and that their source
+		can be inspected.
+		"""
+		for expression in (
+		 "1 - ---1", "-1-(-(-1 + 1 + 1 * 5))", "10\\3", "10/3", "10 % 3", "1 < 2", "1 > 2", "10^2", "-2^2", "2 ^ -3 * 4",
+		 "g(d, f) + c - e", "77(a) - 22b", "g(-c)", "g(g(g(2)))", "`number 5` + `5.6`",
+		 "sqrt(16) + fact(5) + sum(1, 5, 2) + atan(-1, -1) + ceil(0.1) + log(5, 2)",
+		):
+			equation = self._session_full.createEquation(expression)
+			source = self._session_full.createEquation(expression)
+			source.compileSource()
+			self.assertEqual(source.evaluate(), equation.evaluate())
+			
+		equation = self._session_full.createEquation("sin(a) < 2 > c")
+		self.assertTrue("math.sin(" in equation.getSource())
+		self.assertTrue("min(" in equation.getSource())
+		self.assertTrue("max(" in equation.getSource())
+		
+		function = self._session_full.getFunctions()[(2, 'g')]
+		function.compileSource()
+		namespace = {}
+		exec(compile(function.getSource(), "<testSource>", 'exec'), namespace)
+		self.assertEqual(namespace['_compiled'](None, (1, 3)), calc.Session("g(x, y) = x + y").createEquation("g(1, 3)").evaluate())
+		self.assertEqual(self._session_full.createEquation("g(1, 3)").evaluate(), 4)
+		
+		for (expression, error) in (
+		 ("75^2048", calc.ThresholdError),
+		 ("1 / (1 - 1)", calc.DivisionByZeroError),
+		 ("1 \\ 0", calc.DivisionByZeroError),
+		 ("sqrt(-1)", calc.ThresholdError),
+		 ("fact(101)", calc.ThresholdError),
+		 ("e(1, 10000)", calc.ThresholdError),
+		 ("sum(1, 2, 0)", calc.ThresholdError),
+		 ("()", calc.NullSubexpressionError),
+		):
+			equation = self._session.createEquation(expression)
+			equation.compileSource()
+			self.assertRaises(error, equation.evaluate)
+		
+	@unittest.skipUnless(calc.numpy, "NumPy is not available")
+	def testVectorized(self):
+		"""
+		This test ensures that vectorized evaluation matches row-by-row
+		evaluation and that its errors identify the rows that failed.
+		"""
+		rows = ((1, 5), (2, 6), (-3, 7), (4, -8))
+		bindings = {'a': [a for (a, b) in rows], 'b': [b for (a, b) in rows]}
+		for expression in (
+		 "c * 2 + g(a, 3) - e", "a \\ b", "2 ^ -a", "-a^2 % 3 < 2 > 1", "10 / b", "pi", "sqrt(b ^ 2) + fact(abs(a)) + sum(1, b, 2)",
+		):
+			values = self._session_full.createEquation(expression).evaluate_vectorized(bindings)
+			self.assertEqual(len(values), len(rows))
+			for ((a, b), value) in zip(rows, values):
+				session = calc.Session("a = %i; b = %i; c = a + b; d = g(c); g(a) = a b; g(x, y) = x + y" % (a, b))
+				self.assertAlmostEqual(value, session.createEquation(expression).evaluate())
+				
+		try:
+			self._session.createEquation("1 / (a - 2)").evaluate_vectorized({'a': [1, 2, 3, 2]})
+			self.fail("No error generated. Expected %s." % (calc.DivisionByZeroError.__class__.__name__))
+		except calc.DivisionByZeroError as e:
+			self.assertEqual(e.getRows(), (1, 3))
+		try:
+			self._session.createEquation("sqrt(a)").evaluate_vectorized({'a': [-1, 2, -3]})
+			self.fail("No error generated. Expected %s." % (calc.ThresholdError.__class__.__name__))
+		except calc.ThresholdError as e:
+			self.assertEqual(e.getRows(), (0, 2))
+			
+		class Double(object):
+			def evaluate(self, arguments, stack):
+				return arguments[0] * 2
+		session = calc.Session("x = 0", function_lookup_handler=lambda arity, name: name == 'ext' and Double() or None)
+		self.assertEqual(list(session.createEquation("ext(x) + 1").evaluate_vectorized({'x': [1, 2, 3]})), [3, 5, 7])
+		
+	@unittest.skipUnless(calc.numpy, "NumPy is not available")
+	def testVectorizedParity(self):
+		"""
+		This test ensures that vectorized evaluation computes large integers
+		exactly and raises the same errors as row-by-row evaluation where
+		NumPy's own arithmetic would overflow or yield infinities and NaNs.
+		"""
+		for (expression, rows) in (
+		 ("x ^ 30", ((10, 0), (3, 0))),
+		 ("x * 10000000000 * 10000000000", ((1, 0), (-7, 0))),
+		 ("x + 9223372036854775807 - y", ((1, 2), (2, 1))),
+		 ("floor(x ^ 20 / 3) + x \\ y", ((10, 3), (2, 2))),
+		 ("sin(x ^ 30) + log(x, y)", ((10, 2), (2, 3))),
+		 ("ln(x)", ((1, 0), (0, 0))),
+		 ("log(x) + acos(y)", ((1, 1), (-1, 1), (1, 2))),
+		 ("log(x, y)", ((4, 2), (1, 1))),
+		 ("x % y", ((5, 2), (5, 0))),
+		 ("x % y", ((5.0, 2.0), (5.0, 0.0))),
+		 ("x ^ y", ((9999999.0, 1024), (2.0, 3))),
+		 ("x ^ y", ((0.0, -1), (1, 1))),
+		 ("x ^ 0.5", ((-4, 0), (4, 0))),
+		 ("x ^ 0.5 * 2 + y", ((-4.0, 1), (9.0, 1))),
+		 ("x ^ 0.5 < 1", ((4, 0), (-4, 0))),
+		 ("sqrt((0 - 3) ^ 0.5) + x", ((1, 0),)),
+		 ("log(2, x) * 0", ((1, 0), (0, 0))),
+		 ("sum(x > e(2, y), 10)", ((1, 0), (3, -1))),
+		 ("(3 ^ 400) % (3 ^ x)", ((1, 0), (2, 0))),
+		):
+			try:
+				expected = [calc.Session("x = %r; y = %r" % (x, y)).createEquation(expression).evaluate() for (x, y) in rows]
+			except Exception as e:
+				expected = (type(e), str(e))
+			try:
+				values = list(calc.Session("x = 0; y = 0").createEquation(expression).evaluate_vectorized({'x': [x for (x, y) in rows], 'y': [y for (x, y) in rows]}))
+			except Exception as e:
+				values = (type(e), str(e))
+			self.assertEqual(values, expected)
+			
+		try:
+			self._session.createEquation("fact(a)").evaluate_vectorized({'a': [3, 101, 102]})
+			self.fail("No error generated. Expected %s." % (calc.ThresholdError.__class__.__name__))
+		except calc.ThresholdError as e:
+			self.assertEqual(e.getRows(), (1, 2))
+			self.assertTrue("(101)" in str(e))
+		
+	def testEvaluateMany(self):
+		"""
+		This test ensures that batch evaluation produces one result per row,
+		reports errors without stopping, and leaves the session untouched.
+		"""
+		results = list(self._session_full.evaluate_many("g(x, y) / (x - 2) + c", [
+		 {'x': 1, 'y': 2},
+		 {'x': 2, 'y': 3},
+		 {'x': 4, 'y': 0},
+		 {'y': 5},
+		]))
+		self.assertEqual(len(results), 4)
+		self.assertEqual(results[0], (-3 + 3, None))
+		self.assertEqual(results[1][0], None)
+		self.assertTrue(isinstance(results[1][1], calc.DivisionByZeroError))
+		self.assertEqual(results[2], (4 / 2.0 + 3, None))
+		self.assertTrue(isinstance(results[3][1], calc.VariableError))
+		
+		results = list(self._session_full.evaluate_many("log(x) + x % y", [
+		 {'x': 1, 'y': 2},
+		 {'x': 0, 'y': 2},
+		 {'x': 1, 'y': 0},
+		 {'x': 3, 'y': 2},
+		]))
+		self.assertEqual(len(results), 4)
+		self.assertEqual(results[0], (1, None))
+		self.assertTrue(isinstance(results[1][1], ValueError))
+		self.assertTrue(isinstance(results[2][1], ZeroDivisionError))
+		self.assertEqual(results[3], (math.log(3) + 1, None))
+		
+		self.assertEqual(list(self._session_full.evaluate_many("a + 1", [{'a': 0}, {'a': 10}])), [(1, None), (11, None)])
+		self.assertEqual(self._session_full.getVariables()['a'].evaluate(), 1)
+		
+		results = list(self._session_full.evaluate_many("c * 10 + a", [{'a': 5}, {'a': 5, 'b': 1}, {'a': 6}]))
+		self.assertEqual(results[0], (35, None)) #c = a + b keeps its defined value.
+		self.assertTrue(isinstance(results[1][1], calc.VariableError))
+		self.assertTrue("'b'" in str(results[1][1]))
+		self.assertEqual(results[2], (36, None))
+		if calc.numpy:
+			self.assertEqual(list(self._session_full.createEquation("c * 10 + a").evaluate_vectorized({'a': [5]})), [75])
+		self.assertEqual(list(self._session_full.evaluate_many("a", [])), [])
+		
+	def testEquationCache(self):
+		"""
+		This test ensures that compiled equations are reused, evicted once the
+		cache is full, and invalidated when a name they depend on is redefined.
+		"""
+		session = calc.Session("a = 1; b = 2; g(x) = x * 2", cache_size=2)
+		equation = session.createEquation("g(a) + b")
+		duplicate = session.createEquation("g(a) + b")
+		self.assertFalse(duplicate is equation)
+		equation.compileSource()
+		self.assertEqual(equation.evaluate(), duplicate.evaluate())
+		self.assertEqual(session.evaluate_equation("g(a) + b"), 4)
+		statistics = session.getCacheStatistics()
+		self.assertEqual((statistics['hits'], statistics['misses'], statistics['size']), (2, 1, 1))
+		
+		session.setVariable(session.createVariable("b = 10"))
+		self.assertEqual(session.evaluate_equation("g(a) + b"), 12)
+		session.setFunction(session.createFunction("g(x) = x * 3"))
+		self.assertEqual(session.evaluate_equation("g(a) + b"), 13)
+		session.clearVariable('b')
+		self.assertRaises(calc.VariableError, session.evaluate_equation, "g(a) + b")
+		
+		session.evaluate_equation("a + 1")
+		session.evaluate_equation("a + 2")
+		session.evaluate_equation("a + 3")
+		statistics = session.getCacheStatistics()
+		self.assertEqual((statistics['size'], statistics['evictions']), (2, 1))
+		
+		values = {'x': 5}
+		external = calc.Session(variable_lookup_handler=values.get)
+		self.assertEqual(external.evaluate_equation("x + 1"), 6)
+		values['x'] = 7
+		self.assertEqual(external.evaluate_equation("x + 1"), 8)
+		self.assertEqual(external.getCacheStatistics()['hits'], 1)
+		
+	def testPreparedEquation(self):
+		"""
+		This test ensures that prepared equations stay compiled until a variable,
+		function, or external value they reference changes.
+		"""
+		values = {'x': 1}
+		session = calc.Session("a = 1; b = 2; g(y) = y * 2", variable_lookup_handler=values.get)
+		prepared = session.extract_equation("g(a) + b + x")
+		self.assertEqual(prepared(), 5)
+		equation = prepared.getEquation()
+		self.assertEqual(prepared(), 5)
+		self.assertTrue(prepared.getEquation() is equation)
+		
+		session.setVariable(session.createVariable("c = 100"))
+		self.assertTrue(prepared.getEquation() is equation)
+		
+		session.setVariable(session.createVariable("b = 10"))
+		self.assertEqual(prepared(), 13)
+		self.assertFalse(prepared.getEquation() is equation)
+		
+		session.setFunction(session.createFunction("g(y) = y * 3"))
+		self.assertEqual(prepared(), 14)
+		
+		values['x'] = 5
+		self.assertEqual(prepared(), 18)
+		equation = prepared.getEquation()
+		self.assertEqual(prepared(), 18)
+		self.assertTrue(prepared.getEquation() is equation)
+		
+		self.assertRaises(calc.CompilationError, session.extract_equation, "x = 5")
+		
+	def testConcurrentCompilation(self):
+		"""
+		This test ensures that equations compiled by several threads at once
+		each record their own external lookups, remaining correct when reused.
+		"""
+		session = calc.Session("a = 2", variable_lookup_handler=lambda name: time.sleep(0) or len(name), cache_size=4)
+		results = []
+		def worker(name):
+			try:
+				for i in range(300):
+					results.append(session.evaluate_equation("a + %s + %s" % (name, name * (i % 3 + 1))) == 2 + len(name) * (i % 3 + 2))
+			except Exception as e:
+				results.append(e)
+		threads = [threading.Thread(target=worker, args=("x" * (index + 1),)) for index in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(results, [True] * 2400)
+		
+	def testDependencies(self):
+		"""
+		This test ensures that computed values are retained until something
+		they depend upon is redefined, and that variables which reach an
+		external function are evaluated anew every time.
+		"""
+		calls = []
+		class Counter(object):
+			def evaluate(self, arguments, stack):
+				calls.append(arguments)
+				return len(calls)
+		def lookup(arity, name):
+			if name == 'count':
+				return Counter()
+		session = calc.Session(
+		 "a = 0; b = a + 1; c = b * 2; d = 7; g(x) = x + d; e = g(c); r = count(); q = r + d",
+		 function_lookup_handler=lookup,
+		)
+		variables = session.getVariables()
+		self.assertEqual(dict(session.evaluate()[0])['e'], 9)
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(variables['a'].evaluate(), 0)
+		self.assertEqual(variables['q'].evaluate(), 9)
+		self.assertEqual(variables['r'].evaluate(), 3)
+		self.assertEqual(len(calls), 3)
+		
+		session.setVariable(session.createVariable("a = 5"))
+		self.assertEqual(variables['c'].evaluate(), 12)
+		self.assertEqual(variables['e'].evaluate(), 19)
+		self.assertEqual(dict(session.evaluate()[0])['e'], 19)
+		
+		session.setVariable(session.createVariable("d = 1"))
+		self.assertEqual(variables['c'].evaluate(), 12)
+		self.assertEqual(dict(session.evaluate()[0]), {'a': 5, 'b': 6, 'c': 12, 'd': 1, 'e': 13, 'r': 5, 'q': 6})
+		self.assertEqual(len(calls), 5)
+		
+		session.clearVariable('a')
+		self.assertEqual(dict(session.evaluate()[0])['b'], 6)
+		
+	def testConstantFolding(self):
+		"""
+		This test ensures that constant sub-expressions are reduced when
+		compiled, without changing results or hiding errors.
+		"""
+		for (expression, rpn) in (
+		 ("-1-(-(-1 + 1 + 1 * 5))", [-1 - (-(-1 + 1 + 1 * 5))]),
+		 ("sqrt(2) * ceil(4.009)", [math.sqrt(2) * 5]),
+		 ("2 * pi / 360", [2 * math.pi / 360]),
+		):
+			self.assertEqual(self._session.createEquation(expression).getRPNTokens(), rpn)
+			
+		equation = self._session_full.createEquation("2 * pi / 360 * c + -(1 + 1)")
+		self.assertEqual(equation.getRPNTokens()[0], 2 * math.pi / 360)
+		self.assertEqual(equation.getRPNTokens()[3], -2)
+		self.assertEqual(len(equation.getRPNTokens()), 5)
+		self.assertEqual(equation.evaluate(), 2 * math.pi / 360 * 3 - 2)
+		self.assertEqual(len(self._session.createEquation("random() * 2").getRPNTokens()), 3)
+		
+		for (expression, error) in (
+		 ("75^2048 + 1", calc.ThresholdError),
+		 ("1 + 5 / (2 - 2)", calc.DivisionByZeroError),
+		 ("fact(101) * 2", calc.ThresholdError),
+		):
+			equation = self._session.createEquation(expression)
+			self.assertRaises(error, equation.evaluate)
+		
+	def testSharedSubexpressions(self):
+		"""
+		This test ensures that repeated subexpressions are computed once,
+		without changing results, and are refreshed upon redefinition.
+		"""
+		calls = []
+		class Counter(object):
+			def evaluate(self, arguments, stack):
+				calls.append(arguments)
+				return 1
+		def lookup(arity, name):
+			if name == 'count':
+				return Counter()
+		session = calc.Session(
+		 "a = 1; b = 2; g(x, y) = x * 10 + y; h() = ceil(4.009); m = 3; s = 2;" +
+		 "u = g(a + b, h()) - (a - m) / s; v = g(a + b, h()) * 2; w(x) = x + (a - m) / s;" +
+		 "w(u) + (a - m) / s; (a + b) * g(a + b, h()); count() + count()",
+		 function_lookup_handler=lookup,
+		)
+		expected = session.evaluate()
+		statistics = session.shareSubexpressions()
+		self.assertEqual(statistics['subexpressions'], 3)
+		self.assertEqual(statistics['occurrences'], 8)
+		self.assertEqual(session.evaluate(), expected)
+		self.assertEqual(len(calls), 4)
+		
+		session.setVariable(session.createVariable("b = 5"))
+		self.assertEqual(dict(session.evaluate()[0])['v'], 130)
+		self.assertEqual(session.evaluate()[1][:2], (("w(u) + (a - m) / s", 64), ("(a + b) * g(a + b, h())", 390)))
+		
+	def testMemoization(self):
+		"""
+		This test ensures that pure functions memoize their results, that
+		impure ones do not, and that memos are discarded upon redefinition.
+		"""
+		session = calc.Session("d = 1; g(x) = x * 2 + d; h(x) = g(x) + 1; r(x) = x + random()")
+		functions = session.getFunctions()
+		g = functions[(1, 'g')]
+		self.assertEqual(session.evaluate_equation("g(g(g(2)))"), 23)
+		self.assertEqual(session.createEquation("g(g(2)) + 1").evaluate(), 12)
+		statistics = g.getMemoStatistics()
+		self.assertTrue(statistics['pure'])
+		self.assertEqual((statistics['hits'], statistics['misses'], statistics['size']), (2, 3, 3))
+		self.assertEqual(session.evaluate_equation("g(5.0)"), 11.0)
+		self.assertTrue(type(session.evaluate_equation("g(5)")) is int)
+		
+		self.assertFalse(functions[(1, 'r')].isPure())
+		self.assertNotEqual(session.evaluate_equation("r(1)"), session.evaluate_equation("r(1)"))
+		self.assertEqual(functions[(1, 'r')].getMemoStatistics()['size'], 0)
+		
+		self.assertEqual(session.evaluate_equation("h(2)"), 6)
+		session.setVariable(session.createVariable("d = 10"))
+		self.assertEqual(g.getMemoStatistics()['size'], 0)
+		self.assertEqual(functions[(1, 'h')].getMemoStatistics()['size'], 0)
+		self.assertEqual(session.evaluate_equation("h(2)"), 15)
+		
+		g.setMemoSize(0)
+		self.assertEqual(session.evaluate_equation("g(2)"), 14)
+		self.assertEqual(g.getMemoStatistics()['size'], 0)
+		
+	def testConcurrency(self):
+		"""
+		This test ensures that a single Session may be evaluated by many threads
+		at once, with every function call resolving its own arguments, and that
+		a failed call leaves nothing behind.
+		"""
+		session = calc.Session("k = 3; g(x, y) = x * 10 + y; f(x) = g(x, x + k) * 2 - 100 / (x - 13); h(x, y) = f(y) + g(y, x)")
+		for function in session.getFunctions().values():
+			function.setMemoSize(0)
+		prepared = session.createEquation("h(1, 2)")
+		prepared.compileClosure()
+		self.assertRaises(calc.DivisionByZeroError, session.evaluate_equation, "h(1, 13)")
+		self.assertEqual(session.evaluate_equation("f(2)"), (20 + 5) * 2 - 100 / -11.0)
+		
+		failures = []
+		def work(offset):
+			try:
+				for i in range(200):
+					x = (offset + i) % 12
+					expected = ((x * 10 + x + 3) * 2 - 100 / float(x - 13)) + (x * 10 + offset)
+					result = session.evaluate_equation("h(%i, %i)" % (offset, x))
+					if result != expected:
+						failures.append((offset, x, result, expected))
+					if prepared.evaluate() != 25 * 2 - 100 / -11.0 + 21:
+						failures.append((offset, x, prepared.evaluate()))
+			except Exception as e:
+				failures.append(e)
+		threads = [threading.Thread(target=work, args=(offset,)) for offset in range(16)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(failures, [])
+		
+	def testParallel(self):
+		"""
+		This test ensures that equations evaluated by a pool of processes
+		produce the same results, in the same order, as evaluate(), and that
+		errors cross process boundaries intact.
+		"""
+		session = calc.Session(
+		 "a = 2; b = a * 3; g(x, y) = x * y + b; h() = ceil(4.009);" +
+		 ';'.join("g(%i, a) - h() / %i" % (i, i + 1) for i in range(40))
+		)
+		session.startWorkers(2)
+		executor = session._workers[0]
+		self.assertEqual(len(executor._processes), 2)
+		self.assertEqual(session.evaluate_parallel(workers=2, chunk_size=3, warm_up=True), session.evaluate())
+		self.assertEqual(session.evaluate_parallel(workers=2), session.evaluate())
+		self.assertTrue(session._workers[0] is executor)
+		
+		session.setVariable(session.createVariable("b = a * 5"))
+		self.assertEqual(session.evaluate_parallel(workers=2), session.evaluate())
+		self.assertFalse(session._workers[0] is executor)
+		session.closeWorkers()
+		self.assertEqual(session._workers, None)
+		
+		session.addEquation(session.createEquation("b / (a - 2)"))
+		session.addEquation(session.createEquation("75^2048"))
+		try:
+			session.evaluate()
+		except calc.DivisionByZeroError as e:
+			message = str(e)
+		try:
+			session.evaluate_parallel(workers=2, chunk_size=7)
+		except calc.DivisionByZeroError as e:
+			self.assertEqual(str(e), message)
+			self.assertEqual(str(pickle.loads(pickle.dumps(e))), message)
+		else:
+			self.fail("DivisionByZeroError not raised")
+		finally:
+			session.closeWorkers()
+			
+		expression = ['a', '+', 1]
+		errors = (
+		 calc.CompilationError(expression), calc.ConsecutiveFactorError('b', expression),
+		 calc.ConsecutiveOperatorError('+', expression), calc.DivisionByZeroError(1, 0, ['RPN:', 1, 0, '/'], (2,)),
+		 calc.FunctionError('f', 2, expression), calc.IllegalCharacterError("a $ 1", '$'),
+		 calc.IncompleteExpressionError(expression), calc.InstantiationError("no input"),
+		 calc.NullSubexpressionError(), calc.RecursionError(['a', 'b', 'a']), calc.ThresholdError("too large", (0, 3)),
+		 calc.TokensError(), calc.UnbalancedParenthesesError(expression), calc.UnexpectedCharacterError(',', expression),
+		 calc.UnknownTypeError(None), calc.UnterminatedFunctionError('f', expression), calc.VariableError('c', expression),
+		)
+		self.assertEqual(set(type(error) for error in errors), set(calc.Error.__subclasses__()))
+		for error in errors:
+			restored = pickle.loads(pickle.dumps(error))
+			self.assertTrue(isinstance(restored, type(error)))
+			self.assertEqual(str(restored), str(error))
+		
+	def testCycles(self):
+		"""
+		This test ensures that cycles are rejected when definitions are set,
+		leaving the session unchanged, and that entities referenced more than
+		once in an expression are not mistaken for recursion.
+		"""
+		session = calc.Session("a = 2; b = a + 1; c = b * a; f(x) = x + c; h(x) = f(x) * 2")
+		for definition in ("a = c + 1", "a = h(1)", "a = a + 1 + b"):
+			try:
+				session.setVariable(session.createVariable(definition))
+				self.fail("No error generated. Expected %s." % (calc.RecursionError.__name__))
+			except calc.RecursionError: pass
+		try:
+			session.setFunction(session.createFunction("f(x) = h(x) + 1"))
+			self.fail("No error generated. Expected %s." % (calc.RecursionError.__name__))
+		except calc.RecursionError: pass
+		self.assertEqual(session.createEquation("a + b + c + h(a) + f(b)").evaluate(), 2 + 3 + 6 + 16 + 9)
+		
+		session.setFunction(session.createFunction("f(x, y) = h(x) + y"))
+		session.setVariable(session.createVariable("a = 3"))
+		self.assertEqual(session.createEquation("f(f(a, a), f(a)) + f(f(b))").evaluate(), 105 + 28)
+		
+	def testDepth(self):
+		"""
+		This test ensures that definitions nested more deeply than Python's
+		recursion limit can be evaluated, and that the configurable maximum
+		depth is enforced.
+		"""
+		depth = sys.getrecursionlimit() * 2
+		names = ["`x%i`" % (i) for i in range(depth + 1)]
+		session = calc.Session(';'.join(
+		 ["%s = %s + 1" % (names[i + 1], names[i]) for i in range(depth)] + [names[0] + " = 0"] +
+		 ["`f%i`(y) = `f%i`(y) + 1" % (i + 1, i) for i in range(depth)] + ["`f0`(y) = y"]
+		))
+		self.assertEqual(session.createEquation(names[-1]).evaluate(), depth)
+		self.assertEqual(session.createEquation("`f%i`(2)" % (depth)).evaluate(), depth + 2)
+		
+		equation = session.createEquation(names[-1])
+		equation.setMaxDepth(depth // 2)
+		try:
+			equation.evaluate()
+			self.fail("No error generated. Expected %s." % (calc.ThresholdError.__name__))
+		except calc.ThresholdError: pass
+		equation.setMaxDepth(depth + 2)
+		self.assertEqual(equation.evaluate(), depth)
+		
+	def testTokenization(self):
+		"""
+		This test ensures that expressions are tokenized identically regardless
+		of spacing and length, and that illegal characters are reported.
+		"""
+		self.assertEqual(
+		 calc._splitLine(" 2.5x+ .5 * `a b`(3, y)\t- 7 ", None),
+		 [2.5, 'v:x', '+', 0.5, '*', 'f:a b', '(', 3, ',', 'v:y', ')', '-', 7]
+		)
+		self.assertEqual(calc._splitLine("2.5x+.5*`a b`(3,y)-7", None), calc._splitLine(" 2.5x+ .5 * `a b`(3, y)\t- 7 ", None))
+		self.assertEqual(len(calc._splitLine("sqrt(x) * 2 + " * 10000 + "1", None)), 70001)
+		try:
+			calc._splitLine("1 + $", "q = 1 + $")
+			self.fail("No error generated. Expected %s." % (calc.IllegalCharacterError.__name__))
+		except calc.IllegalCharacterError as e:
+			self.assertEqual(str(e), "illegal character '$' : 'q = 1 + $'")
+		
+	def testParser(self):
+		"""
+		This test ensures that the single-pass parser compiles expressions
+		exactly as the staged pipeline does, including implicit multiplication,
+		negation, and constant folding, and that it defers malformed expressions
+		to the staged pipeline for diagnosis.
+		"""
+		functions = self._session._functions
+		variables = self._session._variables
+		def normalize(tokens):
+			normalized = []
+			for token in tokens:
+				if type(token) == tuple and len(token) > 2 and isinstance(token[2], tuple):
+					normalized.append((token[0], token[1], tuple((parameter._tokens, normalize(parameter.getRPNTokens())) for parameter in token[2])))
+				else:
+					normalized.append(token)
+			return normalized
+			
+		for expression in (
+		 "1 + 2 * 3 - 4 / 5", "2^-2", "-2^2", "1 - ---1", "2a b 3 (c)", "sqrt(16) * ceil(4.009)",
+		 "g(a, -(b - 1)) g(c) + h()", "((2 + a) * (b - c)) \\ 5 % 7 < 9 > 2", "g(g(g(a)), sin(pi / b))",
+		):
+			tokens = calc._splitLine(expression, expression)
+			self.assertEqual(
+			 normalize(calc._parseExpression(tokens, functions, variables)),
+			 normalize(calc._foldConstants(calc._convertRPN(calc._validateExpression(tokens, functions, variables))))
+			)
+			
+		for (expression, error) in (
+		 ("1 +", calc.IncompleteExpressionError), ("(1)(2)", calc.ConsecutiveFactorError),
+		 ("1 * * 2", calc.ConsecutiveOperatorError), ("(1 + 2", calc.UnbalancedParenthesesError),
+		 ("g(1, )", calc.TokensError), ("g(1", calc.UnterminatedFunctionError), ("1, 2", calc.UnexpectedCharacterError),
+		 ("undefined + 1 * * 2", calc.VariableError), ("undefined(1)", calc.FunctionError),
+		):
+			self.assertEqual(calc._parseExpression(calc._splitLine(expression, expression), functions, variables), None)
+			self.assertRaises(error, self._session.createEquation, expression)
+		self.assertEqual(self._session.createEquation("()").getRPNTokens(), [])
+		
+	def testProgram(self):
+		"""
+		This test ensures that compiled equations are held as opcode programs
+		that still read as their RPN tokens and evaluate as they did before.
+		"""
+		equation = self._session_full.createEquation("2 c - sqrt(c) / 0.5 + pi")
+		program = equation.getRPNTokens()
+		self.assertTrue(isinstance(program, calc._Program))
+		tokens = list(program)
+		self.assertEqual(tokens[0], 2)
+		self.assertEqual(tokens[1][0], calc._VARIABLE_CUSTOM)
+		self.assertEqual(tokens[2], "*")
+		self.assertEqual(program, tokens)
+		self.assertEqual(program[1:3], tokens[1:3])
+		self.assertEqual(program[-1], tokens[-1])
+		self.assertEqual(["RPN:"] + program, ["RPN:"] + tokens)
+		self.assertEqual(calc._Program(tokens), program)
+		self.assertEqual(list(program._opcodes[:3]), [calc._OPCODE_CONSTANT, calc._OPCODE_VARIABLE, calc._OPCODE_OPERATORS.index("*")])
+		self.assertEqual(equation.evaluate(), 2 * 3 - math.sqrt(3) / 0.5 + math.pi)
+		program = self._session_full.createEquation("2 c + pi").getRPNTokens()
+		self.assertEqual(calc._renderExpression(program), calc._renderExpression(list(program)))
+		
+		self.assertFalse(calc._Program())
+		self.assertRaises(calc.DivisionByZeroError, self._session.createEquation("1 / (2 - 2)").evaluate)
+		self.assertRaises(ZeroDivisionError, self._session.createEquation("1 % (2 - 2)").evaluate)
+		
+	def testSlots(self):
+		"""
+		This test ensures that compiled entities carry no per-instance
+		dictionaries, and that their attributes are initialized without them.
+		"""
+		session = calc.Session("a = 2; f(x, y) = x * y + a")
+		function = session.getFunctions()[(2, 'f')]
+		equation = session.createEquation("f(a, 3) + 1")
+		parameter = function.getRPNTokens()[0]
+		argument = equation.getRPNTokens()[0][2][0]
+		for entity in (session.getVariables()["a"], function, equation, argument, parameter[1], equation.getRPNTokens()):
+			self.assertFalse(hasattr(entity, "__dict__"))
+		self.assertTrue(isinstance(argument, calc.Equation))
+		self.assertFalse(isinstance(parameter[1], calc.Variable))
+		self.assertEqual(equation.evaluate(), 9)
+		self.assertEqual(session.getVariables()["a"].copy().getRPNTokens(), None)
+		
+	def testSerialization(self):
+		"""
+		This test ensures that compiled sessions survive being serialized and
+		restored without being lexed again, and that data of another version,
+		or that relied on lookup handlers, is recompiled from source.
+		"""
+		session = calc.Session("a = 2; b = a * 3 + sqrt(16); f(x, y) = x * y + a + g(x); g(x) = x ^ 2; 1 + f(b, 2); (a - b) / 2 * 4 + f(1, a); (a - b) / 2 * 5")
+		session.getEquations()[0].compileClosure()
+		session.getEquations()[1].compileSource()
+		session.shareSubexpressions()
+		result = session.evaluate()
+		data = session.dumps()
+		
+		restored = calc.Session()
+		split_line = calc._splitLine
+		calc._splitLine = None
+		try:
+			restored.loads(data)
+		finally:
+			calc._splitLine = split_line
+		self.assertEqual(restored.evaluate(), result)
+		self.assertTrue(restored.getEquations()[0]._evaluator is not None)
+		self.assertTrue(restored.getEquations()[0]._source is None)
+		self.assertTrue(restored.getEquations()[1]._evaluator is not None)
+		self.assertTrue(restored.getEquations()[1]._source is not None)
+		self.assertEqual(restored.getEquations()[1]._source, session.getEquations()[1]._source)
+		restored.setVariable(restored.createVariable("a = 10"))
+		self.assertEqual(restored.evaluate()[1][0], ('1 + f(b, 2)', 1235.0))
+		self.assertEqual(session.evaluate(), result)
+		
+		(format, version, source, payload) = pickle.loads(data)
+		stale = calc.Session()
+		stale.loads(pickle.dumps((format, version + 1, source, b"")))
+		self.assertEqual(stale.evaluate(), result)
+		
+		external = calc.Session("z = q + 1", variable_lookup_handler=lambda name: 5)
+		self.assertEqual(pickle.loads(external.dumps())[3], None)
+		restored = calc.Session(variable_lookup_handler=lambda name: 7)
+		restored.loads(external.dumps())
+		self.assertEqual(restored.evaluate(), ((('z', 8),), ()))
+		
+		self.assertRaises(calc.InstantiationError, restored.loads, data)
+		self.assertRaises(calc.InstantiationError, calc.Session().loads, b"junk")
+		
+	def testFork(self):
+		"""
+		This test ensures that forks inherit their parent's definitions without
+		copying them, copying only those that depend on names they redefine,
+		follow their parent's later redefinitions, and never affect their
+		parent.
+		"""
+		base = calc.Session("rate = 2; base = 10; y = base * rate; z = y + 1; w = 7; f(x) = x * rate + w; g(x) = f(x) + z; 1 + g(1)")
+		result = base.evaluate()
+		fork = base.fork("rate = 3; q = g(2)")
+		self.assertEqual(fork.getParent(), base)
+		self.assertEqual(fork.evaluate(), ((('q', 44), ('rate', 3), ('y', 30), ('z', 31)), ()))
+		self.assertEqual(fork.evaluate_equation("g(1) + z + w"), 79)
+		self.assertFalse('w' in fork.getVariables())
+		self.assertFalse('base' in fork.getVariables())
+		self.assertEqual(base.evaluate(), result)
+		self.assertEqual(len(fork.listVariables()), len(base.listVariables()) + 1)
+		
+		fork = base.fork()
+		self.assertEqual(fork.evaluate_equation("g(1)"), 30)
+		fork.setVariable(fork.createVariable("w = 100"))
+		self.assertEqual(fork.evaluate_equation("g(1)"), 123)
+		self.assertEqual(fork.fork("rate = 10").evaluate_equation("g(1)"), 211)
+		self.assertEqual(fork.evaluate_equation("g(1)"), 123)
+		fork.clearVariable('w')
+		self.assertEqual(fork.evaluate_equation("g(1)"), 30)
+		fork.setFunction(fork.createFunction("f(x) = x"))
+		self.assertEqual(fork.evaluate_equation("g(1)"), 22)
+		self.assertEqual(base.evaluate_equation("g(1)"), 30)
+		
+		self.assertRaises(calc.RecursionError, base.fork, "base = z")
+		self.assertRaises(calc.RecursionError, fork.setVariable, fork.createVariable("base = y"))
+		self.assertEqual(base.evaluate(), result)
+		
+		restored = calc.Session()
+		restored.loads(base.fork("rate = 10").dumps())
+		self.assertEqual(restored.evaluate_equation("g(1)"), 118)
+		
+		base = calc.Session("base = 10; rate = 2; y = base * rate")
+		(plain, fork) = (base.fork(), base.fork("rate = 1"))
+		nested = fork.fork("w = 1")
+		self.assertEqual(fork.evaluate_equation("y"), 10)
+		plain.setVariable(plain.createVariable("w = base + 1"))
+		base.setVariable(base.createVariable("base = 7"))
+		self.assertEqual((plain.evaluate_equation("y"), plain.evaluate_equation("w")), (14, 8))
+		self.assertEqual((fork.evaluate_equation("y"), fork.evaluate_equation("base * rate")), (7, 7))
+		self.assertEqual(nested.evaluate_equation("y"), 7)
+		base.setVariable(base.createVariable("y = base * rate + 1"))
+		self.assertEqual((fork.evaluate_equation("y"), nested.evaluate_equation("y")), (8, 8))
+		base.setVariable(base.createVariable("z = rate + 1"))
+		self.assertEqual((base.evaluate_equation("z"), fork.evaluate_equation("z")), (3, 2))
+		base.clearVariable('z')
+		self.assertRaises(calc.VariableError, fork.evaluate_equation, "z")
+		self.assertEqual(base.evaluate(), ((('base', 7), ('rate', 2), ('y', 15)), ()))
+		
+	def testLookupCache(self):
+		"""
+		This test ensures that results from the lookup handlers, including
+		absent ones, are cached until they expire, and that built-in names are
+		resolved without the handlers unless they are shadowable.
+		"""
+		calls = []
+		def variables(name):
+			calls.append(name)
+			if name == 'known':
+				return 5
+			if name == 'pi':
+				return 3
+			return None
+			
+		session = calc.Session(None, variables, lookup_cache_size=10)
+		self.assertEqual(session.evaluate_equation("known + known"), 10)
+		self.assertRaises(calc.VariableError, session.evaluate_equation, "unknown")
+		self.assertRaises(calc.VariableError, session.evaluate_equation, "unknown")
+		self.assertEqual(calls, ['known', 'unknown'])
+		self.assertTrue(session.evaluate_equation("pi") > 3)
+		statistics = session.getLookupStatistics()
+		self.assertEqual(statistics['calls'], 2)
+		self.assertTrue(statistics['builtins'] > 0)
+		self.assertEqual(statistics['saved'], statistics['hits'] + statistics['builtins'])
+		
+		session.clearLookupCache()
+		session.evaluate_equation("known")
+		self.assertEqual(calls, ['known', 'unknown', 'known'])
+		
+		calls = []
+		session = calc.Session(None, variables, lookup_cache_size=10, lookup_ttl=0, shadowable=('pi',))
+		self.assertEqual(session.evaluate_equation("pi"), 3)
+		self.assertEqual(session.evaluate_equation("known"), 5)
+		self.assertEqual(session.evaluate_equation("known"), 5)
+		self.assertTrue(calls.count('known') > 1)
+		self.assertEqual(session.getLookupStatistics()['calls'], len(calls))
+		self.assertTrue(session.getLookupStatistics()['expired'] > 0)
+		
+	def testBulkLookup(self):
+		"""
+		This test ensures that the bulk lookup handler is called once per
+		evaluation, compiled or not, with every unresolved name, including those of nested
+		function calls, and that its results may be cached.
+		"""
+		class Total(object):
+			def evaluate(self, arguments, stack):
+				return sum(arguments)
+		requests = []
+		def lookup(names, specs):
+			requests.append((sorted(names), sorted(specs)))
+			values = dict((name, 2) for name in names if name.startswith('x'))
+			values.update(((arity, name), Total()) for (arity, name) in specs if name == 'total')
+			return values
+			
+		session = calc.Session("y = xa + xb; f(p) = p * xc + xa", bulk_lookup_handler=lookup)
+		self.assertEqual(requests, [(['xa', 'xb', 'xc'], [])])
+		
+		requests = []
+		self.assertEqual(session.evaluate_equation("total(xd, total(xe, y), total()) + f(1) + pi * 0"), 12)
+		self.assertEqual(requests, [(['xd', 'xe'], [(0, 'total'), (2, 'total'), (3, 'total')])])
+		requests = []
+		self.assertEqual(session.evaluate_equation("total(xd, total(xe, y), total()) + f(1) + pi * 0"), 12)
+		self.assertEqual(len(requests), 1)
+		
+		requests = []
+		self.assertRaises(calc.VariableError, session.evaluate_equation, "xf + unknown")
+		self.assertEqual(requests, [(['unknown', 'xf'], [])])
+		
+		session = calc.Session(None, bulk_lookup_handler=lookup, lookup_cache_size=10)
+		requests = []
+		session.evaluate_equation("xa + xb")
+		session.evaluate_equation("xa * xb")
+		self.assertEqual(requests, [(['xa', 'xb'], [])])
+		
+	def testConcurrentBulkLookup(self):
+		"""
+		This test ensures that results from the bulk lookup handler, held while
+		one thread compiles, are neither seen nor retained by another thread
+		that compiles at the same time.
+		"""
+		values = {'xa': 1, 'xb': 2, 'xc': 3}
+		(entered, finished) = (threading.Event(), threading.Event())
+		created = []
+		def lookup(names, specs):
+			if 'xb' in names and threads:
+				threads[0].start()
+				entered.wait(5)
+			elif 'xc' in names:
+				entered.set()
+				finished.wait(5)
+			return dict((name, values[name]) for name in names if name in values)
+		threads = []
+		session = calc.Session("rate = 2; y = rate * xb", bulk_lookup_handler=lookup)
+		fork = session.fork("rate = 1")
+		threads.append(threading.Thread(target=lambda: created.append(session.createVariable("v = xc + 1"))))
+		self.assertEqual(fork.evaluate_equation("y + xa"), 3)
+		finished.set()
+		threads[0].join()
+		self.assertEqual(created[0].evaluate(), 4)
+		
+		values['xa'] = 10
+		self.assertEqual(session.evaluate_equation("xa"), 10)
+		
+	def testAsyncSession(self):
+		"""
+		This test ensures that asynchronous sessions look up every name an
+		expression needs concurrently, before compiling it, and report errors
+		through their Futures.
+		"""
+		loop = asyncio.new_event_loop()
+		pending = []
+		def delay(value):
+			future = loop.create_future()
+			pending.append(future)
+			loop.call_later(0.05, future.set_result, value)
+			return future
+		def variables(name):
+			return delay(name.startswith('x') and len(name) or None)
+		class Total(object):
+			def evaluate(self, arguments, stack):
+				return sum(arguments)
+		def functions(arity, name):
+			return delay(name == 'total' and Total() or None)
+			
+		asyncio.set_event_loop(loop)
+		try:
+			session = calc.AsyncSession(variables, functions)
+			self.assertEqual(loop.run_until_complete(session.define("a = xa + 1; g(p) = p * xbb; a + g(2)")), None)
+			self.assertEqual(len(pending), 2)
+			self.assertEqual(loop.run_until_complete(session.evaluate()), ((('a', 3),), (("a + g(2)", 9),)))
+			
+			pending = []
+			start = time.time()
+			self.assertEqual(loop.run_until_complete(session.evaluate_equation("total(xc, xdd, xeee, total(xffff)) + a + pi * 0")), 17)
+			self.assertEqual(len(pending), 6)
+			self.assertTrue(time.time() - start < 0.2)
+			
+			equation = loop.run_until_complete(session.createEquation("xc * a"))
+			self.assertEqual(equation.evaluate(), 6)
+			self.assertRaises(calc.VariableError, loop.run_until_complete, session.evaluate_equation("xc + unknown"))
+			self.assertRaises(calc.InstantiationError, session.define, "b = 1")
+			
+			session.setVariable(loop.run_until_complete(session.createVariable("a = xcc * 2")))
+			session.setFunction(loop.run_until_complete(session.createFunction("g(p) = p * xdddd")))
+			self.assertEqual(loop.run_until_complete(session.evaluate()), ((('a', 6),), (("a + g(2)", 16),)))
+			self.assertRaises(calc.VariableError, loop.run_until_complete, session.createVariable("b = unknown"))
+			self.assertRaises(NotImplementedError, session.extract_equation, "xa")
+			self.assertRaises(NotImplementedError, session.evaluate_many, "xa", [{}])
+			self.assertRaises(NotImplementedError, session.fork)
+			
+			session = calc.AsyncSession(variables, functions)
+			future = session.define("a = 1; b = (a + 2")
+			self.assertRaises(calc.UnbalancedParenthesesError, loop.run_until_complete, future)
+			self.assertEqual(loop.run_until_complete(session.define("b = xa * 2")), None)
+			self.assertEqual(loop.run_until_complete(session.evaluate()), ((('b', 4),), ()))
+		finally:
+			asyncio.set_event_loop(None)
+			loop.close()
+		
+	def testBindings(self):
+		"""
+		This test ensures that placeholders are bound anew by each evaluation,
+		shadowing other variables, without recompiling or modifying anything,
+		including from several threads at once.
+		"""
+		lookups = []
+		def lookup(name):
+			lookups.append(name)
+			return 100
+		session = calc.Session("rate = 2; x = 1000; f(a) = a * rate", lookup)
+		equation = session.createEquation("f(x) + y + external", ('x', 'y'))
+		self.assertEqual(equation.getPlaceholders(), ('x', 'y'))
+		program = equation.getRPNTokens()
+		self.assertEqual(set(lookups), set(['external']))
+		del lookups[:]
+		self.assertEqual(equation.evaluate(bindings={'x': 3, 'y': 4}), 110)
+		self.assertEqual(equation.evaluate(bindings={'x': 5, 'y': 0, 'z': 1}), 110)
+		self.assertTrue(equation.getRPNTokens() is program)
+		self.assertEqual(lookups, [])
+		self.assertRaises(calc.VariableError, equation.evaluate, None, (), {'x': 1})
+		self.assertRaises(calc.VariableError, equation.evaluate)
+		self.assertEqual(dict(session.evaluate()[0])['x'], 1000)
+		duplicate = session.createEquation("f(x) + y + external", ['x', 'y'])
+		self.assertFalse(duplicate is equation)
+		self.assertEqual(duplicate.evaluate(bindings={'x': 3, 'y': 4}), 110)
+		
+		self.assertEqual(session.evaluate_equation("x * rate", {'x': 7}), 14)
+		self.assertEqual(session.evaluate_equation("x * rate", {'x': 8}), 16)
+		self.assertEqual(session.evaluate_equation("x * rate"), 2000)
+		session.setVariable(session.createVariable("rate = 3"))
+		self.assertEqual(session.evaluate_equation("x * rate", {'x': 8}), 24)
+		
+		results = {}
+		def evaluate(offset):
+			results[offset] = [equation.evaluate(bindings={'x': offset + i, 'y': i}) for i in range(200)]
+		threads = [threading.Thread(target=evaluate, args=(offset,)) for offset in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		for (offset, values) in results.items():
+			self.assertEqual(values, [(offset + i) * 3 + i + 100 for i in range(200)])
+		
 		
 test_computation = unittest.main()